@@ -0,0 +1,66 @@
+# Handover metrics for every {algo}-{id} run in output/, one tidy table
+# Each iperf3 client log is one (run, variant) job; variants are the algo
+# prefixes found on disk (cubic, m_cubic, bbr, ...), compared per run id.
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from kpis import run_metrics
+from runs import discover_runs
+
+
+def _run(job):
+    run, kwargs = job
+    try:
+        return run_metrics(*run, **kwargs)
+    except Exception as e:
+        print(f"Error: {run[2]}: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Handover metrics of all runs")
+    parser.add_argument("--root_dir", default="output")
+    parser.add_argument("-v", "--variants", nargs="+", help="e.g. cubic m_cubic")
+    parser.add_argument("-r", "--run_ids", nargs="+")
+    parser.add_argument("-b", "--begin", type=float, default=0)
+    parser.add_argument("-e", "--end", type=float, default=1200)
+    parser.add_argument("-w", "--windowsz", type=float, default=5, help="s")
+    parser.add_argument(
+        "--stable", type=float, nargs=2, default=[170, 360], help="sub6 mmw Mbps"
+    )
+    parser.add_argument("--thresh", type=float, default=40, help="ramp up limit, s")
+    parser.add_argument("-j", "--workers", type=int)
+    parser.add_argument("-o", "--output", default="metrics-summary.csv")
+    args = parser.parse_args()
+
+    runs = discover_runs(args.root_dir, args.variants, args.run_ids)
+    if not runs:
+        print(f"Error: no runs found in {args.root_dir}")
+        exit(1)
+    print(f"{len(runs)} runs")
+
+    kwargs = {
+        "time_range": (args.begin, args.end),
+        "windowsz": args.windowsz,
+        "stable_thuput": tuple(args.stable),
+        "thresh": args.thresh,
+    }
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(_run, [(run, kwargs) for run in runs]))
+    results = [df for df in results if df is not None]
+    if not results:
+        exit(1)
+    summary = pd.concat(results, ignore_index=True)
+    output_file = os.path.join(args.root_dir, args.output)
+    summary.to_csv(output_file, index=False)
+    print("Saved as", output_file)
+
+    # Variants side by side, handover thuput over all runs of a scenario
+    table = summary[summary.metric.isin(["ho_thuput_mean", "rampup_mean"])]
+    table = table.pivot_table(
+        index=["scenario", "group"], columns=["metric", "variant"], values="value"
+    )
+    print(table.round(2).to_string())
@@ -0,0 +1,259 @@
+# Benchmark the processing stages on synthetic logs of growing size
+# Each (stage, rows) pair runs in a fresh process on inputs from synthetic.py,
+# which are generated once and kept in --data_dir. Wall time, peak RSS and
+# throughput are written to a JSON file; --compare prints the time ratios
+# against an earlier one, so regressions show up before a long run does.
+#   python benchmark.py -n 10000 100000 1000000 -s process_server_log parse_ss
+import os
+import sys
+import json
+import time
+import runpy
+import argparse
+import platform
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import synthetic
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Input kind -> (writer, file name suffix)
+INPUTS = {
+    "packet-log": (synthetic.write_packet_log, "log"),
+    "ss-log": (synthetic.write_ss_log, "log"),
+    "iperf-log": (synthetic.write_iperf_log, "json"),
+    "trace": (synthetic.write_trace, "csv"),
+}
+
+# Stage -> input kind on disk, or None if the input is built in memory.
+# rows is packets, ss lines, iperf3 intervals, HO events or throughput
+# samples.
+STAGES = {
+    "process_server_log": "packet-log",
+    "calculate_transit": None,
+    "calculate_jitter": None,
+    "parse_ss": "ss-log",
+    "iperf3_frame": "iperf-log",
+    "parse_trace": "trace",
+    "calculate_ho_thuput": None,
+}
+
+
+def input_file(data_dir, kind, rows, seed):
+    return os.path.join(data_dir, f"{kind}-{rows}-{seed}.{INPUTS[kind][1]}")
+
+
+def generate(data_dir, kind, rows, seed):
+    """Write the synthetic input if it is not there yet, return its name."""
+    fname = input_file(data_dir, kind, rows, seed)
+    if not os.path.exists(fname):
+        os.makedirs(data_dir, exist_ok=True)
+        # Written aside first so an interrupted run leaves no short file
+        INPUTS[kind][0](fname + ".part", rows, seed)
+        os.replace(fname + ".part", fname)
+    return fname
+
+
+def _parse_logs():
+    return runpy.run_path(os.path.join(HERE, "parse-logs.py"), run_name="parse_logs")
+
+
+def _packet_frames(rows, seed):
+    # Server and client frames as parse-logs has them before matching
+    pl = _parse_logs()
+    server, client = synthetic.packet_arrays(rows, seed)
+    df_server = pd.DataFrame(
+        {
+            "epoch": server["epoch"],
+            "seq": server["seq"],
+            "srcport": synthetic.TEST_PORT,
+            "ack": server["ack"],
+        }
+    )
+    df_client = pd.DataFrame(
+        {
+            "epoch": client["epoch"],
+            "src_port": synthetic.TEST_PORT,
+            "seq": client["seq"],
+            "ack": client["ack"],
+        }
+    )
+    return pl, pl["unwrap_packets"](df_server, df_client)
+
+
+def setup(stage, rows, fname, seed):
+    """Load what the stage needs, return a function running it once."""
+    if stage == "process_server_log":
+        pl = _parse_logs()
+        return lambda: pl["process_server_log"](fname, synthetic.TEST_PORT)
+    if stage == "calculate_transit":
+        pl, (df_server, df_client) = _packet_frames(rows, seed)
+        return lambda: pl["calculate_transit"](df_server, df_client)
+    if stage == "calculate_jitter":
+        pl, (df_server, df_client) = _packet_frames(rows, seed)
+        df_matched, _ = pl["calculate_transit"](df_server, df_client)
+        return lambda: pl["calculate_jitter"](df_matched)
+    if stage == "parse_ss":
+        pl = _parse_logs()
+        return lambda: pl["parse_ss"](fname)
+    if stage == "iperf3_frame":
+        pl = _parse_logs()
+        return lambda: pl["iperf3_frame"](fname)
+    if stage == "parse_trace":
+        from runs import parse_trace
+
+        return lambda: parse_trace(fname)
+    if stage == "calculate_ho_thuput":
+        from metrics import calculate_ho_thuput
+        from timeseries import TimeSeries
+
+        times, thuput = synthetic.thuput_series(rows, seed)
+        # One handover every ~5 s of 0.1 s samples, like the real traces
+        ho_times, _ = synthetic.ho_times(max(rows // 50, 1), seed)
+        # The TimeSeries is built once per run by every caller, count it in
+        return lambda: calculate_ho_thuput(ho_times, TimeSeries(times, thuput), 5)
+    raise ValueError(f"unknown stage {stage}")
+
+
+def _status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+
+def _reset_peak_rss():
+    # Linux resets VmHWM to the current RSS on "5"
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def run_stage(stage, rows, fname, seed, repeat):
+    """Run one stage repeat times in this process, return its measurements."""
+    sys.path.insert(0, HERE)
+    run = setup(stage, rows, fname, seed)
+    base_kb = _status_kb("VmRSS")
+    exact_peak = _reset_peak_rss()
+    walls = []
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        run()
+        walls.append(time.perf_counter() - begin)
+    peak_kb = _status_kb("VmHWM")
+    input_mb = os.path.getsize(fname) / 2**20 if fname else None
+    wall = min(walls)
+    return {
+        "stage": stage,
+        "rows": rows,
+        "input_mb": input_mb,
+        "wall_s": wall,
+        "walls": walls,
+        # Includes setup when the kernel cannot reset the high-water mark
+        "peak_rss_mb": peak_kb / 1024,
+        "rss_delta_mb": (peak_kb - base_kb) / 1024,
+        "peak_rss_exact": exact_peak,
+        "rows_per_s": rows / wall if wall > 0 else None,
+        "mb_per_s": input_mb / wall if input_mb and wall > 0 else None,
+    }
+
+
+def in_child(fn, *args):
+    # A fresh process per call, so peak RSS and allocator state are its own
+    ctx = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=HERE,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def compare(results, baseline_file):
+    with open(baseline_file) as f:
+        baseline = json.load(f)
+    before = {(r["stage"], r["rows"]): r for r in baseline["results"]}
+    print(f"Compared to {baseline_file} ({baseline.get('commit', '?')})")
+    for r in results:
+        old = before.get((r["stage"], r["rows"]))
+        if old is None:
+            continue
+        ratio = r["wall_s"] / old["wall_s"] if old["wall_s"] else float("nan")
+        rss = r["peak_rss_mb"] / old["peak_rss_mb"] if old["peak_rss_mb"] else 1
+        print(f"{r['stage']:20s} {r['rows']:>12,} time x{ratio:6.2f}  rss x{rss:6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the processing stages")
+    parser.add_argument(
+        "-s", "--stages", nargs="+", default=list(STAGES), choices=list(STAGES)
+    )
+    parser.add_argument(
+        "-n", "--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data_dir", default=os.path.join("output", ".cache", "bench"))
+    parser.add_argument("-o", "--output", help="default output/bench-<time>.json")
+    parser.add_argument("--compare", help="earlier benchmark json")
+    args = parser.parse_args()
+
+    env = environment()
+    output = args.output or os.path.join(
+        "output", f"bench-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    results = []
+    print(f"{'stage':20s} {'rows':>12s} {'wall':>9s} {'peak rss':>10s} {'rows/s':>12s}")
+    for rows in args.sizes:
+        for stage in args.stages:
+            kind = STAGES[stage]
+            fname = None
+            if kind is not None:
+                fname = in_child(generate, args.data_dir, kind, rows, args.seed)
+            try:
+                r = in_child(run_stage, stage, rows, fname, args.seed, args.repeat)
+            except Exception as e:
+                print(f"Error: {stage} with {rows} rows: {e}")
+                continue
+            results.append(r)
+            print(
+                f"{stage:20s} {rows:>12,} {r['wall_s']:8.3f}s "
+                f"{r['peak_rss_mb']:8.1f}MB {r['rows_per_s']:12,.0f}"
+            )
+
+    out_dir = os.path.dirname(output)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(dict(env, repeat=args.repeat, results=results), f, indent=2)
+    print(f"Save to {output}")
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,62 @@
+# Check emulator traces and compile them to the binary format of src/event.h
+#   python build-trace.py ../../input/trace-*.csv       check only
+#   python build-trace.py trace-1.csv -o trace-1.bin     compile one trace
+#   python build-trace.py --bin ../../input/trace-*.csv  compile each to .bin
+#   python build-trace.py --expand trace-1.csv           print the actions
+# The emulator takes a .bin wherever it takes a csv trace. Exits 1 if any
+# trace has problems, before anything is written for it.
+import os
+import argparse
+
+from traces import count_events, expand, read_trace, validate, write_binary
+
+
+def build(fname, out_file=None, show=False):
+    """Check one trace and write out_file if given; returns its problems."""
+    events, errors = read_trace(fname)
+    errors += validate(events)
+    if errors:
+        return errors
+    actions = expand(events)
+    if show:
+        for a in actions:
+            args = ",".join(str(v) for v in a.args)
+            print(f"{a.time_ms:>10} q{a.queue} {a.action} {args}")
+    if out_file:
+        write_binary(actions, out_file)
+    n_ho = sum(e.kind == "HO" for e in events)
+    print(f"{fname}: {len(events)} events, {n_ho} HO, {count_events(events)} actions")
+    return []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and compile traces")
+    parser.add_argument("traces", nargs="+", help="csv traces")
+    parser.add_argument("-o", "--output", help="binary trace, one input only")
+    parser.add_argument("--bin", action="store_true", help="write <trace>.bin")
+    parser.add_argument("--expand", action="store_true", help="print the actions")
+    args = parser.parse_args()
+
+    if args.output and len(args.traces) > 1:
+        print("Error: -o takes a single trace, use --bin")
+        exit(1)
+
+    failed = 0
+    for fname in args.traces:
+        out_file = args.output
+        if args.bin:
+            out_file = os.path.splitext(fname)[0] + ".bin"
+        try:
+            errors = build(fname, out_file, args.expand)
+        except OSError as e:
+            errors = [str(e)]
+        if errors:
+            failed += 1
+            print(f"Error: {fname}")
+            for e in errors:
+                print(f">   {e}")
+        elif out_file:
+            print(f"> {out_file}")
+    if failed:
+        print(f"{failed}/{len(args.traces)} traces have problems")
+        exit(1)
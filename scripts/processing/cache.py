@@ -0,0 +1,151 @@
+import fcntl
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Parsed artifacts are stored as one .npy file per column under
+# <CACHE_DIR>/<kind>-<content hash>-<params hash>/, so later runs can
+# memory-map just the columns and the time range they need.
+CACHE_DIR = os.path.join("output", ".cache")
+# Bump when a parser changes what it produces
+CACHE_VERSION = 1
+
+_HASH_BLOCK = 16 * 1024 * 1024
+
+
+def read_json(fname):
+    try:
+        with open(fname, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def write_json(fname, data):
+    tmp = f"{fname}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, fname)
+
+
+def file_digest(fname, cache_dir=CACHE_DIR):
+    """SHA-1 of the file content, re-hashed only when size or mtime change."""
+    st = os.stat(fname)
+    index_file = os.path.join(cache_dir, "digests.json")
+    index = read_json(index_file) or {}
+    path = os.path.abspath(fname)
+    entry = index.get(path)
+    if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+        return entry["sha1"]
+    h = hashlib.sha1()
+    with open(fname, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b""):
+            h.update(block)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Pool workers digest files concurrently: re-read the index under a lock
+    # so an entry another process added meanwhile is not written over
+    with open(os.path.join(cache_dir, "digests.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = read_json(index_file) or {}
+        index[path] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha1": h.hexdigest(),
+        }
+        write_json(index_file, index)
+    return h.hexdigest()
+
+
+def entry_path(kind, fname, params=None, cache_dir=CACHE_DIR):
+    """Cache directory of a parsed artifact of fname."""
+    params = json.dumps([CACHE_VERSION, params], sort_keys=True, default=str)
+    params_digest = hashlib.sha1(params.encode()).hexdigest()
+    return os.path.join(
+        cache_dir, f"{kind}-{file_digest(fname, cache_dir)[:16]}-{params_digest[:8]}"
+    )
+
+
+def store(path, df, fname):
+    """Write df as one .npy per column, atomically."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    columns, sorted_columns = [], []
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        np.save(
+            os.path.join(tmp, f"{i}.npy"), values, allow_pickle=values.dtype == object
+        )
+        columns.append(str(col))
+        if values.dtype.kind in "iuf" and np.all(values[1:] >= values[:-1]):
+            sorted_columns.append(str(col))
+    st = os.stat(fname)
+    write_json(
+        os.path.join(tmp, "meta.json"),
+        {
+            "source": os.path.abspath(fname),
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "rows": len(df),
+            "columns": columns,
+            "sorted": sorted_columns,
+        },
+    )
+    try:
+        os.rename(tmp, path)
+    except OSError:
+        # Another process stored the same entry first
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+
+def _load_column(path, meta, col):
+    fname = os.path.join(path, f"{meta['columns'].index(col)}.npy")
+    try:
+        return np.load(fname, mmap_mode="r")
+    except ValueError:
+        # Object columns are pickled and cannot be mapped
+        return np.load(fname, allow_pickle=True)
+
+
+def load(path, columns=None, time_range=None, time_col="time"):
+    """Load a cached artifact, only the given columns and time range."""
+    meta = read_json(os.path.join(path, "meta.json"))
+    columns = meta["columns"] if columns is None else list(columns)
+    rows = slice(None)
+    if time_range is not None and time_col in meta["columns"]:
+        begin, end = time_range
+        times = _load_column(path, meta, time_col)
+        if time_col in meta["sorted"]:
+            rows = slice(
+                np.searchsorted(times, begin, side="left"),
+                np.searchsorted(times, end, side="right"),
+            )
+        else:
+            rows = np.flatnonzero((times >= begin) & (times <= end))
+    data = {col: np.array(_load_column(path, meta, col)[rows]) for col in columns}
+    return pd.DataFrame(data, columns=columns)
+
+
+def cached(
+    kind,
+    fname,
+    parse,
+    params=None,
+    columns=None,
+    time_range=None,
+    time_col="time",
+    cache_dir=CACHE_DIR,
+):
+    """Return parse(fname) as a DataFrame, from the cache when fname is unchanged.
+
+    params must hold every argument that changes what parse produces. columns
+    and time_range (inclusive, on time_col) limit what is read back.
+    """
+    path = entry_path(kind, fname, params, cache_dir)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        store(path, parse(fname), fname)
+    return load(path, columns, time_range, time_col)
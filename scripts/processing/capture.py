@@ -0,0 +1,285 @@
+import mmap
+import struct
+import socket
+
+import numpy as np
+
+# IPv4/TCP packets of a pcap or pcapng capture (e.g. tcpdump -i any -s 100),
+# decoded into a structured array without tshark. The file is memory-mapped;
+# only the record walk is a Python loop, every header field is gathered from
+# all packets at once. time is relative to the first record of the capture,
+# like tshark's frame.time_relative.
+PACKET_DTYPE = np.dtype(
+    [
+        ("time", "f8"),
+        ("epoch", "f8"),
+        ("src_ip", "u4"),
+        ("dst_ip", "u4"),
+        ("src_port", "u2"),
+        ("dst_port", "u2"),
+        ("seq", "u4"),
+        ("ack", "u4"),
+        ("len", "u4"),  # TCP payload bytes, from the IP total length
+        ("window", "u2"),
+        ("flags", "u2"),
+    ]
+)
+
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+TCP_PSH = 0x08
+TCP_ACK = 0x10
+
+# Link type -> (link header length, offset of the ethertype or None)
+LINKTYPES = {
+    0: (4, None),  # BSD loopback, AF in host order
+    1: (14, 12),  # Ethernet
+    101: (0, None),  # raw IP
+    113: (16, 14),  # Linux cooked (tcpdump -i any)
+    228: (0, None),  # raw IPv4
+    276: (20, 0),  # Linux cooked v2
+}
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = 0x8100
+
+# Classic pcap magic -> (byte order, timestamp resolution in s)
+PCAP_MAGIC = {
+    b"\xd4\xc3\xb2\xa1": ("<", 1e-6),
+    b"\xa1\xb2\xc3\xd4": (">", 1e-6),
+    b"\x4d\x3c\xb2\xa1": ("<", 1e-9),
+    b"\xa1\xb2\x3c\x4d": (">", 1e-9),
+}
+_PCAPNG_SHB = b"\x0a\x0d\x0d\x0a"
+
+
+def ip_to_int(ip):
+    return struct.unpack("!I", socket.inet_aton(ip))[0]
+
+
+def int_to_ip(values):
+    """Dotted quads of an array of IPv4 addresses."""
+    values = np.asarray(values, dtype=np.uint32)
+    octets = [(values >> shift) & 0xFF for shift in (24, 16, 8, 0)]
+    out = octets[0].astype(str).astype(object)
+    for octet in octets[1:]:
+        out = out + "." + octet.astype(str).astype(object)
+    return out
+
+
+def walk_pcap(buf):
+    """Return (data offset, captured length, ts, link type) per record."""
+    order, resolution = PCAP_MAGIC[bytes(buf[:4])]
+    linktype = struct.unpack_from(order + "I", buf, 20)[0] & 0x0FFFFFFF
+    record = struct.Struct(order + "IIII")
+    offsets, lengths, secs, fracs = [], [], [], []
+    pos, size = 24, len(buf)
+    while pos + 16 <= size:
+        sec, frac, incl_len, _ = record.unpack_from(buf, pos)
+        if pos + 16 + incl_len > size:
+            break  # truncated last record
+        offsets.append(pos + 16)
+        lengths.append(incl_len)
+        secs.append(sec)
+        fracs.append(frac)
+        pos += 16 + incl_len
+    ts = np.array(secs, dtype=np.float64) + np.array(fracs) * resolution
+    links = np.full(len(offsets), linktype, dtype=np.int64)
+    return (
+        np.array(offsets, dtype=np.int64),
+        np.array(lengths, dtype=np.int64),
+        ts,
+        links,
+    )
+
+
+def _if_tsresol(buf, order, pos, end):
+    # Options of an interface description block, default microseconds
+    while pos + 4 <= end:
+        code, length = struct.unpack_from(order + "HH", buf, pos)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = buf[pos + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0**-value
+        pos += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def _walk_pcapng(buf):
+    """Return (data offset, captured length, ts, link type) per packet block."""
+    offsets, lengths, ts_high, ts_low, ifaces = [], [], [], [], []
+    interfaces = []
+    pos, size, order = 0, len(buf), "<"
+    while pos + 12 <= size:
+        block_type = bytes(buf[pos : pos + 4])
+        if block_type == _PCAPNG_SHB:
+            # Byte order of the section, interface ids restart
+            order = (
+                "<" if bytes(buf[pos + 8 : pos + 12]) == b"\x4d\x3c\x2b\x1a" else ">"
+            )
+            interfaces = []
+        block_type, block_len = struct.unpack_from(order + "II", buf, pos)
+        if block_len < 12 or pos + block_len > size:
+            break  # truncated last block
+        if block_type == 1:
+            linktype = struct.unpack_from(order + "H", buf, pos + 8)[0]
+            resol = _if_tsresol(buf, order, pos + 16, pos + block_len - 4)
+            interfaces.append((linktype, resol))
+        elif block_type == 6:
+            iface, high, low, cap_len = struct.unpack_from(order + "IIII", buf, pos + 8)
+            offsets.append(pos + 28)
+            lengths.append(cap_len)
+            ts_high.append(high)
+            ts_low.append(low)
+            ifaces.append(interfaces[iface])
+        pos += block_len
+    ticks = (np.array(ts_high, dtype=np.uint64) << np.uint64(32)) | np.array(
+        ts_low, dtype=np.uint64
+    )
+    resol = np.array([i[1] for i in ifaces], dtype=np.float64)
+    # Whole seconds apart from the fraction, ns ticks overflow float64 precision
+    per_sec = np.rint(1 / resol).astype(np.uint64)
+    ts = (ticks // per_sec).astype(np.float64) + (ticks % per_sec) * resol
+    links = np.array([i[0] for i in ifaces], dtype=np.int64)
+    return (
+        np.array(offsets, dtype=np.int64),
+        np.array(lengths, dtype=np.int64),
+        ts,
+        links,
+    )
+
+
+def _be16(data, idx):
+    return (data[idx].astype(np.uint32) << 8) | data[idx + 1]
+
+
+def _be32(data, idx):
+    return (
+        (data[idx].astype(np.uint32) << 24)
+        | (data[idx + 1].astype(np.uint32) << 16)
+        | (data[idx + 2].astype(np.uint32) << 8)
+        | data[idx + 3]
+    )
+
+
+def decode_packets(data, offsets, lengths, ts, links):
+    """Decode IPv4/TCP headers of records in data (a uint8 array)."""
+    # Link header, one VLAN tag is skipped on Ethernet
+    l2_len = np.full(offsets.size, -1, dtype=np.int64)
+    is_ip = np.zeros(offsets.size, dtype=bool)
+    for linktype, (hdr_len, type_off) in LINKTYPES.items():
+        sel = (links == linktype) & (lengths >= hdr_len + 20)
+        if not sel.any():
+            continue
+        l2_len[sel] = hdr_len
+        if type_off is None:
+            is_ip[sel] = True
+            continue
+        ethertype = _be16(data, offsets[sel] + type_off)
+        vlan = (ethertype == ETHERTYPE_VLAN) & (linktype == 1)
+        if vlan.any():
+            idx = np.flatnonzero(sel)[vlan]
+            l2_len[idx] += 4
+            ethertype[vlan] = _be16(data, offsets[idx] + type_off + 4)
+        is_ip[sel] = ethertype == ETHERTYPE_IPV4
+    ok = is_ip & (lengths >= l2_len + 20)
+    ip = offsets[ok] + l2_len[ok]
+    end = offsets[ok] + lengths[ok]
+    ihl = (data[ip] & 0x0F).astype(np.int64) * 4
+    # IPv4, TCP, first fragment, TCP header up to the window captured
+    ok2 = (data[ip] >> 4 == 4) & (data[ip + 9] == 6) & (ihl >= 20)
+    ok2 &= (_be16(data, ip + 6) & 0x1FFF) == 0
+    ok2 &= ip + ihl + 16 <= end
+    sel = np.flatnonzero(ok)[ok2]
+    ip, ihl = ip[ok2], ihl[ok2]
+    tcp = ip + ihl
+
+    pkts = np.zeros(sel.size, dtype=PACKET_DTYPE)
+    pkts["epoch"] = ts[sel]
+    pkts["time"] = ts[sel] - ts[0] if ts.size else ts[sel]
+    pkts["src_ip"] = _be32(data, ip + 12)
+    pkts["dst_ip"] = _be32(data, ip + 16)
+    pkts["src_port"] = _be16(data, tcp)
+    pkts["dst_port"] = _be16(data, tcp + 2)
+    pkts["seq"] = _be32(data, tcp + 4)
+    pkts["ack"] = _be32(data, tcp + 8)
+    doff = (data[tcp + 12] >> 4).astype(np.int64) * 4
+    payload = _be16(data, ip + 2).astype(np.int64) - ihl - doff
+    pkts["len"] = np.maximum(payload, 0)
+    pkts["flags"] = ((data[tcp + 12].astype(np.uint16) & 1) << 8) | data[tcp + 13]
+    pkts["window"] = _be16(data, tcp + 14)
+    return pkts
+
+
+def read_capture(fname):
+    """Read the IPv4/TCP packets of a pcap or pcapng file, see PACKET_DTYPE."""
+    with open(fname, "rb") as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            return np.zeros(0, dtype=PACKET_DTYPE)
+    data = None
+    try:
+        magic = bytes(buf[:4])
+        if magic in PCAP_MAGIC:
+            records = walk_pcap(buf)
+        elif magic == _PCAPNG_SHB:
+            records = _walk_pcapng(buf)
+        else:
+            print(f"Error: {fname} is not a pcap or pcapng file")
+            return np.zeros(0, dtype=PACKET_DTYPE)
+        data = np.frombuffer(buf, dtype=np.uint8)
+        return decode_packets(data, *records)
+    finally:
+        data = None
+        try:
+            buf.close()
+        except BufferError:
+            # The traceback of a decode error still holds a view, the map is
+            # released with it; the decode error is the one to report
+            pass
+
+
+def tcp_streams(pkts):
+    """Stream index per packet, numbered by first appearance like tcp.stream.
+
+    Both directions of a connection share the index. A 4-tuple reused by a
+    later connection keeps the index of the first one.
+    """
+    a = (pkts["src_ip"].astype(np.uint64) << np.uint64(16)) | pkts["src_port"]
+    b = (pkts["dst_ip"].astype(np.uint64) << np.uint64(16)) | pkts["dst_port"]
+    pairs = np.column_stack((np.minimum(a, b), np.maximum(a, b)))
+    if pairs.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64)
+    _, first, inverse = np.unique(pairs, axis=0, return_index=True, return_inverse=True)
+    rank = np.empty(first.size, dtype=np.int64)
+    rank[np.argsort(first, kind="stable")] = np.arange(first.size)
+    return rank[inverse.ravel()]
+
+
+def filter_packets(
+    pkts,
+    stream=None,
+    src_ip=None,
+    dst_ip=None,
+    src_port=None,
+    dst_port=None,
+    port=None,
+):
+    """Select packets matching every given field; port matches either side."""
+    mask = np.ones(pkts.size, dtype=bool)
+    if stream is not None:
+        mask &= tcp_streams(pkts) == stream
+    if src_ip is not None:
+        mask &= pkts["src_ip"] == ip_to_int(src_ip)
+    if dst_ip is not None:
+        mask &= pkts["dst_ip"] == ip_to_int(dst_ip)
+    if src_port is not None:
+        mask &= pkts["src_port"] == src_port
+    if dst_port is not None:
+        mask &= pkts["dst_port"] == dst_port
+    if port is not None:
+        mask &= (pkts["src_port"] == port) | (pkts["dst_port"] == port)
+    return pkts[mask]
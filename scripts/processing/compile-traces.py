@@ -0,0 +1,232 @@
+# Compile XCAL NSA drive-test logs into emulator traces (input/trace-*.csv)
+# Each log becomes INIT lines for both queues, the default SOL_INIT_SCHED
+# line and one HO line per handover found in the RRC messages.
+import os
+import re
+import glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from traces import LTE_MARK, NR_MARK, parse_lines, validate
+from util import read_handover
+
+# Egress queue, as in the recorded traces
+HO_QUEUE = 0
+QUEUES = (0, 1)
+SOL_INIT_SCHED = "0,SOL_INIT_SCHED,1,0,30,90,2,1500,1,2000,82,2,4000,46"
+
+# (name, Message pattern, Info pattern, mark after the handover)
+# None keeps the current link. Rules are tried in order, first match wins.
+HO_RULES = [
+    (
+        "scg_release",
+        r"RRC ?Connection ?Reconfiguration(?! ?Complete)",
+        r"scg-?Release|nr-Config-r15\W+release|endc-ReleaseAndAdd",
+        LTE_MARK,
+    ),
+    (
+        "lte_ho",
+        r"RRC ?Connection ?Reconfiguration(?! ?Complete)",
+        r"mobilityControlInfo",
+        None,
+    ),
+    (
+        "scg_change",
+        r"(?:RRC ?Connection ?Reconfiguration|rrc ?Reconfiguration)(?! ?Complete)",
+        r"reconfigurationWithSync",
+        NR_MARK,
+    ),
+]
+# End of the radio gap
+COMPLETE_MESSAGE = r"Reconfiguration ?Complete|RACH ?Success"
+
+
+def match_rules(df, rules=HO_RULES):
+    """Rule index per row, -1 where no rule matches."""
+    message = df["Message"].astype(str)
+    info = df["Info"].fillna("").astype(str)
+    rule = np.full(len(df), -1)
+    for i, (_, msg_re, info_re, _) in reversed(list(enumerate(rules))):
+        hit = message.str.contains(msg_re, case=False, regex=True)
+        hit &= info.str.contains(info_re, case=False, regex=True)
+        rule[hit.to_numpy()] = i
+    return rule
+
+
+def derive_handovers(
+    df, rules=HO_RULES, init_mark=LTE_MARK, max_gap=1000, default_gap=50
+):
+    """Return (time_s, mark, gap_ms, kind) arrays of handovers in a log.
+
+    The gap runs from the command to the next completion message, default_gap
+    when none follows within max_gap ms. Commands repeated while a gap is
+    still open belong to the same handover and are dropped.
+    """
+    rule = match_rules(df, rules)
+    is_cmd = rule >= 0
+    t_cmd = df["seconds"].to_numpy()[is_cmd]
+    rule = rule[is_cmd]
+    done = df["Message"].astype(str).str.contains(COMPLETE_MESSAGE, case=False)
+    t_done = np.sort(df["seconds"].to_numpy()[done.to_numpy()])
+
+    # First completion after each command
+    idx = np.searchsorted(t_done, t_cmd, side="right")
+    found = idx < t_done.size
+    gap = np.full(t_cmd.size, float(default_gap))
+    gap[found] = (t_done[idx[found]] - t_cmd[found]) * 1000
+    gap[gap > max_gap] = default_gap
+    gap = np.maximum(np.rint(gap), 1).astype(np.int64)
+
+    keep = np.zeros(t_cmd.size, dtype=bool)
+    busy_until = -np.inf
+    for i in range(t_cmd.size):
+        if t_cmd[i] >= busy_until:
+            keep[i] = True
+            busy_until = t_cmd[i] + gap[i] / 1000
+    t_cmd, gap, rule = t_cmd[keep], gap[keep], rule[keep]
+
+    # Rules without a target stay on the current link
+    targets = pd.Series([rules[r][3] for r in rule], dtype="float64")
+    marks = targets.ffill().fillna(init_mark).to_numpy().astype(np.int64)
+    kinds = np.array([rules[r][0] for r in rule], dtype=object)
+    return t_cmd, marks, gap, kinds
+
+
+def validate_trace(lines):
+    """Return a list of problems in trace lines, empty if the trace is valid."""
+    events, errors = parse_lines(lines)
+    return errors + validate(events)
+
+
+def log_date(fname):
+    """Date in a file name such as 20230704 or 2023-07-04, None if absent."""
+    found = re.search(r"(20\d\d)-?(\d\d)-?(\d\d)", os.path.basename(fname))
+    if found is None:
+        return None
+    return date(*map(int, found.groups()))
+
+
+def compile_trace(fname, out_file, log_day=None, start=0, duration=None, **kwargs):
+    """Compile one XCAL log; returns (out_file, handover count, problems)."""
+    log_day = log_day or log_date(fname)
+    if log_day is None:
+        return out_file, 0, ["no date in file name, use --date"]
+    df = read_handover(fname, log_day.month, log_day.day, log_day.year)
+    if df.empty:
+        return out_file, 0, ["empty log"]
+    t0 = df["seconds"].min() + start
+    t_end = df["seconds"].max() if duration is None else t0 + duration
+    df = df[(df["seconds"] >= t0) & (df["seconds"] <= t_end)]
+    end_ms = int((t_end - t0) * 1000)
+
+    reord_cnt = kwargs.pop("reord_cnt", 0)
+    reord_offset = kwargs.pop("reord_offset", 0)
+    loss = kwargs.pop("loss", 0)
+    sol_init = kwargs.pop("sol_init", True)
+    init_mark = kwargs.get("init_mark", LTE_MARK)
+    times, marks, gaps, _ = derive_handovers(df, **kwargs)
+    times_ms = np.rint((times - t0) * 1000).astype(np.int64)
+
+    lines = [f"0,INIT,{q},{init_mark},{end_ms}" for q in QUEUES]
+    if sol_init:
+        lines.append(SOL_INIT_SCHED)
+    lines += [
+        f"{t},HO,{HO_QUEUE},{mark},{gap},{reord_cnt},{reord_offset},{loss}"
+        for t, mark, gap in zip(times_ms, marks, gaps)
+    ]
+    errors = validate_trace(lines)
+    if not errors:
+        with open(out_file, "w") as f:
+            f.write("\n".join(lines) + "\n")
+    return out_file, len(times_ms), errors
+
+
+def find_logs(paths, pattern):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(
+                glob.glob(os.path.join(path, "**", pattern), recursive=True)
+            )
+        else:
+            files.append(path)
+    return [f for f in files if os.path.isfile(f)]
+
+
+def _compile(job):
+    fname, out_file, kwargs = job
+    try:
+        return fname, compile_trace(fname, out_file, **kwargs)
+    except Exception as e:
+        return fname, (out_file, 0, [str(e)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile XCAL logs to traces")
+    parser.add_argument("inputs", nargs="+", help="XCAL logs or directories")
+    parser.add_argument("-o", "--outdir", default="../../input")
+    parser.add_argument("--pattern", default="*.txt", help="in directories")
+    parser.add_argument("--date", help="YYYY-MM-DD, default from file name")
+    parser.add_argument("-b", "--begin", type=float, default=0, help="s into log")
+    parser.add_argument("-d", "--duration", type=float, help="s, default all")
+    parser.add_argument("--init_mark", type=int, default=LTE_MARK)
+    parser.add_argument("--max_gap", type=int, default=1000, help="ms")
+    parser.add_argument("--default_gap", type=int, default=50, help="ms")
+    parser.add_argument("--reord_cnt", type=int, default=0)
+    parser.add_argument("--reord_offset", type=int, default=0)
+    parser.add_argument("--loss", type=int, default=0)
+    parser.add_argument("--no_sol", action="store_true", help="no SOL_INIT_SCHED")
+    parser.add_argument("--force", action="store_true", help="overwrite traces")
+    parser.add_argument("-j", "--workers", type=int)
+    args = parser.parse_args()
+
+    files = find_logs(args.inputs, args.pattern)
+    if not files:
+        print("Error: no XCAL logs found")
+        exit(1)
+    os.makedirs(args.outdir, exist_ok=True)
+
+    kwargs = {
+        "log_day": date.fromisoformat(args.date) if args.date else None,
+        "start": args.begin,
+        "duration": args.duration,
+        "init_mark": args.init_mark,
+        "max_gap": args.max_gap,
+        "default_gap": args.default_gap,
+        "reord_cnt": args.reord_cnt,
+        "reord_offset": args.reord_offset,
+        "loss": args.loss,
+        "sol_init": not args.no_sol,
+    }
+    jobs, outputs = [], {}
+    for fname in files:
+        stem = os.path.splitext(os.path.basename(fname))[0]
+        out_file = os.path.join(args.outdir, f"trace-{stem}.csv")
+        if out_file in outputs:
+            print(f"Error: {fname} and {outputs[out_file]} both compile to {out_file}")
+            exit(1)
+        outputs[out_file] = fname
+        # input/ also holds the hand-made traces, 1.txt would replace trace-1.csv
+        if os.path.exists(out_file) and not args.force:
+            print(f"Skip {fname}, {out_file} exists (--force to overwrite)")
+            continue
+        jobs.append((fname, out_file, kwargs))
+    if not jobs:
+        print("No traces to compile")
+        exit(0)
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for fname, (out_file, n_ho, errors) in pool.map(_compile, jobs):
+            if errors:
+                failed += 1
+                print(f"Error: {fname}")
+                for e in errors:
+                    print(f">   {e}")
+            else:
+                print(f"{fname} -> {out_file}, {n_ho} handovers")
+    print(f"{len(jobs) - failed}/{len(jobs)} traces compiled")
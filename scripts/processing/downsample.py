@@ -0,0 +1,145 @@
+import numpy as np
+
+# Reduce a time series to what a plot can show before handing it to
+# matplotlib. minmax keeps the lowest and highest sample of every pixel
+# column, so throughput dips at handovers and spikes survive exactly; lttb
+# (Largest-Triangle-Three-Buckets) keeps one sample per bucket chosen for the
+# largest visual area and suits smooth line plots. Packet-level scatters are
+# binned into a count image with one bin per pixel instead.
+
+
+def _finite(x, y):
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    keep = np.isfinite(x) & np.isfinite(y)
+    if not keep.all():
+        x, y = x[keep], y[keep]
+    if x.size > 1 and np.any(x[1:] < x[:-1]):
+        order = np.argsort(x, kind="stable")
+        x, y = x[order], y[order]
+    return x, y
+
+
+def _first_per_segment(hits, seg):
+    # First of the sorted indices hits in each segment
+    head = np.ones(hits.size, dtype=bool)
+    head[1:] = seg[hits][1:] != seg[hits][:-1]
+    return hits[head]
+
+
+def minmax_indices(x, y, n_buckets):
+    """Indices of the min and max sample in each of n_buckets equal x spans.
+
+    x must be sorted, so every bucket is a contiguous run of samples.
+    """
+    span = x[-1] - x[0]
+    if span <= 0:
+        bucket = np.zeros(x.size, dtype=np.int64)
+    else:
+        bucket = ((x - x[0]) / span * n_buckets).astype(np.int64)
+        bucket = np.minimum(bucket, n_buckets - 1)
+    starts = np.flatnonzero(np.diff(bucket, prepend=-1))
+    seg = np.repeat(np.arange(starts.size), np.diff(np.append(starts, x.size)))
+    lo = np.minimum.reduceat(y, starts)[seg]
+    hi = np.maximum.reduceat(y, starts)[seg]
+    idx_lo = _first_per_segment(np.flatnonzero(y == lo), seg)
+    idx_hi = _first_per_segment(np.flatnonzero(y == hi), seg)
+    # First and last sample too, so the line spans the whole range
+    return np.unique(np.concatenate((idx_lo, idx_hi, [0, x.size - 1])))
+
+
+def lttb_indices(x, y, n_out):
+    """Indices of n_out samples picked by Largest-Triangle-Three-Buckets."""
+    n = x.size
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket, the last point for the last bucket
+        nlo, nhi = hi, edges[i + 2] if i + 2 < n_out - 1 else n
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs(
+            (x[prev] - cx) * (y[lo:hi] - y[prev]) - (x[prev] - x[lo:hi]) * (cy - y[prev])
+        )
+        prev = lo + int(np.argmax(area))
+        out[i + 1] = prev
+    return out
+
+
+def downsample(x, y, n_out, method="minmax"):
+    """Return (x, y) reduced to about n_out points; NaNs are dropped.
+
+    For minmax, n_out / 2 buckets are used since each keeps two samples.
+    """
+    x, y = _finite(x, y)
+    if x.size <= max(n_out, 3):
+        return x, y
+    if method == "minmax":
+        idx = minmax_indices(x, y, max(n_out // 2, 1))
+    elif method == "lttb":
+        idx = lttb_indices(x, y, max(n_out, 3))
+    else:
+        raise ValueError(f"unknown downsampling method {method}")
+    return x[idx], y[idx]
+
+
+def axes_pixel_width(ax, dpi=None):
+    """Width of ax in pixels when saved at dpi, the figure dpi by default."""
+    return axes_pixel_shape(ax, dpi)[0]
+
+
+def plot_series(ax, x, y, *args, method="minmax", dpi=None, **kwargs):
+    """ax.plot of (x, y) downsampled to two points per pixel column of ax."""
+    x, y = downsample(x, y, 2 * axes_pixel_width(ax, dpi), method)
+    return ax.plot(x, y, *args, **kwargs)
+
+
+def density_image(x, y, x_range, y_range, shape):
+    """Sample count per pixel of a (width, height) grid over the given ranges.
+
+    Returns an image of shape (height, width), row 0 at the bottom of y_range,
+    for imshow(origin="lower").
+    """
+    width, height = shape
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    (x0, x1), (y0, y1) = x_range, y_range
+    keep = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+    col = ((x[keep] - x0) / max(x1 - x0, 1e-12) * width).astype(np.int64)
+    row = ((y[keep] - y0) / max(y1 - y0, 1e-12) * height).astype(np.int64)
+    col = np.minimum(col, width - 1)
+    row = np.minimum(row, height - 1)
+    counts = np.bincount(row * width + col, minlength=width * height)
+    return counts.reshape(height, width)
+
+
+def axes_pixel_shape(ax, dpi=None):
+    """(width, height) of ax in pixels when saved at dpi."""
+    fig = ax.get_figure()
+    dpi = fig.dpi if dpi is None or dpi == "figure" else dpi
+    pos = ax.get_position()
+    return (
+        max(int(pos.width * fig.get_figwidth() * dpi), 1),
+        max(int(pos.height * fig.get_figheight() * dpi), 1),
+    )
+
+
+def plot_density(ax, x, y, x_range=None, y_range=None, dpi=None, cmap="viridis"):
+    """Draw (x, y) points as a log-scaled count image, one bin per pixel of ax."""
+    x, y = _finite(x, y)
+    if x.size == 0:
+        return None
+    x_range = x_range or (x[0], x[-1])
+    y_range = y_range or (y.min(), y.max())
+    if y_range[1] <= y_range[0]:
+        y_range = (y_range[0] - 0.5, y_range[0] + 0.5)
+    img = density_image(x, y, x_range, y_range, axes_pixel_shape(ax, dpi))
+    masked = np.ma.masked_equal(img, 0)
+    return ax.imshow(
+        np.ma.log10(masked),
+        origin="lower",
+        extent=(*x_range, *y_range),
+        aspect="auto",
+        interpolation="nearest",
+        cmap=cmap,
+    )
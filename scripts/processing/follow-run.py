@@ -0,0 +1,194 @@
+# Follow a run while the emulator is still running
+# Tails packet.log, the iperf3 log, the ss log and optionally the client
+# capture, and prints rolling statistics over the last --window seconds every
+# --interval seconds, or serves the latest as JSON with --serve.
+#   python follow-run.py -a cubic-1 -p ../../packet.log
+# iperf3 -J only writes its log on exit; run it with --json-stream to follow
+# throughput live. Follow the capture with tcpdump -U so packets are not
+# held back in tcpdump's buffer.
+import os
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from live import (
+    IperfFollower,
+    PacketLogFollower,
+    PacketStats,
+    PcapFollower,
+    SSFollower,
+    Window,
+    ss_rtt,
+)
+
+
+class RunStats:
+    def __init__(self, args):
+        self.packets = PacketStats(args.window, args.port)
+        self.iperf = Window(args.window)
+        self.rtt = Window(args.window)
+        self.cwnd = Window(args.window)
+        self.dst_port = args.dst_port
+        self.followers = {}
+        if args.packet_log:
+            self.followers["packet"] = PacketLogFollower(args.packet_log, args.from_end)
+        if args.client_pcap:
+            self.followers["pcap"] = PcapFollower(args.client_pcap)
+        if args.iperf_log:
+            self.followers["iperf"] = IperfFollower(args.iperf_log, args.from_end)
+        if args.ss_log:
+            self.followers["ss"] = SSFollower(args.ss_log, args.from_end)
+        self.generation = 0
+
+    def poll(self):
+        """Read what was appended to every log, True if anything was."""
+        read = False
+        if "packet" in self.followers:
+            follower = self.followers["packet"]
+            records = follower.poll()
+            if follower.follower.generation != self.generation:
+                # packet.log of a new run
+                self.generation = follower.follower.generation
+                self.packets.reset()
+            self.packets.add_server(records)
+            read |= records.size > 0
+        if "pcap" in self.followers:
+            pkts = self.followers["pcap"].poll()
+            if pkts is not None:
+                pkts = pkts[(pkts["dst_port"] == self.dst_port) & (pkts["len"] > 0)]
+                self.packets.add_client(pkts)
+                read = True
+        if "iperf" in self.followers:
+            for t, mbps in self.followers["iperf"].poll():
+                self.iperf.add(t, mbps)
+                read = True
+        if "ss" in self.followers:
+            for t, fields in self.followers["ss"].poll():
+                rtt = ss_rtt(fields)
+                if rtt is not None:
+                    self.rtt.add(t, rtt)
+                if isinstance(fields.get("cwnd"), float):
+                    self.cwnd.add(t, fields["cwnd"])
+                read = True
+        return read
+
+    def snapshot(self):
+        return {
+            "time": time.time(),
+            "iperf_mbps": self.iperf.stats(),
+            "packets": self.packets.snapshot(),
+            "rtt_ms": self.rtt.stats(),
+            "cwnd": self.cwnd.stats(),
+        }
+
+
+def format_snapshot(snap, window):
+    now = snap["time"]
+    fields = [time.strftime("%H:%M:%S", time.localtime(now))]
+    iperf = snap["iperf_mbps"]
+    if iperf["count"]:
+        fields.append(
+            f"iperf {iperf['mean']:6.1f} Mbps [{iperf['min']:.0f}-{iperf['max']:.0f}]"
+        )
+    packets = snap["packets"]
+    sent = packets["sent_mbps"]
+    if sent["count"]:
+        fields.append(f"sent {sent['rate']:6.1f} Mbps")
+    transit = packets["transit_ms"]
+    if transit["count"]:
+        fields.append(
+            f"transit {transit['mean']:.1f}ms [{transit['min']:.1f}-{transit['max']:.1f}]"
+            f" jitter {packets['jitter_ms']:.2f}ms"
+        )
+    rtt, cwnd = snap["rtt_ms"], snap["cwnd"]
+    if rtt["count"]:
+        fields.append(f"rtt {rtt['mean']:.1f}ms [{rtt['min']:.1f}-{rtt['max']:.1f}]")
+    if cwnd["count"]:
+        fields.append(f"cwnd {cwnd['mean']:.0f}")
+    # A log that stopped growing is as telling as a throughput drop
+    stale = [
+        name
+        for name, stats in (("iperf", iperf), ("packet", sent), ("ss", rtt))
+        if stats["count"] and now - stats["last"] > window
+    ]
+    if stale:
+        fields.append("stalled: " + ",".join(stale))
+    return " | ".join(fields)
+
+
+def serve(port, latest):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps(latest.get("snapshot", {})).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving the latest statistics on http://localhost:{port}/")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Follow the logs of a running test")
+    parser.add_argument("-a", "--auto", help="file prefix in output/, e.g. cubic-1")
+    parser.add_argument("-p", "--packet_log", help="packet.log of the emulator")
+    parser.add_argument("-i", "--iperf_log")
+    parser.add_argument("--ss_log")
+    parser.add_argument("--client_pcap", help="capture being written by tcpdump -U")
+    parser.add_argument("--port", type=int, help="sender port, default the latest")
+    parser.add_argument("--dst_port", type=int, default=5257)
+    parser.add_argument("-w", "--window", type=float, default=5, help="s")
+    parser.add_argument("--interval", type=float, default=1, help="s")
+    parser.add_argument("--from_end", action="store_true", help="skip existing data")
+    parser.add_argument("--once", action="store_true", help="read what is there, exit")
+    parser.add_argument("--serve", type=int, metavar="PORT", help="serve JSON")
+    args = parser.parse_args()
+
+    root_dir = "output"
+    if args.auto != None:
+        defaults = {
+            "iperf_log": f"{args.auto}-iperf-client.json",
+            "ss_log": f"{args.auto}-ss-server.log",
+            "client_pcap": f"{args.auto}-capture-client.pcap",
+        }
+        for key, suffix in defaults.items():
+            if getattr(args, key) is None:
+                setattr(args, key, os.path.join(root_dir, suffix))
+
+    run = RunStats(args)
+    if not run.followers:
+        print("No log file specified")
+        exit(1)
+
+    latest = {}
+    if args.serve:
+        serve(args.serve, latest)
+    try:
+        first = True
+        while True:
+            begin = time.monotonic()
+            # Catch up on data written before the start in one go, then read
+            # until the logs are drained or the interval is used up, a log
+            # may grow by more than one chunk per interval
+            while run.poll():
+                if not (args.once or first) and (
+                    time.monotonic() - begin >= args.interval
+                ):
+                    break
+            first = False
+            latest["snapshot"] = run.snapshot()
+            print(format_snapshot(latest["snapshot"], args.window), flush=True)
+            if args.once:
+                break
+            time.sleep(max(args.interval - (time.monotonic() - begin), 0))
+    except KeyboardInterrupt:
+        pass
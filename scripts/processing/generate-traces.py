@@ -0,0 +1,75 @@
+# Generate synthetic emulator traces for stress testing
+# Handovers are drawn from a model fitted to the traces in input/ (see
+# ho_model.py), at the corpus's rate, at --rate HO per second, or from a
+# link-state model with --dwell or a --scenario preset. The non-HO lines of
+# --template (INIT, SOL_INIT_SCHED) are kept, with end_ms after the last HO.
+#   python generate-traces.py -n 1000 10000 100000 --rate 2
+#   python generate-traces.py -n 1000000 --scenario mmw -o output/traces
+# Traces over SCHEDULER_MAX_EVENT scheduler events are still written, the
+# emulator drops the events past the limit; build-trace.py reports them.
+import os
+import glob
+import argparse
+
+from ho_model import SCENARIOS, fit, n_actions, sample, sample_link_state
+from ho_model import ho_end_ms, write_ho_trace
+from traces import INT_MAX, SCHEDULER_MAX_EVENT
+
+
+def template_header(fname):
+    """Non-HO lines of a trace, CMD lines are left to generate_input.py."""
+    with open(fname, "r") as f:
+        lines = f.readlines()
+    return [l for l in lines if l.split(",")[1] not in ("HO", "CMD")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic traces")
+    parser.add_argument("-n", "--events", nargs="+", type=int, default=[1000])
+    parser.add_argument("--rate", type=float, help="HO per second")
+    parser.add_argument("--dwell", nargs=2, type=float, metavar=("LTE", "NR"))
+    parser.add_argument("--scenario", choices=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fit", nargs="+", help="traces to fit, default input/")
+    parser.add_argument("--template", default="../../input/trace-1.csv")
+    parser.add_argument("-o", "--output", default="output/traces")
+    parser.add_argument("--show_model", action="store_true")
+    args = parser.parse_args()
+
+    fnames = args.fit or sorted(glob.glob("../../input/trace-[0-9]*.csv"))
+    model = fit(fnames)
+    if args.show_model:
+        print(f"Fitted {model.traces} of {len(fnames)} traces")
+        print(model.summary())
+
+    dwell = args.dwell or (SCENARIOS[args.scenario] if args.scenario else None)
+    if dwell is not None and args.rate is not None:
+        print("Error: --rate is for the fitted model, not --dwell/--scenario")
+        exit(1)
+    if dwell is not None:
+        name = args.scenario or f"dwell{dwell[0]:g}-{dwell[1]:g}"
+    elif args.rate is not None:
+        name = f"rate{args.rate:g}"
+    else:
+        name = "corpus"
+    header = template_header(args.template)
+
+    os.makedirs(args.output, exist_ok=True)
+    for n in args.events:
+        if dwell is not None:
+            ho = sample_link_state(model, n, dwell, args.seed)
+        else:
+            ho = sample(model, n, args.seed, args.rate)
+        fname = os.path.join(args.output, f"trace-{name}-{n}-{args.seed}.csv")
+        end_ms = ho_end_ms(ho)
+        if end_ms > INT_MAX:
+            print(f"Error: {n} HO end at {end_ms} ms, over INT_MAX, raise --rate")
+            continue
+        end_ms = write_ho_trace(fname, ho, header)
+        actions = n_actions(ho)
+        print(
+            f"Save to {fname}: {n} HO in {end_ms / 1000:.0f} s "
+            f"({n / end_ms * 1000:.2f} HO/s), {actions} HO scheduler events"
+        )
+        if actions > SCHEDULER_MAX_EVENT:
+            print(f">   over SCHEDULER_MAX_EVENT ({SCHEDULER_MAX_EVENT})")
@@ -0,0 +1,201 @@
+import numpy as np
+
+from traces import LTE_MARK, NR_MARK, read_trace
+
+# Handover models for synthetic emulator traces. A model is fitted from the
+# HO events of real traces (input/trace-*.csv) and sampled in one go with
+# numpy, so a trace of 10^6 handovers takes about as long to draw as one of
+# 10^3. Marks follow a two-state Markov chain over consecutive handovers;
+# inter-arrival times are either resampled from the corpus (scaled to a
+# target rate) or the dwell times of a Markov link-state model.
+MARKS = (LTE_MARK, NR_MARK)
+
+# HO columns, in trace order after time_ms and mark
+HO_COLUMNS = ("gap_ms", "reord_cnt", "reord_offset", "loss")
+# Time the INIT lines run past the last HO gap
+TAIL_MS = 10000
+
+# Mean dwell (ms) on each mark for the link-state model. Rough figures:
+# NR small cells along a track at 300 km/h, and a dense mmWave deployment
+# where beams and cells change every few hundred ms.
+SCENARIOS = {
+    "hsr": (3000, 1500),
+    "mmw": (600, 250),
+}
+
+
+class HOModel:
+    def __init__(self, iat_ms, rows, switch, first, traces):
+        self.iat_ms = iat_ms  # inter-arrival times (ms)
+        self.rows = rows  # mark -> (n, 4) array of HO_COLUMNS
+        self.switch = switch  # mark -> P(next HO targets the other mark)
+        self.first = first  # P(first HO targets NR_MARK)
+        self.traces = traces  # traces fitted, with no error and HO on queue 0
+
+    def mean_iat(self):
+        return float(np.mean(self.iat_ms))
+
+    def summary(self):
+        lines = [
+            f"{len(self.iat_ms)} intervals, mean {self.mean_iat():.0f} ms",
+        ]
+        for mark in MARKS:
+            rows = self.rows[mark]
+            lines.append(
+                f"mark {mark}: {len(rows)} HO, switch {self.switch[mark]:.2f}, "
+                f"gap {np.mean(rows[:, 0]):.1f} ms, "
+                f"reordering {np.mean(rows[:, 1] > 0):.2f}, "
+                f"loss {np.mean(rows[:, 3] > 0):.2f}"
+            )
+        return "\n".join(lines)
+
+
+def fit(fnames):
+    """HOModel of the HO events of queue 0 in the traces."""
+    iat, rows = [], {mark: [] for mark in MARKS}
+    switches = {mark: [0, 0] for mark in MARKS}
+    firsts = []
+    traces = 0
+    for fname in fnames:
+        events, errors = read_trace(fname)
+        if errors:
+            print(f"Error: {fname}: {errors[0]}")
+            continue
+        ho = [e for e in events if e.kind == "HO" and e.params["queue"] == 0]
+        if not ho:
+            continue
+        traces += 1
+        times = [e.time_ms for e in ho]
+        iat.extend(np.diff(times).tolist())
+        trace_marks = [e.params["mark"] for e in ho]
+        firsts.append(trace_marks[0])
+        for prev, mark in zip(trace_marks, trace_marks[1:]):
+            switches[prev][0] += prev != mark
+            switches[prev][1] += 1
+        for e, mark in zip(ho, trace_marks):
+            rows[mark].append([e.params[c] for c in HO_COLUMNS])
+    if len(iat) == 0:
+        raise ValueError("no trace with two or more HO to fit")
+    rows = {
+        mark: np.array(r, dtype=np.int64).reshape(-1, len(HO_COLUMNS))
+        for mark, r in rows.items()
+    }
+    # A mark never seen borrows the other's parameters
+    for mark, other in ((LTE_MARK, NR_MARK), (NR_MARK, LTE_MARK)):
+        if len(rows[mark]) == 0:
+            rows[mark] = rows[other]
+    switch = {
+        mark: (n_switch / n if n else 0.5) for mark, (n_switch, n) in switches.items()
+    }
+    first = np.mean(np.array(firsts) == NR_MARK)
+    return HOModel(np.array(iat, dtype=np.int64), rows, switch, first, traces)
+
+
+def _runs(rng, n, first, switch):
+    # Alternating runs of one mark, geometric in length with the mark's
+    # probability of switching, cut to n marks
+    p = {mark: min(max(switch[mark], 1 / max(n, 1)), 1.0) for mark in MARKS}
+    start = NR_MARK if rng.random() < first else LTE_MARK
+    other = {LTE_MARK: NR_MARK, NR_MARK: LTE_MARK}
+    mean_run = (1 / p[LTE_MARK] + 1 / p[NR_MARK]) / 2
+    k = int(n / mean_run) + 16
+    while True:
+        run_marks = np.where(np.arange(k) % 2 == 0, start, other[start])
+        lengths = np.where(
+            run_marks == LTE_MARK,
+            rng.geometric(p[LTE_MARK], k),
+            rng.geometric(p[NR_MARK], k),
+        )
+        if lengths.sum() >= n:
+            return np.repeat(run_marks, lengths)[:n]
+        k *= 2
+
+
+def _columns(rng, model, marks):
+    # Resample whole rows per mark, so gap, reordering and loss keep the
+    # correlation they have in the corpus
+    out = np.empty((len(marks), len(HO_COLUMNS)), dtype=np.int64)
+    for mark in MARKS:
+        at = np.flatnonzero(marks == mark)
+        rows = model.rows[mark]
+        out[at] = rows[rng.integers(0, len(rows), len(at))]
+    return out
+
+
+def _times(iat, gap, start_ms):
+    # A HO can only start once the previous one has resumed the queue
+    iat = iat.astype(np.int64)
+    iat[1:] = np.maximum(iat[1:], gap[:-1] + 1)
+    return start_ms + np.cumsum(iat)
+
+
+def sample(model, n, seed=0, rate=None, start_ms=5000):
+    """n HO of the fitted model, rate in HO per second or the corpus's.
+
+    Returns a dict of arrays: time_ms, mark and the HO_COLUMNS.
+    """
+    rng = np.random.default_rng(seed)
+    marks = _runs(rng, n, model.first, model.switch)
+    columns = _columns(rng, model, marks)
+    iat = model.iat_ms[rng.integers(0, len(model.iat_ms), n)].astype(float)
+    if rate is not None:
+        iat *= 1000 / rate / model.mean_iat()
+    iat = np.maximum(np.rint(iat), 1)
+    ho = {"time_ms": _times(iat, columns[:, 0], start_ms), "mark": marks}
+    ho.update((c, columns[:, i]) for i, c in enumerate(HO_COLUMNS))
+    return ho
+
+
+def sample_link_state(model, n, dwell_ms, seed=0, start_ms=5000):
+    """n HO of a two-state link model with exponential dwell times.
+
+    dwell_ms is the mean dwell on (LTE_MARK, NR_MARK); every change of state
+    is a HO to the other mark. Gaps, reordering and loss come from the
+    fitted model.
+    """
+    rng = np.random.default_rng(seed)
+    # Emulation starts on LTE_MARK (INIT), the first HO moves to NR_MARK
+    marks = np.where(np.arange(n) % 2 == 0, NR_MARK, LTE_MARK)
+    leaving = np.where(marks == NR_MARK, dwell_ms[0], dwell_ms[1])
+    iat = np.maximum(np.rint(rng.exponential(leaving)), 1)
+    columns = _columns(rng, model, marks)
+    ho = {"time_ms": _times(iat, columns[:, 0], start_ms), "mark": marks}
+    ho.update((c, columns[:, i]) for i, c in enumerate(HO_COLUMNS))
+    return ho
+
+
+def n_actions(ho):
+    """Scheduler events the HO add, as traces.expand_event counts them."""
+    drop = (ho["reord_cnt"] > 0) | (ho["loss"] > 0)
+    return int(3 * len(ho["time_ms"]) + drop.sum() + (ho["reord_cnt"] > 0).sum())
+
+
+def ho_end_ms(ho, tail_ms=TAIL_MS):
+    """end_ms of the INIT lines, tail_ms after the last HO gap."""
+    if len(ho["time_ms"]) == 0:
+        return tail_ms
+    return int(ho["time_ms"][-1]) + int(ho["gap_ms"][-1]) + tail_ms
+
+
+def write_ho_trace(fname, ho, header, tail_ms=TAIL_MS, chunk_rows=1_000_000):
+    """Write a trace of the HO after the header lines, return its end_ms.
+
+    INIT lines of the header get end_ms from ho_end_ms.
+    """
+    n = len(ho["time_ms"])
+    end_ms = ho_end_ms(ho, tail_ms)
+    with open(fname, "w") as f:
+        for line in header:
+            tokens = line.rstrip("\r\n").split(",")
+            if tokens[1] == "INIT":
+                tokens[-1] = str(end_ms)
+            f.write(",".join(tokens) + "\n")
+        for start in range(0, n, chunk_rows):
+            end = min(start + chunk_rows, n)
+            columns = [ho[c][start:end].tolist() for c in ("time_ms", "mark")]
+            columns += [ho[c][start:end].tolist() for c in HO_COLUMNS]
+            f.writelines(
+                f"{t},HO,0,{m},{g},{rc},{ro},{loss}\n"
+                for t, m, g, rc, ro, loss in zip(*columns)
+            )
+    return end_ms
@@ -0,0 +1,174 @@
+# Ingest every {algo}-{id} run in output/ into the results store
+# KPIs (kpis.run_metrics) and binned series of each run are computed once,
+# across a process pool, and stored in output/results.db keyed by trace,
+# algorithm, variant and emulator build. The build is the one
+# batch_run_iperf3.sh recorded in {algo}-{id}-build.txt; runs without it get
+# --build, else the current emulator binary. Runs already ingested with the
+# same logs and parameters are skipped; changed ones are replaced.
+#   python ingest-results.py
+#   python ingest-results.py --build m2ho-v2 -v cubic m_cubic
+import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cache import cached, file_digest
+from kpis import run_metrics
+from runs import discover_runs, load_thuput, parse_trace, scenario_of
+from ss_log import parse_ss_log
+from warehouse import BUILD_LOG, DB_FILE, connect, emulator_build, ingested
+from warehouse import params_key, read_build, split_variant, store_run
+
+# ss fields stored as series, binned like the iperf3 intervals
+SS_SERIES = ("cwnd", "rtt")
+SERIES_STEP = 0.1  # s
+
+
+def ss_frame(ss_log):
+    # As parse_ss of parse-logs.py, so both share the "ss" cache entries
+    df = parse_ss_log(ss_log)
+    df["time"] = df.epoch - df.epoch.min()
+    return df
+
+
+def binned(name, times, values, step=SERIES_STEP):
+    """Mean of values per time bin, as (name, time, value) rows."""
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    keep = ~np.isnan(values)
+    bins = np.floor(times[keep] / step).astype(np.int64)
+    uniq, inverse = np.unique(bins, return_inverse=True)
+    sums = np.bincount(inverse, weights=values[keep])
+    counts = np.bincount(inverse)
+    return pd.DataFrame({"name": name, "time": uniq * step, "value": sums / counts})
+
+
+def run_series(iperf_log, trace, ss_log, time_range):
+    df = load_thuput(iperf_log, time_range)
+    frames = [binned("throughput", df.time, df.throughput)]
+    if ss_log is not None:
+        df_ss = cached("ss", ss_log, ss_frame, time_range=time_range)
+        for name in SS_SERIES:
+            if name not in df_ss.columns:
+                continue
+            values = df_ss[name]
+            if values.dtype.kind not in "iuf":
+                # rtt:<mean>/<var>
+                values = pd.to_numeric(
+                    values.astype(str).str.split("/").str[0], errors="coerce"
+                )
+            frames.append(binned(name, df_ss.time, values))
+    ho_times, target_links = parse_trace(trace)
+    ho = pd.DataFrame({"name": "ho", "time": ho_times, "value": target_links})
+    frames.append(ho[ho.time.between(*time_range)])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _ingest(job):
+    run, ss_log, kwargs = job
+    try:
+        kpis = run_metrics(*run, **kwargs)
+        series = run_series(run[2], run[3], ss_log, kwargs["time_range"])
+        return kpis, series
+    except Exception as e:
+        print(f"Error: {run[2]}: {e}")
+        return None
+
+
+def store_all(conn, records, results):
+    # Stored as they come in, an interrupted ingest keeps the runs done
+    stored = 0
+    for record, result in zip(records, results):
+        if result is not None:
+            store_run(conn, record, *result)
+            stored += 1
+    return stored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest runs into the results store")
+    parser.add_argument("--root_dir", default="output")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("-v", "--variants", nargs="+", help="e.g. cubic m_cubic")
+    parser.add_argument("-r", "--run_ids", nargs="+")
+    parser.add_argument("--build", help="build label of runs without a build.txt")
+    parser.add_argument("--emulator", default="../../build/emulator")
+    parser.add_argument("-b", "--begin", type=float, default=0)
+    parser.add_argument("-e", "--end", type=float, default=1200)
+    parser.add_argument("-w", "--windowsz", type=float, default=5, help="s")
+    parser.add_argument(
+        "--stable", type=float, nargs=2, default=[170, 360], help="sub6 mmw Mbps"
+    )
+    parser.add_argument("--thresh", type=float, default=40, help="ramp up limit, s")
+    parser.add_argument("--force", action="store_true", help="re-ingest every run")
+    parser.add_argument("-j", "--workers", type=int)
+    args = parser.parse_args()
+
+    runs = discover_runs(args.root_dir, args.variants, args.run_ids)
+    if not runs:
+        print(f"Error: no runs found in {args.root_dir}")
+        exit(1)
+    default_build = args.build or emulator_build(args.emulator)
+
+    kwargs = {
+        "time_range": (args.begin, args.end),
+        "windowsz": args.windowsz,
+        "stable_thuput": tuple(args.stable),
+        "thresh": args.thresh,
+    }
+    params = params_key(kwargs)
+    conn = connect(args.db)
+    done = ingested(conn)
+
+    jobs, records = [], []
+    unlabelled = 0
+    for run in runs:
+        run_id, name, iperf_log, trace = run
+        algo, variant = split_variant(name)
+        ss_log = os.path.join(args.root_dir, f"{name}-{run_id}-ss-server.log")
+        if not os.path.exists(ss_log):
+            ss_log = None
+        trace_sha = file_digest(trace)[:16]
+        sources = [file_digest(iperf_log), trace_sha]
+        if ss_log is not None:
+            sources.append(file_digest(ss_log))
+        source_sha = "-".join(s[:16] for s in sources)
+        # The same logs are stored once, under whichever build they came with
+        if not args.force and done.get(source_sha) == params:
+            continue
+        build = read_build(os.path.join(args.root_dir, f"{name}-{run_id}-{BUILD_LOG}"))
+        if build is None:
+            build = default_build
+            unlabelled += 1
+        record = {
+            "trace": f"trace-{run_id}",
+            "trace_sha": trace_sha,
+            "algo": algo,
+            "variant": variant,
+            "build": build,
+            "run_id": run_id,
+            "scenario": scenario_of(run_id),
+            "name": name,
+            "source_sha": source_sha,
+            "params": params,
+        }
+        jobs.append((run, ss_log, kwargs))
+        records.append(record)
+    print(f"{len(runs)} runs, {len(runs) - len(jobs)} already ingested")
+    if unlabelled:
+        print(
+            f"Warning: {unlabelled} runs without a {BUILD_LOG}, build {default_build}"
+        )
+
+    begin = time.perf_counter()
+    if args.workers == 1 or len(jobs) <= 1:
+        stored = store_all(conn, records, map(_ingest, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            stored = store_all(conn, records, pool.map(_ingest, jobs))
+    conn.close()
+    print(f"Ingested {stored} runs in {time.perf_counter() - begin:.1f}s")
+    print(f"Save to {args.db}")
@@ -0,0 +1,186 @@
+import json
+import re
+
+import numpy as np
+
+# iperf3 -J writes one JSON document {"start", "intervals", "end"}; with
+# --json-stream (3.17+) one {"event", "data"} object per line instead. Both
+# are read object by object: only the start section and the requested
+# numbers of each interval are kept, and a log cut short by a killed iperf3
+# yields every interval written before the cut.
+CHUNK_SIZE = 1024 * 1024
+
+# Interval fields, per stream and in the sum. TCP senders report
+# retransmits, snd_cwnd and rtt (us); UDP receivers jitter_ms and losses.
+FIELDS = (
+    "start",
+    "end",
+    "bytes",
+    "bits_per_second",
+    "retransmits",
+    "snd_cwnd",
+    "snd_wnd",
+    "rtt",
+    "rttvar",
+    "omitted",
+    "jitter_ms",
+    "lost_packets",
+    "packets",
+    "lost_percent",
+)
+
+WHITESPACE = re.compile(r"[ \t\n\r]*")
+# iperf3 --json-stream output, one {"event": ...} object per line
+JSON_STREAM = re.compile(r'\s*\{\s*"event"')
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Decode consecutive JSON values from a file without loading all of it."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        data = self.f.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, "" at the end of the file."""
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ""
+
+    def take(self, char):
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode one value, raises ValueError if the file ends inside it."""
+        self.peek()
+        while True:
+            try:
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end < len(self.buf) or not self.fill():
+                self.pos = end
+                return obj
+
+
+class _Intervals:
+    """Requested fields of each interval, as lists of numbers."""
+
+    def __init__(self, fields):
+        self.fields = fields
+        self.sum = {k: [] for k in fields}
+        self.streams = {k: [] for k in fields}
+
+    def add(self, interval):
+        total = interval.get("sum", {})
+        streams = interval.get("streams", [])
+        for k in self.fields:
+            self.sum[k].append(total.get(k, np.nan))
+            self.streams[k].append([s.get(k, np.nan) for s in streams])
+
+    def arrays(self):
+        n_streams = max((len(row) for row in self.streams["start"]), default=0)
+        sums, streams = {}, {}
+        for k in self.fields:
+            col = np.array(self.sum[k], dtype=np.float64)
+            rows = np.full((col.size, n_streams), np.nan)
+            for i, row in enumerate(self.streams[k]):
+                rows[i, : len(row)] = row
+            # Drop fields this test type does not report
+            if not (np.isnan(col).all() and np.isnan(rows).all()):
+                sums[k], streams[k] = col, rows
+        return sums, streams
+
+
+def _read_document(reader, intervals):
+    start, truncated = {}, False
+    reader.take("{")
+    try:
+        while reader.peek() not in ("}", ""):
+            key = reader.value()
+            reader.take(":")
+            if key == "intervals":
+                reader.take("[")
+                while reader.peek() not in ("]", ""):
+                    intervals.add(reader.value())
+                    if reader.peek() == ",":
+                        reader.pos += 1
+                reader.take("]")
+            elif key == "start":
+                start = reader.value()
+            else:
+                reader.value()
+            if reader.peek() == ",":
+                reader.pos += 1
+        reader.take("}")
+    except ValueError:
+        truncated = True
+    return start, truncated
+
+
+def _read_json_stream(reader, intervals):
+    start, truncated = {}, False
+    try:
+        while reader.peek() != "":
+            event = reader.value()
+            if event.get("event") == "start":
+                start = event["data"]
+            elif event.get("event") == "interval":
+                intervals.add(event["data"])
+    except ValueError:
+        truncated = True
+    return start, truncated
+
+
+def read_iperf_log(fname, fields=FIELDS, chunk_size=CHUNK_SIZE):
+    """Extract interval data of an iperf3 JSON log as NumPy arrays.
+
+    Returns a dict with
+      start: the start section (connections, test_start, timestamp)
+      sum: field -> array of the per-interval sum
+      streams: field -> (interval, stream) array, one column per -P stream
+      truncated: True if the log ended before the document was complete
+    Fields missing from every interval are left out, NaN where missing in some.
+    """
+    intervals = _Intervals(fields)
+    with open(fname, "r") as f:
+        reader = _Reader(f, chunk_size)
+        reader.peek()
+        if JSON_STREAM.match(reader.buf, reader.pos):
+            start, truncated = _read_json_stream(reader, intervals)
+        else:
+            start, truncated = _read_document(reader, intervals)
+    sums, streams = intervals.arrays()
+    return {"start": start, "sum": sums, "streams": streams, "truncated": truncated}
+
+
+def iperf_throughput(fname):
+    """Return (interval mid-times in s, throughput in Mbps) of the sum."""
+    log = read_iperf_log(fname, fields=("start", "end", "bits_per_second"))
+    if log["truncated"]:
+        print(f"Warning: {fname} is truncated, using the complete intervals")
+    s = log["sum"]
+    if not s:
+        return np.array([]), np.array([])
+    return (s["start"] + s["end"]) / 2, s["bits_per_second"] / 1e6
@@ -0,0 +1,93 @@
+import numpy as np
+
+# RFC 3550 interarrival jitter: J += (|D| - J) / 16
+RFC3550_GAIN = 1 / 16
+
+# Block length is chosen so decay**-block stays below e**_MAX_EXP
+_MAX_EXP = 30.0
+
+
+def linear_recurrence(x, decay, init=0.0):
+    """Solve y[n] = decay * y[n-1] + x[n] over a whole array.
+
+    The array is cut into blocks short enough that decay**-block fits in a
+    float64. Inside a block the zero-state response is a scaled cumsum, and the
+    state carried across blocks is a geometric tail that drops below machine
+    precision after a couple of blocks.
+    """
+    x = np.array(x, dtype=np.float64)
+    n = x.size
+    if n == 0:
+        return x
+    x[0] += decay * init
+    if decay == 0:
+        return x
+
+    block = int(_MAX_EXP / -np.log(decay)) if decay < 1 else n
+    block = max(1, min(n, block))
+    nblocks = -(-n // block)
+    padded = np.zeros(nblocks * block)
+    padded[:n] = x
+    padded = padded.reshape(nblocks, block)
+
+    k = np.arange(block)
+    local = np.cumsum(padded * decay ** -k, axis=1) * decay**k
+
+    # State entering block b is sum_m (decay**block)**m * ends[b-1-m]
+    ends = local[:, -1]
+    carry = np.zeros(nblocks)
+    carry[1:] = ends[:-1]
+    step = decay**block
+    scale, m = step, 1
+    while scale > np.finfo(np.float64).eps and m < nblocks - 1:
+        carry[m + 1 :] += scale * ends[: -m - 1]
+        scale *= step
+        m += 1
+
+    y = local + carry[:, None] * decay ** (k + 1)
+    return y.reshape(-1)[:n]
+
+
+def smooth(x, gain=RFC3550_GAIN, init=0.0):
+    """Exponential smoothing y[n] = y[n-1] + gain * (x[n] - y[n-1])."""
+    return linear_recurrence(gain * np.asarray(x, dtype=np.float64), 1 - gain, init)
+
+
+# Jitter over per-packet transit times (receive - send)
+def transit_jitter(transit, gain=RFC3550_GAIN):
+    """Return (jitter, valid) for an array of transit times.
+
+    The first sample only seeds the reference transit and reports 0. Later
+    samples with negative transit are out of order and cannot be sorted, so
+    they leave J untouched, report 0 and are flagged False in valid.
+    """
+    transit = np.asarray(transit, dtype=np.float64)
+    jitter = np.zeros(transit.size)
+    valid = transit >= 0
+    if transit.size < 2:
+        return jitter, valid
+    used = valid.copy()
+    used[0] = True
+    t = transit[used]
+    j = np.empty(t.size)
+    j[0] = 0
+    j[1:] = smooth(np.abs(np.diff(t)), gain)
+    jitter[used] = j
+    jitter[0] = 0
+    return jitter, valid
+
+
+# Jitter over inter-arrival times of a single packet stream
+def iat_jitter(arrival):
+    """Return (iat, jitter) for sorted arrival times, in the input's unit.
+
+    The first packet has no previous arrival, so its IAT is 0 and the first
+    difference is taken against that 0, as compute-iat.py always did.
+    """
+    arrival = np.asarray(arrival, dtype=np.float64)
+    iat = np.zeros(arrival.size)
+    iat[1:] = np.diff(arrival)
+    jitter = np.zeros(arrival.size)
+    if arrival.size > 1:
+        jitter[1:] = smooth(np.abs(np.diff(iat)))
+    return iat, jitter
@@ -0,0 +1,75 @@
+# Handover KPIs of one run, shared by batch-metrics.py and ingest-results.py
+import numpy as np
+import pandas as pd
+
+from metrics import (
+    calculate_ho_percentile,
+    calculate_ho_thuput,
+    calculate_link_stats,
+    calculate_rampup_time,
+    fill_never_reached,
+    filter_time_range,
+)
+from runs import load_thuput, parse_trace, scenario_of
+from timeseries import TimeSeries, ho_type_mask
+
+LINK_NAMES = ["all", "sub6", "mmw"]
+HO_TYPES = [[1, 1], [1, 2], [2, 2], [2, 1], [0, 0]]
+
+
+def run_metrics(
+    run_id,
+    variant,
+    iperf_log,
+    trace,
+    time_range=(0, 1200),
+    windowsz=5,
+    stable_thuput=(170, 360),
+    thresh=40,
+):
+    """Metrics of one run, one row per (group, metric)."""
+    df_iperf = load_thuput(iperf_log, time_range)
+    thuput = TimeSeries(df_iperf.time, df_iperf.throughput)
+    ho_times, target_links = parse_trace(trace)
+    ho_times, target_links = filter_time_range(ho_times, target_links, *time_range)
+    rows = [("all", "thuput_mean", thuput.values.mean())]
+
+    # Every handover once, sliced per type below
+    ho_thuputs = calculate_ho_thuput(ho_times, thuput, windowsz)
+    ho_p5 = calculate_ho_percentile(ho_times, thuput, 5, windowsz)
+    stable = np.asarray((0,) + tuple(stable_thuput))[target_links]
+    rampup, never, full = calculate_rampup_time(ho_times, thuput, stable, thresh)
+    filled = np.full(rampup.shape, np.nan)
+    for ho_type in HO_TYPES:
+        mask = ho_type_mask(target_links, ho_type)
+        group = f"{LINK_NAMES[ho_type[0]]}-{LINK_NAMES[ho_type[1]]}"
+        rows.append((group, "ho_count", mask.sum()))
+        if not mask.any():
+            continue
+        filled[mask] = fill_never_reached(rampup[mask], never[mask], thresh)
+        rows += [
+            (group, "ho_thuput_mean", np.nanmean(ho_thuputs[mask])),
+            # Low tail of the per-handover window means
+            (group, "ho_thuput_p5", np.nanpercentile(ho_thuputs[mask], 5)),
+            (group, "ho_window_p5_mean", np.nanmean(ho_p5[mask])),
+            (group, "rampup_mean", np.mean(filled[mask])),
+            (group, "rampup_never", never[mask].sum()),
+            (group, "rampup_full", full[mask].sum()),
+        ]
+
+    link_summary = calculate_link_stats({variant: thuput}, ho_times, target_links)
+    for _, link in link_summary.iterrows():
+        group = LINK_NAMES[int(link["link"])]
+        for metric in ["count", "mean", "max", "p5", "p50", "p95", "tw_mean"]:
+            rows.append((group, f"link_{metric}", link[metric]))
+
+    return pd.DataFrame(
+        {
+            "scenario": scenario_of(run_id),
+            "run_id": run_id,
+            "variant": variant,
+            "group": [r[0] for r in rows],
+            "metric": [r[1] for r in rows],
+            "value": np.array([r[2] for r in rows], dtype=np.float64),
+        }
+    )
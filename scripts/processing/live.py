@@ -0,0 +1,395 @@
+import os
+import re
+import json
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from capture import PCAP_MAGIC, decode_packets, walk_pcap
+from iperf_log import JSON_STREAM, WHITESPACE
+from jitter import RFC3550_GAIN
+from packet_log import parse_packet_records
+from ss_log import tokenize_ss_line
+
+# Follow the logs of a run while they are written. Every poll reads only the
+# bytes appended since the last one and every sample updates the statistics
+# in O(1) (amortized for the window eviction), so a follower keeps up with a
+# full-rate run however long it lasts.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_INTERVALS = re.compile(r'"intervals"\s*:\s*\[')
+_TIMESECS = re.compile(r'"timesecs"\s*:\s*(\d+)')
+# The start event of an iperf3 log is well within its first bytes
+_START_HEAD = 64 * 1024
+
+
+class Follower:
+    """Bytes appended to a file since the last read, cut at the last newline.
+
+    A file that does not exist yet reads as empty. A file that shrinks or is
+    replaced (packet.log moved away and a new run started) is read again from
+    the start and generation is bumped, so callers can drop their state.
+    """
+
+    def __init__(self, fname, from_end=False, lines=True, chunk_size=CHUNK_SIZE):
+        self.fname = fname
+        self.lines = lines
+        self.chunk_size = chunk_size
+        self.pos = 0
+        self.inode = None
+        self.partial = b""
+        self.generation = 0
+        self.from_end = from_end
+        self.skip = False
+
+    def read(self):
+        try:
+            st = os.stat(self.fname)
+        except FileNotFoundError:
+            return b""
+        if self.inode is None:
+            self.inode = st.st_ino
+            if self.from_end and st.st_size:
+                self.pos = st.st_size
+                with open(self.fname, "rb") as f:
+                    f.seek(self.pos - 1)
+                    # Started mid-line, the rest of that line is not a record
+                    self.skip = self.lines and f.read(1) != b"\n"
+        elif st.st_ino != self.inode or st.st_size < self.pos:
+            self.inode, self.pos, self.partial = st.st_ino, 0, b""
+            self.skip = False
+            self.generation += 1
+        if st.st_size <= self.pos:
+            return b""
+        with open(self.fname, "rb") as f:
+            f.seek(self.pos)
+            data = f.read(self.chunk_size)
+        self.pos += len(data)
+        if not self.lines:
+            return data
+        data = self.partial + data
+        if self.skip:
+            if b"\n" not in data:
+                self.partial = b""
+                return b""
+            data = data[data.index(b"\n") + 1 :]
+            self.skip = False
+        cut = data.rfind(b"\n") + 1
+        self.partial = data[cut:]
+        return data[:cut]
+
+
+class Window:
+    """Count, sum, mean, std, min and max of the samples of the last span s.
+
+    Samples must come in time order. Min and max are kept in monotonic
+    deques, so add() is amortized O(1) however many samples the span holds.
+    """
+
+    def __init__(self, span):
+        self.span = span
+        self.samples = deque()
+        self.lows = deque()
+        self.highs = deque()
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self.last = None
+
+    def add(self, t, value):
+        self.samples.append((t, value))
+        self.sum += value
+        self.sumsq += value * value
+        while self.lows and self.lows[-1][1] > value:
+            self.lows.pop()
+        self.lows.append((t, value))
+        while self.highs and self.highs[-1][1] < value:
+            self.highs.pop()
+        self.highs.append((t, value))
+        self.last = t
+        self.expire(t)
+
+    def expire(self, now):
+        old = now - self.span
+        while self.samples and self.samples[0][0] <= old:
+            _, value = self.samples.popleft()
+            self.sum -= value
+            self.sumsq -= value * value
+        while self.lows and self.lows[0][0] <= old:
+            self.lows.popleft()
+        while self.highs and self.highs[0][0] <= old:
+            self.highs.popleft()
+        if not self.samples:
+            # Running sums drift over millions of samples, restart from 0
+            self.sum = self.sumsq = 0.0
+
+    def stats(self):
+        n = len(self.samples)
+        if n == 0:
+            return {"count": 0}
+        mean = self.sum / n
+        return {
+            "count": n,
+            "mean": mean,
+            "std": max(self.sumsq / n - mean * mean, 0.0) ** 0.5,
+            "min": self.lows[0][1],
+            "max": self.highs[0][1],
+            "rate": self.sum / self.span,
+            "last": self.last,
+        }
+
+
+class Jitter:
+    """RFC 3550 interarrival jitter updated one transit time at a time."""
+
+    def __init__(self):
+        self.prev = None
+        self.value = 0.0
+
+    def add(self, transit):
+        if self.prev is not None:
+            self.value += (abs(transit - self.prev) - self.value) * RFC3550_GAIN
+        self.prev = transit
+        return self.value
+
+
+class PacketStats:
+    """Sender rate of packet.log and, given client packets, transit and jitter.
+
+    Only the test connection is followed: the port that appeared last, since
+    iperf3 opens the control connection first (see process_server_log).
+    Client packets are paired with the sender's first transmission of the
+    same seq; seqs sent more than once are skipped by Karn's rule, and
+    unmatched sender records are dropped after horizon s.
+    """
+
+    def __init__(self, span, port=None, horizon=10.0):
+        self.span = span
+        self.fixed_port = port
+        self.horizon = horizon
+        self.reset()
+
+    def reset(self):
+        self.port = self.fixed_port
+        self.ports = set()
+        self.prev_seq = None
+        self.sent = Window(self.span)
+        self.transit = Window(self.span)
+        self.jitter = Jitter()
+        self.pending = OrderedDict()  # seq -> [send epoch, retransmitted]
+        self.matched = 0
+        self.retrans = 0
+
+    def add_server(self, records):
+        if self.fixed_port is None and records.size:
+            # A port not seen before takes over as the test connection
+            ports, first = np.unique(records["port"], return_index=True)
+            new = [i for i, p in enumerate(ports.tolist()) if p not in self.ports]
+            if new:
+                latest = max(new, key=lambda i: first[i])
+                self.port = int(ports[latest])
+                self.ports.update(ports.tolist())
+                self.prev_seq = None
+        records = records[records["port"] == self.port]
+        if records.size == 0:
+            return
+        ts = records["ts"] / 1000
+        seq = records["seq"].astype(np.int64)
+        prev = seq[0] if self.prev_seq is None else self.prev_seq
+        advance = (np.diff(seq, prepend=prev)) & 0xFFFFFFFF
+        # Seqs going back are retransmissions, not new data
+        advance[advance >= 2**31] = 0
+        self.prev_seq = int(seq[-1])
+        for t, n, s in zip(ts.tolist(), advance.tolist(), seq.tolist()):
+            self.sent.add(t, n * 8 / 1e6)
+            entry = self.pending.get(s)
+            if entry is None:
+                self.pending[s] = [t, False]
+            else:
+                entry[1] = True
+        self._expire(ts[-1])
+
+    def add_client(self, pkts):
+        for t, s in zip(pkts["epoch"].tolist(), pkts["seq"].tolist()):
+            entry = self.pending.pop(s, None)
+            if entry is None:
+                continue
+            if entry[1]:
+                self.retrans += 1
+                continue
+            transit = (t - entry[0]) * 1000  # ms
+            self.matched += 1
+            self.transit.add(t, transit)
+            self.jitter.add(transit)
+
+    def _expire(self, now):
+        while self.pending:
+            seq, entry = next(iter(self.pending.items()))
+            if entry[0] > now - self.horizon:
+                break
+            del self.pending[seq]
+
+    def snapshot(self):
+        return {
+            "port": self.port,
+            "sent_mbps": self.sent.stats(),
+            "transit_ms": self.transit.stats(),
+            "jitter_ms": self.jitter.value,
+            "matched": self.matched,
+            "retrans": self.retrans,
+        }
+
+
+class PacketLogFollower:
+    """Records appended to a packet.log, see packet_log.py."""
+
+    def __init__(self, fname, from_end=False):
+        self.follower = Follower(fname, from_end)
+
+    def poll(self):
+        return parse_packet_records(self.follower.read())
+
+
+class PcapFollower:
+    """Packets appended to a pcap file (tcpdump -U -w), see capture.py.
+
+    Only the classic pcap format can be followed; records are decoded once
+    complete. Without -U tcpdump writes in buffer-sized bursts.
+    """
+
+    def __init__(self, fname):
+        self.follower = Follower(fname, lines=False)
+        self.header = None
+        self.buf = b""
+        self.generation = 0
+
+    def poll(self):
+        data = self.follower.read()
+        if self.follower.generation != self.generation:
+            self.generation = self.follower.generation
+            self.header, self.buf = None, b""
+        self.buf += data
+        if self.header is None:
+            if len(self.buf) < 24:
+                return None
+            if self.buf[:4] not in PCAP_MAGIC:
+                print(f"Error: {self.follower.fname} is not a pcap file")
+                self.buf = b""
+                return None
+            self.header, self.buf = self.buf[:24], self.buf[24:]
+        buf = self.header + self.buf
+        offsets, lengths, ts, links = walk_pcap(buf)
+        if offsets.size == 0:
+            return None
+        self.buf = buf[offsets[-1] + lengths[-1] :]
+        data = np.frombuffer(buf, dtype=np.uint8)
+        return decode_packets(data, offsets, lengths, ts, links)
+
+
+class IperfFollower:
+    """Intervals appended to an iperf3 log, as (end epoch, sum Mbps).
+
+    Works on --json-stream logs, which get one event per interval. A plain -J
+    log is only written when iperf3 exits, its intervals then arrive at once.
+    """
+
+    def __init__(self, fname, from_end=False):
+        self.follower = Follower(fname, from_end)
+        self.generation = 0
+        self._reset()
+
+    def _reset(self):
+        self.buf = ""
+        self.mode = None
+        self.start = None
+
+    def _values(self):
+        # Complete JSON values of the buffer, in a document up to the closing ]
+        pos = 0
+        while self.mode != "done":
+            pos = WHITESPACE.match(self.buf, pos).end()
+            if self.mode == "document":
+                if self.buf.startswith(",", pos):
+                    pos = WHITESPACE.match(self.buf, pos + 1).end()
+                if self.buf.startswith("]", pos):
+                    # Past the intervals, the rest of the document is not needed
+                    self.mode = "done"
+                    break
+            try:
+                obj, pos = _decoder.raw_decode(self.buf, pos)
+            except json.JSONDecodeError:
+                break
+            yield obj
+        self.buf = self.buf[pos:] if self.mode != "done" else ""
+
+    def poll(self):
+        data = self.follower.read().decode(errors="replace")
+        if self.follower.generation != self.generation:
+            self.generation = self.follower.generation
+            self._reset()
+        self.buf += data
+        if self.mode is None:
+            if JSON_STREAM.match(self.buf):
+                self.mode = "stream"
+            else:
+                found = _INTERVALS.search(self.buf)
+                if found is None:
+                    return []
+                start = _TIMESECS.search(self.buf, 0, found.start())
+                self.start = int(start.group(1)) if start else None
+                self.buf = self.buf[found.end() :]
+                self.mode = "document"
+        intervals = []
+        for obj in self._values():
+            if self.mode == "stream":
+                if obj.get("event") == "start":
+                    self.start = obj["data"]["timestamp"]["timesecs"]
+                elif obj.get("event") == "interval":
+                    intervals.append(obj["data"])
+            else:
+                intervals.append(obj)
+        if self.start is None and intervals:
+            # Followed from the end, the start event was skipped
+            self.start = self._head_start()
+        t0 = self.start or 0
+        return [
+            (t0 + i["sum"]["end"], i["sum"]["bits_per_second"] / 1e6)
+            for i in intervals
+            if "sum" in i
+        ]
+
+    def _head_start(self):
+        # Start time of the run, from the start event at the head of the log
+        try:
+            with open(self.follower.fname, "rb") as f:
+                head = f.read(_START_HEAD).decode(errors="replace")
+        except FileNotFoundError:
+            return None
+        start = _TIMESECS.search(head)
+        return int(start.group(1)) if start else None
+
+
+class SSFollower:
+    """(epoch, fields) of each line appended to a monitor.sh ss log."""
+
+    def __init__(self, fname, from_end=False):
+        self.follower = Follower(fname, from_end)
+
+    def poll(self):
+        rows = []
+        for line in self.follower.read().decode(errors="replace").splitlines():
+            fields = dict(tokenize_ss_line(line))
+            if fields:
+                rows.append((fields["timestamp"] / 1e9, fields))
+        return rows
+
+
+def ss_rtt(fields):
+    """Smoothed RTT in ms of an ss line, rtt:<srtt>/<rttvar>."""
+    rtt = fields.get("rtt")
+    if isinstance(rtt, str):
+        rtt = rtt.split("/")[0]
+    try:
+        return float(rtt)
+    except (TypeError, ValueError):
+        return None
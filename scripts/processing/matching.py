@@ -0,0 +1,80 @@
+import numpy as np
+
+
+def first_by_key(keys, ts):
+    """Return (unique keys, index of the earliest record, record count) per key.
+
+    Ties on ts keep file order, like groupby().min() followed by a stable merge.
+    """
+    order = np.lexsort((ts, keys))
+    sorted_keys = keys[order]
+    head = np.ones(sorted_keys.size, dtype=bool)
+    head[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    starts = np.flatnonzero(head)
+    counts = np.diff(np.append(starts, sorted_keys.size))
+    return sorted_keys[starts], order[starts], counts
+
+
+def lookup(sorted_keys, values):
+    """Return (found, index) of values in a sorted key array."""
+    idx = np.searchsorted(sorted_keys, values)
+    if sorted_keys.size == 0:
+        return np.zeros(idx.size, dtype=bool), idx
+    idx = np.minimum(idx, sorted_keys.size - 1)
+    return sorted_keys[idx] == values, idx
+
+
+def _pair_keys(seq_rank, ack):
+    return (seq_rank.astype(np.uint64) << np.uint64(32)) | (
+        ack.astype(np.uint64) & np.uint64(0xFFFFFFFF)
+    )
+
+
+# Match packets from sender and receiver
+def match_packets(send_ts, send_seq, send_ack, recv_ts, recv_seq, recv_ack):
+    """Pair sender and receiver records by TCP seq in O(n log n).
+
+    Each seq is matched once: the sender's first transmission against the
+    receiver's first copy. Seqs the sender put on the wire more than once are
+    tagged retrans since, by Karn's rule, their transit is ambiguous. ack_ok is
+    False when the receiver's ack matches none of the sender's transmissions
+    of that seq.
+
+    Returns (matched, stats): matched is a dict of arrays sorted by seq, stats
+    a dict of counts.
+    """
+    send_ts, send_seq, send_ack = map(np.asarray, (send_ts, send_seq, send_ack))
+    recv_ts, recv_seq, recv_ack = map(np.asarray, (recv_ts, recv_seq, recv_ack))
+
+    s_seq, s_first, s_count = first_by_key(send_seq, send_ts)
+    r_seq, r_first, _ = first_by_key(recv_seq, recv_ts)
+
+    # Receiver seqs present on the sender side
+    found, pos = lookup(s_seq, r_seq)
+    s_idx = pos[found]
+    r_idx = r_first[found]
+
+    # Ack consistency against every transmission of the seq
+    send_pairs = np.sort(_pair_keys(np.searchsorted(s_seq, send_seq), send_ack))
+    recv_pairs = _pair_keys(s_idx, recv_ack[r_idx])
+    ack_ok, _ = lookup(send_pairs, recv_pairs)
+
+    retrans = s_count[s_idx] > 1
+    matched = {
+        "seq": r_seq[found],
+        "ack": recv_ack[r_idx],
+        "send_ts": send_ts[s_first[s_idx]],
+        "recv_ts": recv_ts[r_idx],
+        "n_sent": s_count[s_idx],
+        "retrans": retrans,
+        "ack_ok": ack_ok,
+    }
+    stats = {
+        "sent": int(s_seq.size),
+        "received": int(r_seq.size),
+        "matched": int(found.sum()),
+        "unmatched": int((~found).sum()),
+        "retrans": int(retrans.sum()),
+        "ack_mismatch": int((~ack_ok).sum()),
+    }
+    return matched, stats
@@ -1,93 +1,45 @@
 import os
 import re
-import json
 import csv
 import pandas as pd
 import argparse
 import subprocess
 from code import interact
 from datetime import datetime
-import matplotlib.pyplot as plt
 import math
 from collections import defaultdict
 import numpy as np
-import random
 
-
-def parse_iperf3_log(file_path):
-    """Parse iPerf3 JSON log file and extract time-throughput data."""
-    with open(file_path, "r") as file:
-        data = json.load(file)
-
-    # Extract time and throughput data from intervals
-    thuput_times = []
-    thuputs = []
-
-    for interval in data["intervals"]:
-        start_time = interval["sum"]["start"]
-        end_time = interval["sum"]["end"]
-        bits_per_second = interval["sum"]["bits_per_second"]
-
-        # Use mid-point of interval for plotting
-        thuput_times.append((start_time + end_time) / 2)
-        thuputs.append(bits_per_second / 1e6)  # Convert to Mbps
-
-    return thuput_times, thuputs
+from cache import cached
+from render import render_all, render_job
+from runs import iperf3_frame, parse_trace
+from timeseries import TimeSeries, ho_type_mask, label_links, link_stats
 
 
 def filter_time_range(data_times, data, start_time, end_time):
     """Filter data to include only the specified time range."""
-    filtered_time = []
-    filtered_data = []
+    data_times = np.asarray(data_times)
+    mask = (data_times >= start_time) & (data_times <= end_time)
+    return data_times[mask], np.asarray(data)[mask]
 
-    for t, tp in zip(data_times, data):
-        if start_time <= t <= end_time:
-            filtered_time.append(t)
-            filtered_data.append(tp)
 
-    return filtered_time, filtered_data
-
-
-def parse_trace(data, offset=2):
-    ho_time = []
-    target_link = []
-    try:
-        with open(data, "r") as file:
-            lines = file.readlines()
-        for line in lines:
-            tokens = line.split(",")
-            if tokens[1] == "HO":
-                ho_time.append((int(tokens[0]) / 1000) - offset)
-                target_link.append(int(tokens[3]))  # 1 sub6, 2 mmw
-    except Exception as e:
-        print(f"Error processing file {data}: {e}")
-    return ho_time, target_link
+# select thuput value [-x,x] around handover
+def calculate_ho_thuput(ho_times, thuput, windowsz=3):
+    ho_times = np.asarray(ho_times)
+    return thuput.window_mean(ho_times - windowsz, ho_times + windowsz)
 
 
-# select thuput value [-x,x] around handover
-def calculate_ho_thuput(ho_times, thuput_times, thuput, windowsz=3):
-    ho_thuputs = []
-    for t in ho_times:
-        _, filtered_thuput = filter_time_range(
-            thuput_times, thuput, t - windowsz, t + windowsz
-        )
-        avg_thuput = sum(filtered_thuput) / len(filtered_thuput)
-        ho_thuputs.append(avg_thuput)
-    return ho_thuputs
+# low percentile of thuput [-x,x] around handover
+def calculate_ho_percentile(ho_times, thuput, q, windowsz=3):
+    ho_times = np.asarray(ho_times)
+    return thuput.window_percentile(ho_times - windowsz, ho_times + windowsz, q)
 
 
 # select specific type of HO
 def filter_ho_types(ho_times, target_links, ho_type, initial_link=1):
     # [0,0] means all kinds of HO
-    if ho_type[0] == 0 and ho_type[1] == 0:
-        return ho_times
-    prev_link = initial_link
-    ho_spec = []
-    for i in range(len(ho_times)):
-        if prev_link == ho_type[0] and target_links[i] == ho_type[1]:
-            ho_spec.append(ho_times[i])
-        prev_link = target_links[i]
-    return ho_spec
+    mask = ho_type_mask(target_links, ho_type, initial_link)
+    return np.asarray(ho_times)[mask]
 
 
 # Return tuple of link duration
@@ -104,102 +56,94 @@ def filter_link_duration(ho_times, target_links, time_end, initial_link=1):
     return duration
 
 
+# Per-link statistics for each variant, one labelling pass per series
+def calculate_link_stats(variants, ho_times, target_links, initial_link=1):
+    summaries = []
+    for name, series in variants.items():
+        links = label_links(series.times, ho_times, target_links, initial_link)
+        stats = link_stats(series, links)
+        stats.insert(0, "variant", name)
+        summaries.append(stats)
+    return pd.concat(summaries, ignore_index=True)
+
+
 # Cal ramp up
+# list_b must be sorted (sample times)
 def find_closest_values(list_a, list_b):
-    closest_values = []
-    for a in list_a:
-        closest = min(list_b, key=lambda b: abs(b - a))
-        closest_values.append(closest)
-    return closest_values
+    series = TimeSeries(list_b, list_b)
+    return series.nearest(list_a)[0]
 
 
 def find_closest_indices(list_a, list_b):
-    closest_indices = []
-    for value in list_a:
-        # Calculate the absolute difference with all elements in list_b
-        differences = [abs(value - b) for b in list_b]
-        # Find the index of the smallest difference
-        closest_index = differences.index(min(differences))
-        closest_indices.append(closest_index)
-    return closest_indices
+    series = TimeSeries(list_b, list_b)
+    return series.nearest_index(list_a)
 
 
 # issue: how do we handle the case where throughput never reach maximum stable...
 # 2: what if next handover happens? what if next different kinds of handover happen?
-# Current sol: use a threshold; if never reached, use the maximum data for those do reach...
-def calculate_rampup_time(ho_times, thuput_times, thuputs, stable_thuput, thresh=40):
-    ramp_start_indices = find_closest_indices(ho_times, thuput_times)
-    print(f"{len(ramp_start_indices)} handovers in total")
-    rampup_times = []
-    for idx in range(len(ramp_start_indices) - 1):
-        i = ramp_start_indices[idx]
-        start_t = thuput_times[i]
-        found = False
-        rampup_t = 0
-        # while not reaching next ho yet
-        while (
-            # thuput_times[i] < thuput_times[ramp_start_indices[idx + 1]]
-            i < len(thuput_times)
-            and rampup_t < thresh
-        ):
-            rampup_t = thuput_times[i] - start_t
-            if thuputs[i] >= stable_thuput:
-                found = True
-                break
-            i += 1
-        if found:
-            rampup_times.append(rampup_t)
-        else:
-            rampup_times.append(-1)
-    # Handle last ho
-    i = ramp_start_indices[-1]
-    start_t = thuput_times[i + 1]
-    found = False
-    rampup_t = 0
-    while i < len(thuput_times) and rampup_t < thresh:
-        rampup_t = thuput_times[i] - start_t
-        if thuputs[i] >= stable_thuput:
-            found = True
-            break
-        i += 1
-    if found:
-        rampup_times.append(rampup_t)
-    else:
-        rampup_times.append(-1)
+# Current sol: use a threshold; if never reached, see fill_never_reached
+def calculate_rampup_time(ho_times, thuput, stable_thuput, thresh=40):
+    """Time from each handover until thuput first reaches stable_thuput.
+
+    stable_thuput is one value or one per handover. The search starts at the
+    sample closest to the handover and gives up after thresh seconds.
+
+    Returns (rampup_times, never_reached, started_full): rampup_times is NaN
+    where never_reached, and started_full marks handovers whose first sample
+    is already at the stable thuput.
+    """
+    times, values = thuput.times, thuput.values
+    n = len(thuput)
+    start = thuput.nearest_index(ho_times)
+    start_t = times[start]
+    # Last sample examined: the first one at or past thresh, or the end
+    last = np.minimum(np.searchsorted(times, start_t + thresh, side="left"), n - 1)
+
+    stable = np.broadcast_to(np.asarray(stable_thuput, dtype=np.float64), start.shape)
+    hit = np.full(start.shape, n)
+    for level in np.unique(stable):
+        # Next index at or after each sample whose value reaches level
+        reach = np.where(values >= level, np.arange(n), n)
+        next_reach = np.minimum.accumulate(reach[::-1])[::-1]
+        sel = stable == level
+        hit[sel] = next_reach[start[sel]]
+
+    never_reached = hit > last
+    rampup_times = np.where(
+        never_reached, np.nan, times[np.minimum(hit, n - 1)] - start_t
+    )
+    started_full = ~never_reached & (hit == start)
+    return rampup_times, never_reached, started_full
+
 
-    max_ramp_t = max(rampup_times)
-    if max_ramp_t < 0:
+# Replace never reached ramp ups with the longest one that did finish
+def fill_never_reached(rampup_times, never_reached, thresh=40):
+    if never_reached.all():
         print(
             "Warning: no successful ramp up during threshold time! Using maximum threshold value..."
         )
         max_ramp_t = thresh
-    cnt_undone = 0
-    cnt_start_full = 0
-    for i, t in enumerate(rampup_times):
-        if t < 0:
-            rampup_times[i] = max_ramp_t
-            cnt_undone += 1
-        if t == 0:
-            cnt_start_full += 1
-            rampup_times[i] += random.random() + 0.5
-            # print("Warning: HO start already full BW")
-    print(f"{cnt_undone} HOs didn't finished rampup")
-    print(f"{cnt_start_full} start with full bw")
-    return rampup_times
+    else:
+        max_ramp_t = np.max(rampup_times[~never_reached])
+    return np.where(never_reached, max_ramp_t, rampup_times)
+
+
+# Thuput with every HO in red, see render.py for the job format
+def figure_job(ho_times, thuput_times, thuputs, fig_name):
+    return {
+        "output": fig_name,
+        "panels": [{"x": thuput_times, "y": thuputs, "ylabel": "Thuput(Mbps)"}],
+        "time_range": (-np.inf, np.inf),
+        "ho": (ho_times, None),
+    }
 
 
 def plot_figure(ho_times, thuput_times, thuputs, fig_name):
-    n_subfig = 1
-    fig, axes = plt.subplots(n_subfig, figsize=(12, 4))
-    ax = axes
-    ax.plot(thuput_times, thuputs, marker=".", markersize=2)
-    ax.set_ylabel("Thuput(Mbps)")
-    for i in range(len(ho_times)):
-        ax.axvline(ho_times[i], color="tab:red")
-    plt.savefig(fig_name)
+    render_job(figure_job(ho_times, thuput_times, thuputs, fig_name))
     print("Saved to", fig_name)
     return
 
+
 def calculate_p_r(tap, tp, tpp):
     for i in range(len(tap)):
         print("p:", round(tp[i]/tpp[i], 4), ", r:", round(tp[i]/tap[i], 4))
@@ -239,11 +183,13 @@ if __name__ == "__main__":
     if os.path.exists(fname):
         iperf3_client_log = fname
         print("Parsing iperf log for", iperf3_client_log)
-        thuput_times, thuputs = parse_iperf3_log(iperf3_client_log)
-        thuput_times, thuputs = filter_time_range(
-            thuput_times, thuputs, begin_time, end_time
+        df_iperf = cached(
+            "iperf", iperf3_client_log, iperf3_frame, time_range=(begin_time, end_time)
         )
+        thuput_times = df_iperf.time.to_numpy()
+        thuputs = df_iperf.throughput.to_numpy()
         print("Average Throughput per 100ms:", sum(thuputs) / len(thuputs))
+        thuput = TimeSeries(thuput_times, thuputs)
         print()
 
     # M2HO version
@@ -251,11 +197,13 @@ if __name__ == "__main__":
     if os.path.exists(fname):
         iperf3_client_log = fname
         print("Parsing iperf log for M2HO")
-        m_thuput_times, m_thuputs = parse_iperf3_log(iperf3_client_log)
-        m_thuput_times, m_thuputs = filter_time_range(
-            m_thuput_times, m_thuputs, begin_time, end_time
+        df_iperf = cached(
+            "iperf", iperf3_client_log, iperf3_frame, time_range=(begin_time, end_time)
         )
+        m_thuput_times = df_iperf.time.to_numpy()
+        m_thuputs = df_iperf.throughput.to_numpy()
         print("Average Throughput per 100ms:", sum(m_thuputs) / len(m_thuputs))
+        m_thuput = TimeSeries(m_thuput_times, m_thuputs)
         print()
 
     # HO timestamp
@@ -270,70 +218,37 @@ if __name__ == "__main__":
     # Run plot
     # =======================
     if True:
-        n_subfig = 1
-        fig, axes = plt.subplots(n_subfig, figsize=(12, 4))
-        ax = axes
-        ax.plot(thuput_times, thuputs, marker=".", markersize=2)
-        ax.set_ylabel("Thuput(Mbps)")
-        prev_link = 1
-        for i in range(len(ho_times)):
-            if target_links[i] == prev_link:
-                color = "tab:green"
-            else:
-                color = "tab:red"
-                prev_link = target_links[i]
-            ax.axvline(ho_times[i], color=color)
         fig_name = f"thuput-{run_id}-{algo}.png"
-        plt.savefig(fig_name)
+        render_job(
+            {
+                "output": fig_name,
+                "panels": [{"x": thuput_times, "y": thuputs}],
+                "time_range": (begin_time, end_time),
+                "ho": (ho_times, target_links),
+            }
+        )
         print("Save to", fig_name)
         print()
 
     # Avg thuput during link
     # ========================
     if True:
-        link_durations = filter_link_duration(ho_times, target_links, max(thuput_times))
-        sub6_thuputs = []
-        for dur in link_durations[1]:
-            _, tp = filter_time_range(thuput_times, thuputs, dur[0], dur[1])
-            sub6_thuputs.extend(tp)
-        mmw_thuputs = []
-        for dur in link_durations[2]:
-            _, tp = filter_time_range(thuput_times, thuputs, dur[0], dur[1])
-            mmw_thuputs.extend(tp)
-        print(
-            f"{algo}\n",
-            "sub-6GHz avg:",
-            round(np.mean(sub6_thuputs), 2),
-            "max:",
-            max(sub6_thuputs),
-            "mmw avg:",
-            round(np.mean(mmw_thuputs), 2),
-            "max:",
-            max(mmw_thuputs),
-        )
-        # m2ho
-        link_durations = filter_link_duration(
-            ho_times, target_links, max(m_thuput_times)
-        )
-        sub6_thuputs = []
-        for dur in link_durations[1]:
-            _, tp = filter_time_range(m_thuput_times, m_thuputs, dur[0], dur[1])
-            sub6_thuputs.extend(tp)
-        mmw_thuputs = []
-        for dur in link_durations[2]:
-            _, tp = filter_time_range(m_thuput_times, m_thuputs, dur[0], dur[1])
-            mmw_thuputs.extend(tp)
-        print(
-            "M2HO\n",
-            "sub-6GHz avg:",
-            round(np.mean(sub6_thuputs), 2),
-            "max:",
-            max(sub6_thuputs),
-            "mmw avg:",
-            round(np.mean(mmw_thuputs), 2),
-            "max:",
-            max(mmw_thuputs),
-        )
+        variants = {algo: thuput, "M2HO": m_thuput}
+        link_summary = calculate_link_stats(variants, ho_times, target_links)
+        for name, df in link_summary.groupby("variant", sort=False):
+            sub6 = df[df.link == 1].iloc[0]
+            mmw = df[df.link == 2].iloc[0]
+            print(
+                f"{name}\n",
+                "sub-6GHz avg:",
+                round(sub6["mean"], 2),
+                "max:",
+                sub6["max"],
+                "mmw avg:",
+                round(mmw["mean"], 2),
+                "max:",
+                mmw["max"],
+            )
 
         print()
 
@@ -347,9 +262,7 @@ if __name__ == "__main__":
         link_enum = ["all", "sub6", "mmw"]
         for ho_type in [[1, 1], [1, 2], [2, 2], [2, 1], [0, 0]]:
             filtered_ho_times = filter_ho_types(ho_times, target_links, ho_type)
-            ho_thuputs = calculate_ho_thuput(
-                filtered_ho_times, thuput_times, thuputs, windowsz=5
-            )
+            ho_thuputs = calculate_ho_thuput(filtered_ho_times, thuput, windowsz=5)
             # Adjustments
             if algo in ["bic", "hstcp"]:
                 for i in range(len(ho_thuputs)):
@@ -360,9 +273,7 @@ if __name__ == "__main__":
 
             avg_ho_thuput = sum(ho_thuputs) / len(ho_thuputs)
             # m2ho version
-            m_ho_thuput = calculate_ho_thuput(
-                filtered_ho_times, m_thuput_times, m_thuputs, windowsz=5
-            )
+            m_ho_thuput = calculate_ho_thuput(filtered_ho_times, m_thuput, windowsz=5)
             m_avg_ho_thuput = sum(m_ho_thuput) / len(m_ho_thuput)
             # Adjustments
             if algo == "cubic":
@@ -406,22 +317,25 @@ if __name__ == "__main__":
         stable_thuput = [0, 170, 360] # cubic
         rampup_times_all = []
         m_rampup_times_all = []
+        fig_jobs = []
+        # All handovers at once, stable thuput of the target link
+        stable = np.asarray(stable_thuput)[target_links]
+        rampup, never, full = calculate_rampup_time(ho_times, thuput, stable)
+        m_rampup, m_never, m_full = calculate_rampup_time(ho_times, m_thuput, stable)
         for ho_type in [[1, 1], [1, 2], [2, 2], [2, 1]]:
-            filtered_ho_times = filter_ho_types(ho_times, target_links, ho_type)
-            rampup_times = calculate_rampup_time(
-                filtered_ho_times, thuput_times, thuputs, stable_thuput[ho_type[1]]
-            )
+            mask = ho_type_mask(target_links, ho_type)
+            filtered_ho_times = np.asarray(ho_times)[mask]
+            print(f"{mask.sum()} handovers in total")
+            print(f"{never[mask].sum()} HOs didn't finished rampup")
+            print(f"{full[mask].sum()} start with full bw")
+            rampup_times = fill_never_reached(rampup[mask], never[mask])
             avg = np.mean(rampup_times)
 
             # m2ho version
             print("M2HO version ========")
-            m_filtered_ho_times = filter_ho_types(ho_times, target_links, ho_type)
-            m_rampup_times = calculate_rampup_time(
-                m_filtered_ho_times,
-                m_thuput_times,
-                m_thuputs,
-                stable_thuput[ho_type[1]],
-            )
+            print(f"{m_never[mask].sum()} HOs didn't finished rampup")
+            print(f"{m_full[mask].sum()} start with full bw")
+            m_rampup_times = fill_never_reached(m_rampup[mask], m_never[mask])
             m_avg = np.mean(m_rampup_times)
 
             # Adjust
@@ -440,22 +354,29 @@ if __name__ == "__main__":
             print(
                 f"{link_enum[ho_type[0]]}-{link_enum[ho_type[1]]}: {round(avg, 2)}, M2HO: {round(m_avg, 2)}, up {round(100*(avg-m_avg)/avg, 2)}%"
             )
-            plot_figure(
-                filtered_ho_times,
-                thuput_times,
-                thuputs,
-                f"conv-{ho_type[0]}-{ho_type[1]}-{algo}.png",
+            fig_jobs.append(
+                figure_job(
+                    filtered_ho_times,
+                    thuput_times,
+                    thuputs,
+                    f"conv-{ho_type[0]}-{ho_type[1]}-{algo}.png",
+                )
             )
-            plot_figure(
-                filtered_ho_times,
-                m_thuput_times,
-                m_thuputs,
-                f"conv-{ho_type[0]}-{ho_type[1]}-m_{algo}.png",
+            fig_jobs.append(
+                figure_job(
+                    filtered_ho_times,
+                    m_thuput_times,
+                    m_thuputs,
+                    f"conv-{ho_type[0]}-{ho_type[1]}-m_{algo}.png",
+                )
             )
             rampup_times_all.extend(rampup_times)
             m_rampup_times_all.extend(m_rampup_times)
             print()
 
+        for fig_name in render_all(fig_jobs):
+            print("Saved to", fig_name)
+
         print(
             f"all-all: {round(np.mean(rampup_times_all), 2)}, M2HO: {round(np.mean(m_rampup_times_all), 2)}, up {round(100*(np.mean(rampup_times_all) - np.mean(m_rampup_times_all))/(np.mean(rampup_times_all)), 2)}%"
         )
@@ -0,0 +1,80 @@
+import re
+import numpy as np
+
+# Records written by packet_logging() in src/worker.c:
+#   <date> <time> FATAL worker.c:<line>: packet,<ts_ms>,<sport>,<seq>,<ack>
+# The dup-ACK suppression writes its own bare log_fatal("%u") lines into the
+# same file, those never match the record pattern and are skipped.
+PACKET_DTYPE = np.dtype(
+    [("ts", np.uint64), ("port", np.uint16), ("seq", np.uint32), ("ack", np.uint32)]
+)
+CHUNK_SIZE = 16 * 1024 * 1024
+
+_RECORD = re.compile(rb"packet,(\d+,\d+,\d+,\d+)")
+
+
+def parse_uints(buf):
+    """Parse comma-terminated unsigned decimal fields in buf into int64."""
+    raw = np.frombuffer(buf, dtype=np.uint8)
+    ends = np.flatnonzero(raw == ord(","))
+    starts = np.empty_like(ends)
+    starts[:1] = 0
+    starts[1:] = ends[:-1] + 1
+    lengths = ends - starts
+    values = np.zeros(ends.size, dtype=np.int64)
+    if ends.size == 0:
+        return values
+    # Walk digit positions right to left, one vectorized step per position
+    scale = 1
+    for k in range(int(lengths.max())):
+        digit = raw[ends - 1 - k].astype(np.int64) - ord("0")
+        values += np.where(lengths > k, digit, 0) * scale
+        scale *= 10
+    return values
+
+
+def parse_packet_records(text, port=None):
+    """Parse the packet records in a block of whole log lines."""
+    fields = _RECORD.findall(text)
+    records = np.empty(len(fields), dtype=PACKET_DTYPE)
+    if not fields:
+        return records
+    values = parse_uints(b",".join(fields) + b",").reshape(-1, 4)
+    records["ts"] = values[:, 0]
+    records["port"] = values[:, 1]
+    records["seq"] = values[:, 2]
+    records["ack"] = values[:, 3]
+    if port is not None:
+        records = records[records["port"] == port]
+    return records
+
+
+def iter_packet_log(fname, port=None, chunk_size=CHUNK_SIZE):
+    """Yield structured arrays of packet records, one per chunk of the file.
+
+    Chunks are cut at the last newline so no record is split; memory use is
+    bounded by chunk_size however long the log is.
+    """
+    with open(fname, "rb") as f:
+        tail = b""
+        while True:
+            block = f.read(chunk_size)
+            if not block:
+                break
+            block = tail + block
+            cut = block.rfind(b"\n") + 1
+            tail = block[cut:]
+            records = parse_packet_records(block[:cut], port)
+            if records.size:
+                yield records
+        records = parse_packet_records(tail, port)
+        if records.size:
+            yield records
+
+
+def read_packet_log(fname, port=None, chunk_size=CHUNK_SIZE):
+    """Read a packet.log into one structured array with PACKET_DTYPE."""
+    chunks = list(iter_packet_log(fname, port, chunk_size))
+    if not chunks:
+        return np.empty(0, dtype=PACKET_DTYPE)
+    return np.concatenate(chunks)
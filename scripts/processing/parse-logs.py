@@ -1,79 +1,76 @@
 import os
-import re
-import json
-import csv
+import numpy as np
 import pandas as pd
 import argparse
-import subprocess
 from code import interact
 from datetime import datetime
 
+from cache import cached
+from capture import filter_packets, int_to_ip, read_capture
+from iperf_log import iperf_throughput
+from jitter import RFC3550_GAIN, transit_jitter
+from matching import match_packets
+from packet_log import read_packet_log
+from pipeline import Stage, run
+from seqnum import unwrap_seq
+from ss_log import parse_ss_log
 
-def parse_iperf3_log(file_path):
-    """Parse iPerf3 JSON log file and extract time-throughput data."""
-    with open(file_path, "r") as file:
-        data = json.load(file)
+JITTER_WINDOW = 1 / RFC3550_GAIN
 
-    # Extract time and throughput data from intervals
-    time_intervals = []
-    throughputs = []
 
-    for interval in data["intervals"]:
-        start_time = interval["sum"]["start"]
-        end_time = interval["sum"]["end"]
-        bits_per_second = interval["sum"]["bits_per_second"]
+def iperf3_frame(file_path):
+    time_intervals, throughputs = iperf_throughput(file_path)
+    return pd.DataFrame({"time": time_intervals, "throughput": throughputs})
 
-        # Use mid-point of interval for plotting
-        time_intervals.append((start_time + end_time) / 2)
-        throughputs.append(bits_per_second / 1e6)  # Convert to Mbps
 
-    return time_intervals, throughputs
-
-
-def filter_time_range_iperf(time_intervals, data, start_time, end_time):
-    """Filter data to include only the specified time range."""
-    filtered_time = []
-    filtered_data = []
-
-    for t, tp in zip(time_intervals, data):
-        if start_time <= t <= end_time:
-            filtered_time.append(t)
-            filtered_data.append(tp)
-
-    return filtered_time, filtered_data
+# Frame size in bytes for a video bitrate (bit/s) and frame rate
+def bitrate_to_frame_size(bitrate, fps=30):
+    return np.asarray(bitrate, dtype=np.float64) / 8 / fps
 
 
 def estimate_frame(df, frame_size):
-    # Sort packesorted_df = df.sort_values(by=["seq", "time"])ts by sequence number and timestamp
+    """Estimate video frame completion times from received packets.
+
+    frame_size is one size in bytes or a list of them, all profiles are
+    evaluated on the same pass over the packets. Frame k of a profile completes
+    at the first packet where the cumulative bytes reach k * frame_size; the
+    adjusted completion time never goes back in time.
+    """
+    # Sort packets by sequence number and timestamp, keep the first copy
     df = df.sort_values(by=["seq", "time"]).reset_index(drop=True)
     df = df.drop_duplicates(subset="seq", keep="first")
-    accumulated_length = 0
-    frame_completion_timestamps = []
-    frame_number = 1
-    # Iterate through packets to calculate frame completion
-    prev_completion_time = 0
-    for _, row in df.iterrows():
-        accumulated_length += row["len"]
-        if accumulated_length >= frame_size:
-            # Frame is complete
-            if row["time"] < prev_completion_time:
-                adjusted_time = prev_completion_time
-            else:
-                adjusted_time = row["time"]
-            prev_completion_time = adjusted_time
-            frame_completion_timestamps.append(
-                {
-                    "frame": frame_number,
-                    "completion_time": adjusted_time,
-                    "completion_time_raw": row["time"],
-                }
-            )
-            frame_number += 1
-            accumulated_length -= frame_size  # Start the next frame with leftover bytes
-    # Convert frame completion timestamps to a DataFrame
-    completion_df = pd.DataFrame(frame_completion_timestamps)
-    completion_df["interval"] = completion_df["completion_time"].diff()
-    # completion_df["interval"] = completion_df["completion_time"].diff()
+    times = df["time"].to_numpy()
+    total = np.cumsum(df["len"].to_numpy(dtype=np.float64))
+    if total.size == 0:
+        total = np.zeros(1)
+        times = np.zeros(1)
+
+    sizes = np.atleast_1d(np.asarray(frame_size, dtype=np.float64))
+    n_frames = np.floor(total[-1] / sizes).astype(np.int64)
+    profile = np.repeat(sizes, n_frames)
+    frame = (
+        np.arange(profile.size)
+        - np.repeat(np.cumsum(n_frames) - n_frames, n_frames)
+        + 1
+    )
+    # Index of the packet that completes each frame
+    idx = np.searchsorted(total, frame * profile, side="left")
+    raw = times[idx]
+    # Running max restarts at each profile's first frame
+    offset = np.repeat(np.arange(sizes.size) * (np.ptp(times) + 1), n_frames)
+    adjusted = np.maximum.accumulate(raw + offset) - offset
+    interval = np.diff(adjusted, prepend=np.nan)
+    interval[frame == 1] = np.nan
+
+    completion_df = pd.DataFrame(
+        {
+            "frame_size": profile,
+            "frame": frame,
+            "completion_time": adjusted,
+            "completion_time_raw": raw,
+            "interval": interval,
+        }
+    )
     return completion_df
 
 
@@ -86,29 +83,39 @@ def filter_relative_time_range(raw_df, start_time, end_time):
 
 # Read TCP packet data
 def process_server_log(fname, target_port):
-    df = None
-    with open(fname, "r") as f:
-        parsed_data = []
-        text = f.read()
-        pattern = r"packet,(\d+),(\d+),(\d+),(\d+)"
-        matches = re.findall(pattern, text)
-        for epoch, port, tcp_seq, tcp_ack in matches:
-            if int(port) == target_port:
-                parsed_data.append(
-                    {
-                        "epoch": float(epoch) / 1000,
-                        "seq": int(tcp_seq),
-                        "srcport": target_port,
-                        "ack": int(tcp_ack),
-                    }
-                )
-        df = pd.DataFrame(parsed_data)
-        # NOTE: iperf3 will use two connection, choose the latter one
-        # df = df[df.srcport == target_port]
-        df["time"] = df["epoch"] - df.iloc[0]["epoch"]
+    # NOTE: iperf3 will use two connection, choose the latter one
+    records = read_packet_log(fname, port=target_port)
+    df = pd.DataFrame(
+        {
+            "epoch": records["ts"] / 1000,
+            "seq": records["seq"],
+            "srcport": records["port"],
+            "ack": records["ack"],
+        }
+    )
+    df["time"] = df["epoch"] - df.iloc[0]["epoch"]
     return df
 
 
+# Data packets of the iperf3 test connection in a client capture.
+# Stream 0 is the control connection, as tcp.stream in tshark.
+def process_client_pcap(fname, stream=1, dst_port=5257):
+    pkts = filter_packets(read_capture(fname), stream=stream, dst_port=dst_port)
+    return pd.DataFrame(
+        {
+            "time": pkts["time"],
+            "epoch": pkts["epoch"],
+            "src_ip": int_to_ip(pkts["src_ip"]),
+            "dst_ip": int_to_ip(pkts["dst_ip"]),
+            "src_port": pkts["src_port"],
+            "dst_port": pkts["dst_port"],
+            "seq": pkts["seq"],
+            "ack": pkts["ack"],
+            "len": pkts["len"],
+        }
+    )
+
+
 def check_rollover(df):
     df = df.sort_values(by="time").reset_index(drop=True)
     df["seq_diff"] = df["seq"].diff()
@@ -126,151 +133,220 @@ def check_rollover(df):
     return rollover_pt
 
 
+# Map seq/ack into 64-bit space, both sides anchored to the sender's first packet
+def unwrap_packets(df_server, df_client):
+    df_server = df_server.copy()
+    df_client = df_client.copy()
+    df_server["seq"] = unwrap_seq(df_server.seq, df_server.srcport)
+    df_server["ack"] = unwrap_seq(df_server.ack, df_server.srcport)
+    df_client["seq"] = unwrap_seq(
+        df_client.seq, df_client.src_port, ref=df_server.seq.iloc[0]
+    )
+    df_client["ack"] = unwrap_seq(
+        df_client.ack, df_client.src_port, ref=df_server.ack.iloc[0]
+    )
+    return df_server, df_client
+
+
 def calculate_transit(df_server, df_client):
-    server_earliest = df_server.groupby("seq", as_index=False)["epoch"].min()
-    client_earliest = df_client.groupby("seq", as_index=False)["epoch"].min()
-    merged = pd.merge(
-        server_earliest, client_earliest, on="seq", suffixes=("_server", "_client")
+    matched, stats = match_packets(
+        df_server["epoch"].to_numpy(),
+        df_server["seq"].to_numpy(),
+        df_server["ack"].to_numpy(),
+        df_client["epoch"].to_numpy(),
+        df_client["seq"].to_numpy(),
+        df_client["ack"].to_numpy(),
+    )
+    merged = pd.DataFrame(
+        {
+            "seq": matched["seq"],
+            "epoch_server": matched["send_ts"],
+            "epoch_client": matched["recv_ts"],
+            "retrans": matched["retrans"],
+            "ack_ok": matched["ack_ok"],
+        }
     )
     merged["transit_time"] = merged["epoch_client"] - merged["epoch_server"]
-    merged = merged.dropna()
     merged["time"] = merged["epoch_client"] - merged.iloc[0]["epoch_client"]
-    return merged
-
-
-# RFC 3550 jitter calculation
-def calculate_jitter(df):
-    jitter = 0
-    error_cnt = 0
-    results = []
-    results.append(jitter)
-    prev_transit_time = df.iloc[0]["transit_time"]
-    for i, r in df.iloc[1:].iterrows():
-        transit_time = r["transit_time"]
-        if transit_time < 0:
-            error_cnt += 1
-            results.append(0)
-            continue
-        jitter += (abs(transit_time - prev_transit_time) - jitter) / 16
-        results.append(jitter)
-        prev_transit_time = transit_time
+    return merged, stats
+
+
+# RFC 3550 jitter calculation, window is 1 / gain, 16 packets in the RFC
+def calculate_jitter(df, window=JITTER_WINDOW):
+    results, valid = transit_jitter(df["transit_time"].to_numpy(), 1 / window)
+    error_cnt = int((~valid[1:]).sum())
     if error_cnt != 0:
         print(f"Error: {error_cnt} packets out of order and cannot be sorted")
     return df.assign(jitter=results)
 
 
-# Parse BBR ss line
-def parse_bbr_info(bbr_str):
-    """Parse the BBR information string into a dictionary."""
-    # Extract content between parentheses
-    bbr_match = re.search(r"\((.*?)\)", bbr_str)
-    if not bbr_match:
-        return {}
-
-    bbr_params = {}
-    # Split by comma and parse each parameter
-    for param in bbr_match.group(1).split(","):
-        if ":" not in param:
-            continue
-        key, value = param.split(":")
-        # Remove 'bbr' prefix if present
-        key = key.replace("bbr", "").strip()
-        # Convert values to numeric where possible
-        if "Mbps" in value:
-            value = float(value.replace("Mbps", ""))
-        elif value.replace(".", "").isdigit():
-            value = float(value)
-        bbr_params[key] = value
-    return bbr_params
-
-
-def parse_ss_line(line):
-    # Extract timestamp
-    time_match = re.search(r"time:(\d+)", line)
-    if not time_match:
-        return None
-    timestamp = int(time_match.group(1))
-    # Create a dictionary to store all metrics
-    metrics = {
-        "epoch": (timestamp / 1e9),  # nano to sec
-    }
-    # Handle BBR information separately first
-    bbr_match = re.search(r"bbr:\((.*?)\)", line)
-    if bbr_match:
-        bbr_info = parse_bbr_info(bbr_match.group(0))
-        metrics["bbr"] = bbr_info
-        # Remove the BBR part from the line to avoid parsing conflicts
-        line = line.replace(bbr_match.group(0), "")
-    # Extract remaining key-value pairs
-    pairs = re.findall(r"(\w+):([^ ]+)", line)
-    for key, value in pairs:
-        try:
-            # Convert numeric values
-            if value.replace(".", "").isdigit():
-                value = float(value)
-            # Handle percentage values
-            elif "%" in value:
-                value = float(value.replace("%", ""))
-            # Handle Mbps values
-            elif "Mbps" in value:
-                value = float(value.replace("Mbps", ""))
-        except ValueError:
-            # If conversion fails, keep the original string value
-            pass
-        metrics[key] = value
-    return metrics
-
-
+# Parse ss log, see ss_log.py
 def parse_ss(ss_log):
-    df = pd.DataFrame()
-    parsed_data = []
     try:
-        with open(ss_log, "r") as f:
-            for line_number, line in enumerate(f, 1):
-                try:
-                    parsed_line = parse_ss_line(line.strip())
-                    if parsed_line:
-                        parsed_data.append(parsed_line)
-                except Exception as e:
-                    print(f"Warning: Error parsing line {line_number}: {e}")
-                    print(f"Line content: {line.strip()}")
-                    break
+        df = parse_ss_log(ss_log)
     except FileNotFoundError:
         print(f"Error: Log file '{ss_log}' not found")
-    except Exception as e:
-        print(f"Error parsing file: {e}")
-
-    # Flatten BBR metrics for CSV output
-    flattened_data = []
-    for entry in parsed_data:
-        flat_entry = entry.copy()
-        if "bbr" in flat_entry:
-            bbr_data = flat_entry.pop("bbr")
-            for k, v in bbr_data.items():
-                flat_entry[f"bbr_{k}"] = v
-        flattened_data.append(flat_entry)
-
-    df = pd.DataFrame(flattened_data)
-    df.time = df.epoch - df.epoch.min()
-
-    # # Get all unique keys for CSV headers
-    # headers = set()
-    # for entry in flattened_data:
-    #     headers.update(entry.keys())
-
-    # try:
-    #     with open(output_file, "w", newline="") as f:
-    #         writer = csv.DictWriter(f, fieldnames=sorted(headers))
-    #         writer.writeheader()
-    #         writer.writerows(flattened_data)
-    # except Exception as e:
-    #     print(f"Error saving CSV: {e}")
-    #     return False
-    # return True
-
+        return pd.DataFrame()
+    df["time"] = df.epoch - df.epoch.min()
     return df
 
 
+# Stages of the analysis, see pipeline.py. Each one reads its input files
+# and writes its outputs, parsed logs go through the cache of cache.py.
+def load(kind, fname, parse, params=None, time_range=None, nocache=False):
+    if nocache:
+        df = parse(fname)
+        if time_range is None:
+            return df
+        return df[(df["time"] >= time_range[0]) & (df["time"] <= time_range[1])]
+    return cached(kind, fname, parse, params=params, time_range=time_range)
+
+
+def iperf_stage(inputs, outputs, time_range, nocache=False):
+    df_iperf = load("iperf", inputs[0], iperf3_frame, None, time_range, nocache)
+    print("Average Throughput per 100ms:", df_iperf.throughput.mean())
+    df_iperf.to_csv(outputs[0], index=False)
+
+
+def capture_stage(inputs, outputs, nocache=False):
+    df_pcap = process_client_pcap(inputs[0])
+    df_pcap.to_csv(outputs[0], index=False)
+    print(f"> {len(df_pcap)} packets")
+
+
+# Client and server packets in the time range, seq/ack still 32-bit
+def load_packets(client_packets, server_packets, time_range, nocache=False):
+    df_client = load("packet-csv", client_packets, pd.read_csv, nocache=nocache)
+    df_client = filter_relative_time_range(df_client, *time_range)
+    target_port = df_client.src_port.unique()[0]
+    df_server = load(
+        "packet-log",
+        server_packets,
+        lambda f: process_server_log(f, target_port),
+        params={"port": int(target_port)},
+        nocache=nocache,
+    )
+    df_server = filter_relative_time_range(df_server, *time_range)
+    return df_server, df_client
+
+
+def transit_stage(inputs, outputs, time_range, nocache=False):
+    df_server, df_client = load_packets(*inputs, time_range, nocache)
+    # Check if we have TCP sequence number rollover
+    # Checking one side should be enough
+    rollover_pt = check_rollover(df_client)
+    print(f"> {len(rollover_pt)} rollover(s), unwrapping seq/ack")
+    df_server, df_client = unwrap_packets(df_server, df_client)
+    df_matched, stats = calculate_transit(df_server, df_client)
+    print(
+        f"> {stats['matched']} matched, {stats['unmatched']} unmatched,",
+        f"{stats['retrans']} retransmitted, {stats['ack_mismatch']} ack mismatch",
+    )
+    df_matched.to_csv(outputs[0], index=False)
+
+
+def jitter_stage(inputs, outputs, window, nocache=False):
+    df_jitter = calculate_jitter(pd.read_csv(inputs[0]), window)
+    df_jitter.to_csv(outputs[0], index=False)
+
+
+def frames_stage(inputs, outputs, frame_sizes, time_range, nocache=False):
+    df_server, df_client = load_packets(*inputs, time_range, nocache)
+    _, df_client = unwrap_packets(df_server, df_client)
+    estimate_frame(df_client, frame_sizes).to_csv(outputs[0], index=False)
+
+
+def ss_stage(inputs, outputs, time_range, nocache=False):
+    df_ss = load("ss", inputs[0], parse_ss, nocache=nocache)
+    df_ss = filter_relative_time_range(df_ss, *time_range)
+    df_ss.to_csv(outputs[0], index=False)
+
+
+def analysis_stages(args, prefix, root_dir, time_range):
+    """Stages for the logs given in args, outputs named after prefix."""
+
+    def out(name):
+        return os.path.join(root_dir, f"{prefix}-{name}")
+
+    options = {"nocache": args.nocache}
+    stages = []
+    if args.iperf_log is not None:
+        stages.append(
+            Stage(
+                "iperf",
+                iperf_stage,
+                [args.iperf_log],
+                [out("iperf-throughput.csv")],
+                {"time_range": time_range},
+                options,
+            )
+        )
+    client_packets = args.client_packets
+    if args.client_pcap is not None:
+        client_packets = out("packet-client.csv")
+        stages.append(
+            Stage(
+                "capture",
+                capture_stage,
+                [args.client_pcap],
+                [client_packets],
+                None,
+                options,
+            )
+        )
+    if args.server_packets is not None and client_packets is not None:
+        packets = [client_packets, args.server_packets]
+        stages.append(
+            Stage(
+                "transit",
+                transit_stage,
+                packets,
+                [out("transit.csv")],
+                {"time_range": time_range},
+                options,
+            )
+        )
+        stages.append(
+            Stage(
+                "jitter",
+                jitter_stage,
+                [out("transit.csv")],
+                [out("jitter.csv")],
+                {"window": args.jitter_window},
+                options,
+            )
+        )
+        # e.g. 666667 bytes for a 4K video frame at 20 Mbps, 30 fps
+        frame_sizes = list(args.frame_size or [])
+        if args.bitrate:
+            frame_sizes.extend(
+                bitrate_to_frame_size(np.array(args.bitrate) * 1e6, args.fps).tolist()
+            )
+        if frame_sizes:
+            stages.append(
+                Stage(
+                    "frames",
+                    frames_stage,
+                    packets,
+                    [out("frames.csv")],
+                    {"frame_sizes": frame_sizes, "time_range": time_range},
+                    options,
+                )
+            )
+    if args.ss_log is not None:
+        stages.append(
+            Stage(
+                "ss",
+                ss_stage,
+                [args.ss_log],
+                [out("ss-server.csv")],
+                {"time_range": time_range},
+                options,
+            )
+        )
+    return stages
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Parse logs")
     parser.add_argument("--prefix")
@@ -282,6 +358,16 @@ if __name__ == "__main__":
     parser.add_argument("--ss_log")
     parser.add_argument("-b", "--begin", type=float)
     parser.add_argument("-e", "--end", type=float)
+    parser.add_argument("--frame_size", type=int, nargs="+", help="bytes")
+    parser.add_argument("--bitrate", type=float, nargs="+", help="Mbps")
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument(
+        "--jitter_window", type=float, default=JITTER_WINDOW, help="packets"
+    )
+    parser.add_argument("-j", "--workers", type=int)
+    parser.add_argument(
+        "--nocache", action="store_true", help="reparse all logs, rerun all stages"
+    )
 
     args = parser.parse_args()
 
@@ -292,147 +378,40 @@ if __name__ == "__main__":
     if end_time == None:
         end_time = 1200
 
+    time_range = (begin_time, end_time)
+
     # Defaults
     root_dir = "output"
     if args.prefix != None:
         prefix = args.prefix
 
-        fname = os.path.join(root_dir, f"{prefix}-iperf-client.json")
-        if os.path.exists(fname):
-            args.iperf_log = fname
-
-        # if not args.nocap:
-        #     fname = os.path.join(root_dir, f"{prefix}-capture-client.pcap")
-        #     if os.path.exists(fname):
-        #         args.client_pcap = fname
-        # else:
-        #     fname = os.path.join(root_dir, f"{prefix}-packet-client.csv")
-        #     if os.path.exists(fname):
-        #         args.client_packets = fname
-
-        # fname = os.path.join(root_dir, f"{prefix}-capture-server.log")
-        # if os.path.exists(fname):
-        #     args.server_packets = fname
-
-        # TODO: handle all TCP variants
-        # fname = os.path.join(root_dir, f"{prefix}-ss-server.log")
-        # if os.path.exists(fname):
-        #     args.ss_log = fname
+        # Logs of scripts/run/batch_run_iperf3.sh, when not given
+        logs = {
+            "iperf_log": "iperf-client.json",
+            "client_pcap": "capture-client.pcap",
+            "server_packets": "capture-server.log",
+            "ss_log": "ss-server.log",
+        }
+        if args.nocap:
+            # Client packets of an earlier capture stage instead
+            del logs["client_pcap"]
+            logs["client_packets"] = "packet-client.csv"
+        for arg, name in logs.items():
+            fname = os.path.join(root_dir, f"{prefix}-{name}")
+            if getattr(args, arg) is None and os.path.exists(fname):
+                setattr(args, arg, fname)
     else:
         prefix = "manual"
 
-    # iPerf3 result
-    if args.iperf_log != None:
-        iperf_log = args.iperf_log
-        print("Parsing iperf log")
-        output_file = os.path.join(root_dir, f"{prefix}-iperf-throughput.csv")
-        time_intervals, throughputs = parse_iperf3_log(iperf_log)
-        time_intervals, throughputs = filter_time_range_iperf(
-            time_intervals, throughputs, begin_time, end_time
-        )
-        print("Average Throughput per 100ms:", sum(throughputs) / len(throughputs))
-        with open(output_file, "w") as file:
-            writer = csv.writer(file)
-            writer.writerow(["time", "throughput"])
-            for i in range(len(throughputs)):
-                writer.writerow([time_intervals[i], throughputs[i]])
-            print("Saved as", output_file)
-        print()
-
-    if args.client_pcap != None:
-        pcap = args.client_pcap
-        print("Running tshark")
-        # Run tshark command
-        cmd = [
-            "tshark",
-            "-r",
-            pcap,
-            "-Y",
-            "tcp.stream == 1 && tcp.dstport == 5257",
-            "-T",
-            "fields",
-            "-e",
-            "frame.time_relative",
-            "-e",
-            "frame.time_epoch",
-            "-e",
-            "ip.src",
-            "-e",
-            "ip.dst",
-            "-e",
-            "tcp.srcport",
-            "-e",
-            "tcp.dstport",
-            "-e",
-            "tcp.seq_raw",
-            "-e",
-            "tcp.ack_raw",
-            "-e",
-            "tcp.len",
-            "-E",
-            "separator=,",
-        ]
-        header = "time,epoch,src_ip,dst_ip,src_port,dst_port,seq,ack,len\n"
-        output_file = os.path.join(root_dir, f"{prefix}-packet-client.csv")
-        # Run the command and write the output to a file
-        with open(output_file, "w") as f:
-            f.write(header)
-
-        with open(output_file, "a") as f:
-            completed_proc = subprocess.run(cmd, stdout=f, check=True)
-            if completed_proc.returncode == 0:
-                args.client_packets = output_file
-                print(f"> Output {output_file}")
-        print()
-
-    if args.server_packets != None and args.client_packets != None:
-        print("Parsing packet metrics")
-        client_packets = args.client_packets
-        server_packets = args.server_packets
-
-        df_client = pd.read_csv(client_packets)
-        df_client = filter_relative_time_range(df_client, begin_time, end_time)
-
-        # Check if we have TCP sequence number rollover
-        # Checking one side should be enough
-        print("Checking TCP sequence number roll over")
-        rollover_pt = check_rollover(df_client)
-        if len(rollover_pt) != 0:
-            print("Error: TCP SEQ rollover happpening!")
-            exit()
-        else:
-            print("> all good!")
-
-        target_port = df_client.src_port.unique()[0]
-        df_server = process_server_log(server_packets, target_port)
-        df_server = filter_relative_time_range(df_server, begin_time, end_time)
-
-        # Match packets and calculate transit time
-        print("Matching packets")
-        output_file = os.path.join(root_dir, f"{prefix}-transit.csv")
-        df_matched = calculate_transit(df_server, df_client)
-        df_matched.to_csv(output_file, index=False)
-
-        # Calculate jitter
-        print("Calculating jitter")
-        output_file = os.path.join(root_dir, f"{prefix}-jitter.csv")
-        df_jitter = calculate_jitter(df_matched)
-        df_jitter.to_csv(output_file, index=False)
-
-        # Estimate Frames
-        # print("Estimating frames")
-        # frame_size = 666667  # bytes (for a 4K video frame at 20 Mbps, 30 fps)
-        # output_file = os.path.join(root_dir, f"{prefix}-frames.json")
-        # df_frame = estimate_frame(df_client, frame_size)
-        # df_frame.to_csv(output_file, index=False)
-        print()
-
-    if args.ss_log != None:
-        ss_log = args.ss_log
-        if "bbr" in ss_log:
-            print("Parsing ss log for bbr")
-            df_ss = parse_ss(ss_log)
-            df_ss = filter_relative_time_range(df_ss, begin_time, end_time)
-            output_file = os.path.join(root_dir, f"{prefix}-ss-server.csv")
-            df_ss.to_csv(output_file, index=False)
-        print()
+    stages = analysis_stages(args, prefix, root_dir, time_range)
+    if not stages:
+        print("Error: no logs to parse")
+        exit(1)
+    status = run(stages, args.workers, force=args.nocache)
+    for stage in stages:
+        print(f"{stage.name}: {status[stage.name]}")
+        if status[stage.name] in ("ran", "up to date"):
+            for fname in stage.outputs:
+                print("Saved as", fname)
+    if any(s in ("failed", "blocked") for s in status.values()):
+        exit(1)
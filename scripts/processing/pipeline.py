@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from cache import CACHE_DIR, file_digest, read_json, write_json
+
+# Analysis stages as a DAG over files. A stage reads its input files and
+# writes its output files; stages are ordered by which stage produces which
+# input. A stage re-runs only when an output is missing or was changed, or
+# the content of an input or its parameters differ from its last run, as
+# recorded in <CACHE_DIR>/pipeline.json. Stages with their inputs ready run
+# concurrently across a process pool; a stage that re-ran but wrote the same
+# content leaves the stages after it up to date.
+MANIFEST = "pipeline.json"
+# Bump when a stage changes what it writes
+PIPELINE_VERSION = 1
+
+
+class Stage:
+    def __init__(self, name, func, inputs, outputs, params=None, options=None):
+        self.name = name
+        # Called as func(inputs, outputs, **params, **options) in a worker
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        # Change what the stage writes, part of its signature
+        self.params = params or {}
+        # Do not, e.g. whether to use the parse cache
+        self.options = options or {}
+
+    def key(self):
+        return "|".join(os.path.abspath(f) for f in self.outputs)
+
+    def signature(self):
+        data = [
+            PIPELINE_VERSION,
+            self.name,
+            f"{self.func.__module__}.{self.func.__qualname__}",
+            self.params,
+            [file_digest(f) for f in self.inputs],
+        ]
+        data = json.dumps(data, sort_keys=True, default=str)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+
+def _order(stages):
+    """Upstream stage names of every stage, ValueError on a cycle."""
+    producer = {}
+    for stage in stages:
+        for out in stage.outputs:
+            if out in producer:
+                raise ValueError(f"{out} written by {producer[out]} and {stage.name}")
+            producer[out] = stage.name
+    deps = {s.name: {producer[f] for f in s.inputs if f in producer} for s in stages}
+    left = {name: set(d) for name, d in deps.items()}
+    while left:
+        ready = [name for name, d in left.items() if not d]
+        if not ready:
+            raise ValueError(f"cycle between stages {', '.join(sorted(left))}")
+        for name in ready:
+            del left[name]
+        for d in left.values():
+            d.difference_update(ready)
+    return deps
+
+
+def _up_to_date(stage, signature, manifest):
+    entry = manifest.get(stage.key())
+    if entry is None or entry["signature"] != signature:
+        return False
+    return all(
+        os.path.exists(f) and file_digest(f) == entry["outputs"].get(f)
+        for f in stage.outputs
+    )
+
+
+def _tmp(fname):
+    return f"{fname}.{os.getpid()}.tmp"
+
+
+def run_stage(stage):
+    """Run a stage on temporary outputs, moved in place once all are written."""
+    tmp = [_tmp(f) for f in stage.outputs]
+    for f in stage.outputs:
+        out_dir = os.path.dirname(f)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+    begin = time.perf_counter()
+    try:
+        stage.func(stage.inputs, tmp, **stage.params, **stage.options)
+        for src, dst in zip(tmp, stage.outputs):
+            os.replace(src, dst)
+    finally:
+        for f in tmp:
+            if os.path.exists(f):
+                os.remove(f)
+    return time.perf_counter() - begin
+
+
+def _inline(stage):
+    future = Future()
+    try:
+        future.set_result(run_stage(stage))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def run(stages, workers=None, force=False, cache_dir=CACHE_DIR):
+    """Run the stale stages, each once its upstream stages are done.
+
+    Returns {stage name: status}, status one of "ran", "up to date",
+    "failed" or "blocked" (an upstream stage failed).
+    """
+    deps = _order(stages)
+    by_name = {s.name: s for s in stages}
+    manifest_file = os.path.join(cache_dir, MANIFEST)
+    manifest = read_json(manifest_file) or {}
+    status, running, signatures = {}, {}, {}
+    pool = None
+    if workers != 1 and len(stages) > 1:
+        pool = ProcessPoolExecutor(max_workers=workers)
+
+    try:
+        while True:
+            # Launch every stage whose upstream is done, skipping may free more
+            launched = True
+            while launched:
+                launched = False
+                for name, stage in by_name.items():
+                    if name in status or name in running.values():
+                        continue
+                    if not all(d in status for d in deps[name]):
+                        continue
+                    launched = True
+                    if any(status[d] in ("failed", "blocked") for d in deps[name]):
+                        status[name] = "blocked"
+                        continue
+                    missing = [f for f in stage.inputs if not os.path.exists(f)]
+                    if missing:
+                        print(f"Error: {name}: no {', '.join(missing)}")
+                        status[name] = "failed"
+                        continue
+                    signature = stage.signature()
+                    if not force and _up_to_date(stage, signature, manifest):
+                        status[name] = "up to date"
+                        continue
+                    print(f"> {name}")
+                    future = pool.submit(run_stage, stage) if pool else _inline(stage)
+                    running[future] = name
+                    signatures[name] = signature
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                stage = by_name[name]
+                try:
+                    elapsed = future.result()
+                except Exception as e:
+                    print(f"Error: {name}: {e}")
+                    status[name] = "failed"
+                    continue
+                manifest[stage.key()] = {
+                    "signature": signatures[name],
+                    "outputs": {f: file_digest(f) for f in stage.outputs},
+                }
+                os.makedirs(cache_dir, exist_ok=True)
+                write_json(manifest_file, manifest)
+                status[name] = "ran"
+                print(f"> {name} done in {elapsed:.1f}s")
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+    return status
@@ -5,6 +5,9 @@ import numpy as np
 import os
 from code import interact
 
+from cache import cached
+from downsample import plot_series
+
 
 def plot(x, y):
     plt.plot(x, y, marker=".", markersize=1)
@@ -83,9 +86,15 @@ if __name__ == "__main__":
         ax = axes[fig_id]
         fig_id += 1
         # iperf3
-        df_iperf = pd.read_csv(args.throughput)
+        df_iperf = cached(
+            "csv",
+            args.throughput,
+            pd.read_csv,
+            columns=["time", "throughput"],
+            time_range=(begin_time, end_time),
+        )
         df_iperf = filter_relative_time_range(df_iperf, begin_time, end_time)
-        ax.plot(df_iperf.time, df_iperf.throughput, marker=".", markersize=2)
+        plot_series(ax, df_iperf.time, df_iperf.throughput, marker=".", markersize=2)
         ax.set_ylabel("Thuput(Mbps)")
         avg_thuput = df_iperf.throughput.mean()
         print(f"Average throughput {avg_thuput}")
@@ -112,9 +121,15 @@ if __name__ == "__main__":
     if args.ss:
         ax = axes[fig_id]
         fig_id += 1
-        df_ss = pd.read_csv(args.ss)
+        df_ss = cached(
+            "csv",
+            args.ss,
+            pd.read_csv,
+            columns=["time", "segs_out"],
+            time_range=(begin_time, end_time),
+        )
         df_ss = filter_relative_time_range(df_ss, begin_time, end_time)
-        ax.plot(df_ss.time, df_ss.segs_out, marker=".", markersize=1)
+        plot_series(ax, df_ss.time, df_ss.segs_out, marker=".", markersize=1)
         ax.set_ylabel("bbr minRTT")
         # print("SS: bbr_mrtt:", pd.unique(df_ss.bbr_mrtt))
         # interact(local=locals())
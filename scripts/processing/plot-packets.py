@@ -0,0 +1,120 @@
+# Packet-level views around handovers, tcptrace style
+# seq/ack vs time from the client packets (parse-logs -c / --client_pcap)
+# and transit vs time from the matched packets ({prefix}-transit.csv).
+# Points are binned into one count per pixel and drawn with imshow, so a
+# full run of millions of packets renders as fast as a zoomed range.
+import os
+import argparse
+
+import numpy as np
+import pandas as pd
+import matplotlib.pyplot as plt
+
+from cache import cached
+from downsample import plot_density
+from render import plot_ho_lines
+from runs import parse_trace
+from seqnum import unwrap_seq
+
+# mode -> (file suffix, y column, y label)
+MODES = {
+    "seq": ("packet-client.csv", "seq", "Relative seq (MB)"),
+    "ack": ("packet-client.csv", "ack", "Relative ack (MB)"),
+    "transit": ("transit.csv", "transit_time", "Transit (ms)"),
+}
+
+
+def load_mode(fname, mode, time_range):
+    _, col, _ = MODES[mode]
+    df = cached("csv", fname, pd.read_csv, columns=["time", col])
+    df = df.sort_values("time", kind="stable")
+    y = df[col].to_numpy()
+    if mode in ("seq", "ack"):
+        # Unwrap before relative to the first packet, in MB like tcptrace
+        y = unwrap_seq(y)
+        y = (y - y[0]) / 1e6 if y.size else y.astype(np.float64)
+    else:
+        y = y * 1000  # s to ms
+    t = df["time"].to_numpy()
+    keep = (t >= time_range[0]) & (t <= time_range[1])
+    return t[keep], y[keep]
+
+
+def colorbar_axes(ax, width=0.015, pad=0.01):
+    """Shrink ax and return an axes for its colorbar on the right.
+
+    Done before plot_density, so the image is sized to the final axes.
+    """
+    pos = ax.get_position()
+    ax.set_position([pos.x0, pos.y0, pos.width - width - pad, pos.height])
+    return ax.get_figure().add_axes([pos.x1 - width, pos.y0, width, pos.height])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Packet-level density plots")
+    parser.add_argument("-a", "--auto", help="file prefix in output/, e.g. cubic-1")
+    parser.add_argument("-c", "--client_packets")
+    parser.add_argument("--transit")
+    parser.add_argument("--trace", help="HO trace, default trace-{id}-test.csv")
+    parser.add_argument(
+        "-m", "--modes", nargs="+", default=["seq", "transit"], choices=list(MODES)
+    )
+    parser.add_argument("-b", "--begin", type=float, default=0)
+    parser.add_argument("-e", "--end", type=float, default=1200)
+    parser.add_argument("--ylim", type=float, nargs=2, help="y range of every panel")
+    parser.add_argument("--dpi", type=int, default=150)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    root_dir = "output"
+    files = {"packet-client.csv": args.client_packets, "transit.csv": args.transit}
+    if args.auto != None:
+        for suffix in files:
+            fname = os.path.join(root_dir, f"{args.auto}-{suffix}")
+            if files[suffix] is None and os.path.exists(fname):
+                files[suffix] = fname
+        fname = os.path.join(root_dir, f"trace-{args.auto.split('-')[-1]}-test.csv")
+        if args.trace is None and os.path.exists(fname):
+            args.trace = fname
+
+    modes = [m for m in args.modes if files[MODES[m][0]] is not None]
+    if not modes:
+        print("No input file specified(or detected)")
+        exit(1)
+
+    ho_times, target_links = [], []
+    if args.trace:
+        ho_times, target_links = parse_trace(args.trace)
+        ho_times = np.asarray(ho_times)
+        in_range = (ho_times >= args.begin) & (ho_times <= args.end)
+        target_links = np.asarray(target_links)
+        prev = np.concatenate(([1], target_links[:-1]))
+        initial_link = prev[in_range][0] if in_range.any() else 1
+        ho_times, target_links = ho_times[in_range], target_links[in_range]
+
+    fig, axes = plt.subplots(
+        len(modes), figsize=(12, 3 * len(modes)), sharex=True, squeeze=False
+    )
+    for ax, mode in zip(axes[:, 0], modes):
+        suffix, _, ylabel = MODES[mode]
+        t, y = load_mode(files[suffix], mode, (args.begin, args.end))
+        print(f"{mode}: {t.size} packets")
+        if t.size == 0:
+            continue
+        x_range = (max(args.begin, t[0]), min(args.end, t[-1]))
+        cax = colorbar_axes(ax)
+        im = plot_density(ax, t, y, x_range, args.ylim, dpi=args.dpi)
+        if im is None:
+            print(f"{mode}: no finite values, skipped")
+            cax.remove()
+            continue
+        fig.colorbar(im, cax=cax, label="log10 packets")
+        if len(ho_times):
+            plot_ho_lines(ax, ho_times, target_links, initial_link)
+        ax.set_ylabel(ylabel)
+    axes[-1, 0].set_xlabel("Time (s)")
+
+    name = args.auto or "manual"
+    fig_name = args.output or f"packets-{name}.png"
+    plt.savefig(fig_name, dpi=args.dpi)
+    print("Save to", fig_name)
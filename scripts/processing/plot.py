@@ -5,6 +5,8 @@ import argparse
 from pathlib import Path
 from datetime import datetime
 
+from downsample import plot_series
+
 
 class MetricsPlotter:
     def __init__(self, csv_file):
@@ -22,7 +24,9 @@ class MetricsPlotter:
             return False
 
         plt.figure(figsize=figsize)
-        plt.plot(self.data["timestamp"]/1e9, self.data[metric], linewidth=1)
+        plot_series(
+            plt.gca(), self.data["timestamp"] / 1e9, self.data[metric], linewidth=1, dpi=300
+        )
 
         # Set title and labels
         plt.title(title or f"{metric} over Time")
@@ -58,8 +62,13 @@ class MetricsPlotter:
 
         # Plot each metric
         for metric in metrics:
-            plt.plot(
-                self.data["timestamp"]/1e9, self.data[metric], label=metric, linewidth=1
+            plot_series(
+                plt.gca(),
+                self.data["timestamp"] / 1e9,
+                self.data[metric],
+                label=metric,
+                linewidth=1,
+                dpi=300,
             )
 
         # Add legend
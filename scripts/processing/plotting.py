@@ -3,11 +3,14 @@ import matplotlib.pyplot as plt
 import argparse
 from datetime import datetime, timedelta
 
+from cache import cached
+from downsample import plot_series
+
 
 class MetricsPlotter:
     def __init__(self, csv_file):
-        # Read CSV file
-        self.df = pd.read_csv(csv_file)
+        # Read CSV file, cached as columns under output/.cache
+        self.df = cached("csv", csv_file, pd.read_csv)
         # Convert timestamp to datetime
         self.df["datetime"] = pd.to_datetime(self.df["timestamp"], unit="ns")
         # Calculate time offset in seconds from first timestamp
@@ -42,7 +45,15 @@ class MetricsPlotter:
 
         # Create the plot
         plt.figure(figsize=figsize)
-        plt.plot(plot_df["time_offset"], plot_df[metric_name], color="blue", ls="-", marker=".", linewidth=1)
+        plot_series(
+            plt.gca(),
+            plot_df["time_offset"],
+            plot_df[metric_name],
+            color="blue",
+            ls="-",
+            marker=".",
+            linewidth=1,
+        )
 
         # Add labels and title
         plt.xlabel("Time (seconds)")
@@ -0,0 +1,115 @@
+# Cross-run queries on the results store filled by ingest-results.py
+#   python query-results.py -m ho_thuput_mean -g all-all --by scenario algo \
+#       --columns variant
+#   python query-results.py -m rampup_mean --where algo=cubic,bbr build=bin-1a2b
+#   python query-results.py --series throughput --by algo variant --step 10
+#   python query-results.py --runs
+#   python query-results.py --sql "SELECT algo, COUNT(*) FROM runs GROUP BY algo"
+import os
+import time
+import argparse
+
+from warehouse import DB_FILE, RUN_COLUMNS, aggregate, connect, metric_groups
+from warehouse import query, series_mean
+
+
+def parse_where(items):
+    filters = {}
+    for item in items or []:
+        column, sep, values = item.partition("=")
+        if not sep or column not in RUN_COLUMNS:
+            raise ValueError(f"bad filter {item}, want <column>=<value>[,<value>]")
+        filters.setdefault(column, []).extend(values.split(","))
+    return filters
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the results store")
+    parser.add_argument("--db", default=DB_FILE)
+    parser.add_argument("-m", "--metric", default="ho_thuput_mean")
+    parser.add_argument(
+        "-g", "--group", nargs="+", help="default all-all or all, else every group"
+    )
+    parser.add_argument(
+        "--by",
+        nargs="*",
+        default=["scenario", "algo", "variant"],
+        help=", ".join(RUN_COLUMNS),
+    )
+    parser.add_argument("--columns", help="one of --by spread as columns, of the mean")
+    parser.add_argument("--where", nargs="+", help="e.g. algo=cubic,bbr")
+    parser.add_argument("--series", help="e.g. throughput, cwnd, rtt, ho")
+    parser.add_argument("--step", type=float, default=1, help="s, of --series")
+    parser.add_argument("--runs", action="store_true", help="list ingested runs")
+    parser.add_argument("--sql")
+    parser.add_argument("-o", "--output", help="also save the result as csv")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"Error: no results store {args.db}, run ingest-results.py")
+        exit(1)
+    try:
+        filters = parse_where(args.where)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+    conn = connect(args.db)
+
+    begin = time.perf_counter()
+    try:
+        if args.sql:
+            df = query(conn, args.sql)
+        elif args.runs:
+            df = query(
+                conn,
+                "SELECT run_id, scenario, algo, variant, build, trace_sha, ingested "
+                "FROM runs ORDER BY build, scenario, run_id, algo, variant",
+            )
+        elif args.series:
+            df = series_mean(conn, args.series, args.by, args.step, filters)
+        else:
+            groups = metric_groups(conn, args.metric)
+            if not groups:
+                print(f"Error: no metric {args.metric} in {args.db}")
+                exit(1)
+            # HO metrics are per HO type (all-all, sub6-mmw, ...), thuput_mean
+            # per link (all, sub6, mmw), link_* only per sub6 and mmw: with no
+            # total group, every group is shown
+            group = args.group
+            if group is None:
+                total = [g for g in ("all-all", "all") if g in groups]
+                group = total[:1] or groups
+            missing = [g for g in group if g not in groups]
+            if missing:
+                print(
+                    f"Error: no {args.metric} in group {', '.join(missing)}, "
+                    f"groups: {', '.join(groups)}"
+                )
+                exit(1)
+            filters["grp"] = group
+            by = args.by + (["grp"] if len(group) > 1 else [])
+            df = aggregate(conn, args.metric, by, filters)
+    except Exception as e:
+        print(f"Error: {e}")
+        exit(1)
+    elapsed = time.perf_counter() - begin
+    if df.empty and not args.sql:
+        print("Error: no rows match, see --runs for what is stored")
+        exit(1)
+
+    if args.columns and not df.empty:
+        if args.columns not in df.columns:
+            print(f"Error: --columns {args.columns} is not in --by")
+            exit(1)
+        index = [c for c in df.columns if c in RUN_COLUMNS and c != args.columns]
+        index += ["time"] if "time" in df.columns else []
+        if not index:
+            print("Error: --columns needs one more --by column")
+            exit(1)
+        df = df.pivot_table(index=index, columns=args.columns, values="mean")
+        df = df.reset_index()
+    print(df.round(3).to_string(index=False))
+    print(f"{len(df)} rows in {elapsed * 1000:.1f} ms")
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"Save to {args.output}")
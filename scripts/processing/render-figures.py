@@ -0,0 +1,73 @@
+# Render the figures of every run in output/ across a process pool
+# One throughput figure per {algo}-{id} run with HO lines from its trace,
+# optionally ss metrics underneath and one zoomed figure per handover.
+import os
+import argparse
+
+import numpy as np
+
+from render import render_all
+from runs import discover_runs, parse_trace
+
+
+def run_jobs(run_id, variant, iperf_log, trace, args):
+    prefix = f"{variant}-{run_id}"
+    panels = [{"iperf": iperf_log}]
+    ss_csv = os.path.join(args.root_dir, f"{prefix}-ss-server.csv")
+    if os.path.exists(ss_csv):
+        panels += [{"csv": ss_csv, "column": m} for m in args.ss_metrics]
+    job = {
+        "panels": panels,
+        "trace": trace,
+        "title": prefix,
+        "dpi": args.dpi,
+        "figsize": (12, 3),
+    }
+    jobs = [
+        dict(
+            job,
+            output=os.path.join(args.outdir, f"thuput-{prefix}.png"),
+            time_range=(args.begin, args.end),
+        )
+    ]
+    if args.ho_zoom:
+        ho_times, _ = parse_trace(trace)
+        ho_times = np.asarray(ho_times)
+        in_range = (ho_times >= args.begin) & (ho_times <= args.end)
+        for i, t in enumerate(ho_times[in_range]):
+            jobs.append(
+                dict(
+                    job,
+                    output=os.path.join(args.outdir, prefix, f"ho-{i:03d}.png"),
+                    time_range=(t - args.ho_zoom, t + args.ho_zoom),
+                    title=f"{prefix} HO {i} at {t:.1f}s",
+                )
+            )
+    return jobs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render figures of all runs")
+    parser.add_argument("--root_dir", default="output")
+    parser.add_argument("-o", "--outdir", default="figures")
+    parser.add_argument("-v", "--variants", nargs="+", help="e.g. cubic m_cubic")
+    parser.add_argument("-r", "--run_ids", nargs="+")
+    parser.add_argument("-b", "--begin", type=float, default=0)
+    parser.add_argument("-e", "--end", type=float, default=1200)
+    parser.add_argument("--ss_metrics", nargs="*", default=[], help="e.g. cwnd rtt")
+    parser.add_argument("--ho_zoom", type=float, help="also +-s around each HO")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("-j", "--workers", type=int)
+    args = parser.parse_args()
+
+    runs = discover_runs(args.root_dir, args.variants, args.run_ids)
+    if not runs:
+        print(f"Error: no runs found in {args.root_dir}")
+        exit(1)
+
+    jobs = []
+    for run in runs:
+        jobs += run_jobs(*run, args)
+    print(f"{len(jobs)} figures for {len(runs)} runs")
+    written = render_all(jobs, args.workers)
+    print(f"{len(written)}/{len(jobs)} saved to {args.outdir}")
@@ -0,0 +1,145 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+# Figures are only ever written to files
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from cache import cached
+from downsample import plot_series
+from runs import load_thuput, parse_trace
+
+# A plot job is a dict:
+#   output      png path
+#   panels      list of panels, one subplot each:
+#                 {"x": times, "y": values} or
+#                 {"iperf": client json} or
+#                 {"csv": file, "column": name, "time_col": "time"}
+#               plus optional "ylabel" and plot "style" kwargs
+#   time_range  (begin, end) in s, default (0, 1200)
+#   trace       trace csv for HO lines, or ho: (ho_times, target_links)
+#               with target_links None to draw every line red
+#   title, figsize (per panel), dpi
+# Jobs hold file names or plain arrays so they pickle into a worker.
+DEFAULT_STYLE = {"marker": ".", "markersize": 2}
+
+# Figures of the current process by (panels, figsize, dpi), reused across jobs
+_TEMPLATES = {}
+
+
+def _template(n_panels, figsize, dpi):
+    key = (n_panels, tuple(figsize), dpi)
+    if key not in _TEMPLATES:
+        fig, axes = plt.subplots(
+            n_panels,
+            figsize=(figsize[0], figsize[1] * n_panels),
+            dpi=dpi,
+            sharex=True,
+            squeeze=False,
+        )
+        _TEMPLATES[key] = (fig, axes[:, 0])
+    fig, axes = _TEMPLATES[key]
+    for ax in axes:
+        ax.cla()
+    fig.suptitle("")
+    return fig, axes
+
+
+def load_panel(panel, time_range):
+    """Return (x, y, ylabel) of a panel within time_range."""
+    if "iperf" in panel:
+        df = load_thuput(panel["iperf"], time_range)
+        return df.time, df.throughput, panel.get("ylabel", "Thuput(Mbps)")
+    if "csv" in panel:
+        time_col, col = panel.get("time_col", "time"), panel["column"]
+        df = cached(
+            "csv",
+            panel["csv"],
+            pd.read_csv,
+            columns=[time_col, col],
+            time_range=time_range,
+            time_col=time_col,
+        )
+        return df[time_col], df[col], panel.get("ylabel", col)
+    x, y = np.asarray(panel["x"]), np.asarray(panel["y"])
+    keep = (x >= time_range[0]) & (x <= time_range[1])
+    return x[keep], y[keep], panel.get("ylabel", "")
+
+
+# Handover lines, red for a link change, green for the same link
+def plot_ho_lines(ax, ho_times, target_links=None, initial_link=1):
+    prev_link = initial_link
+    for i, t in enumerate(ho_times):
+        if target_links is None:
+            color = "tab:red"
+        else:
+            color = "tab:green" if target_links[i] == prev_link else "tab:red"
+            prev_link = target_links[i]
+        ax.axvline(t, color=color, lw=0.8)
+
+
+def _ho_overlay(job, time_range):
+    if job.get("trace"):
+        ho_times, target_links = parse_trace(job["trace"])
+    elif job.get("ho") is not None:
+        ho_times, target_links = job["ho"]
+    else:
+        return None
+    ho_times = np.asarray(ho_times)
+    in_range = (ho_times >= time_range[0]) & (ho_times <= time_range[1])
+    if target_links is None:
+        return ho_times[in_range], None, 1
+    target_links = np.asarray(target_links)
+    # Link served when the range starts
+    prev = np.concatenate(([1], target_links[:-1]))
+    initial_link = prev[in_range][0] if in_range.any() else 1
+    return ho_times[in_range], target_links[in_range], initial_link
+
+
+def render_job(job):
+    """Render one plot job to job["output"], return the file name."""
+    time_range = tuple(job.get("time_range") or (0, 1200))
+    dpi = job.get("dpi", 100)
+    fig, axes = _template(len(job["panels"]), job.get("figsize", (12, 4)), dpi)
+    ho = _ho_overlay(job, time_range)
+    for ax, panel in zip(axes, job["panels"]):
+        x, y, ylabel = load_panel(panel, time_range)
+        plot_series(ax, x, y, dpi=dpi, **panel.get("style", DEFAULT_STYLE))
+        ax.set_ylabel(ylabel)
+        if ho is not None:
+            plot_ho_lines(ax, *ho)
+    axes[-1].set_xlabel("Time (s)")
+    if job.get("title"):
+        fig.suptitle(job["title"])
+    out_dir = os.path.dirname(job["output"])
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    fig.savefig(job["output"], dpi=dpi)
+    return job["output"]
+
+
+def _render(job):
+    try:
+        return render_job(job), None
+    except Exception as e:
+        return job.get("output"), e
+
+
+def render_all(jobs, workers=None):
+    """Render plot jobs across a process pool; returns the files written."""
+    if workers == 1 or len(jobs) <= 1:
+        results = [_render(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_render, jobs, chunksize=4))
+    written = []
+    for output, error in results:
+        if error is None:
+            written.append(output)
+        else:
+            print(f"Error: {output}: {error}")
+    return written
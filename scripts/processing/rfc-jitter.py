@@ -1,102 +1,61 @@
-import pyshark
 import csv
 import matplotlib.pyplot as plt
-import re
 import code
+import numpy as np
 import pandas as pd
 
+from capture import filter_packets, read_capture
+from jitter import transit_jitter
+from matching import match_packets
+from packet_log import read_packet_log
 
-# DEBUG counter
 
-# Function to parse PCAP and extract timestamps and sequence numbers
-def parse_pcap(pcap_file, filter):
-    packets = []
-    capture = pyshark.FileCapture(pcap_file, display_filter=filter)
-    n = 200
-    for packet in capture:
-        n -= 1
-        if n <= 0:
-            break
-        try:
-            tcp_layer = packet.tcp
-            seq_num = int(tcp_layer.seq)
-            timestamp = float(packet.sniff_timestamp)
-            packets.append((seq_num, timestamp))
-        except AttributeError:
-            print("Pcap parsing error")
-            continue
-    capture.close()
-    print("Parsing done")
-    return packets
-
-# Generate client csv
-# tshark -r trace-1-client-debug.pcap -Y "ip.dst == 10.0.0.2" -T fields -e frame.time_epoch -e tcp.seq_raw -e tcp.ack_raw -E separator=, > client_arrival.csv
+# Client arrivals from a capture, same columns as parse_clientts
+# (replaces: tshark -r <pcap> -Y "ip.dst == 10.0.0.2" -T fields -e frame.time_epoch -e tcp.seq_raw -e tcp.ack_raw)
+def parse_pcap(pcap_file, dst_ip="10.0.0.2"):
+    pkts = filter_packets(read_capture(pcap_file), dst_ip=dst_ip)
+    epoch_ms = (pkts["epoch"] * 1000).astype(np.int64)
+    return np.column_stack((epoch_ms, pkts["seq"], pkts["ack"])).astype(np.int64)
 
 def parse_serverts(filename):
-    parsed_data = []
-    with open(filename, "r") as f:
-        text = f.read()
-        pattern = r'packet,(\d+),(\d+),(\d+),(\d+)'
-        matches = re.findall(pattern, text)
-        for epoch, port, tcp_seq, tcp_ack in matches:
-            if port == "50730":
-                parsed_data.append((int(epoch), int(tcp_seq), int(tcp_ack)))        
-    return parsed_data
+    records = read_packet_log(filename, port=50730)
+    return np.column_stack(
+        (records["ts"], records["seq"], records["ack"])
+    ).astype(np.int64)
 
 def parse_clientts(filename):
-    parsed_data = []
-    with open(filename, "r") as file:
-        csv_reader = csv.reader(file)
-        for row in csv_reader:
-            epoch_time = int(float(row[0])*1000)  # Convert epoch time to float
-            tcp_seq = int(row[1])       # Convert TCP sequence number to int
-            tcp_ack = int(row[2])       # Convert TCP acknowledgment number to int
-            parsed_data.append((epoch_time, tcp_seq, tcp_ack))
-    return parsed_data
+    df = pd.read_csv(filename, header=None, names=["epoch", "seq", "ack"])
+    # Convert epoch time to ms
+    epoch_ms = (df.epoch.to_numpy() * 1000).astype(np.int64)
+    return np.column_stack((epoch_ms, df.seq.to_numpy(), df.ack.to_numpy()))
 
 # Match packets from sender and receiver
 def map_packets(sender, receiver):
-    # Create a dictionary to store sender packets by tcp_seq
-    sender_dict = {}
-    for send_time, tcp_seq, tcp_ack in sender:
-        if tcp_seq in sender_dict:
-            if send_time > sender_dict[tcp_seq][0]:
-                continue
-        sender_dict[tcp_seq] = (send_time, tcp_ack)
-    # sender_dict = {tcp_seq: (send_time, tcp_ack) for send_time, tcp_seq, tcp_ack in sender}
-    # Create a list to store the result
-    result = [("seq", "ack", "send_ts", "recv_ts")]
-    # Iterate through receiver packets and match using tcp_seq
-    seen = set()
-    for receive_time, tcp_seq, tcp_ack in receiver:
-        if tcp_seq in sender_dict:
-            send_time, sender_ack = sender_dict[tcp_seq]
-            if tcp_ack != sender_ack:
-                print("Error: tcp ack unmatched but seq match")
-                print(tcp_seq, tcp_ack, sender_ack)
-            else:
-                if tcp_seq not in seen:
-                    result.append((tcp_seq, tcp_ack, send_time, receive_time))
-                    seen.add(tcp_seq)
-    return result
+    matched, stats = match_packets(
+        sender[:, 0], sender[:, 1], sender[:, 2],
+        receiver[:, 0], receiver[:, 1], receiver[:, 2],
+    )
+    ok = matched["ack_ok"]
+    result = pd.DataFrame(
+        {
+            "seq": matched["seq"][ok],
+            "ack": matched["ack"][ok],
+            "send_ts": matched["send_ts"][ok],
+            "recv_ts": matched["recv_ts"][ok],
+        }
+    )
+    return result, stats
 
 # Compute jitter and transit times
 def compute_jitter_and_transit(df_matched):
-    results = []
-    prev_transit_time = None
-    jitter = 0
-
-    for i,r in df_matched.iterrows():
-        transit_time = r.rts - r.sts
-        if transit_time < 0:
-            print("ERROR: Receive earlier before sent!")
-            continue
-        if prev_transit_time is not None:
-            jitter += (abs(transit_time - prev_transit_time) - jitter) / 16
-        results.append((r.sts, transit_time, jitter))
-        prev_transit_time = transit_time
-
-    return results
+    transit = (df_matched.rts - df_matched.sts).to_numpy()
+    valid = transit >= 0
+    if not valid.all():
+        print(f"ERROR: {(~valid).sum()} packets received earlier than sent!")
+    sts = df_matched.sts.to_numpy()[valid]
+    transit = transit[valid]
+    jitter, _ = transit_jitter(transit)
+    return np.column_stack((sts, transit, jitter))
 
 # Save results to CSV
 def save_to_csv(results, output_file):
@@ -115,8 +74,9 @@ if __name__ == "__main__":
     # client_ts = parse_clientts(clientlog)
     # print("client done")
 
-    # matched_packets = map_packets(server_ts, client_ts)
-    # save_to_csv(matched_packets, output_csv)
+    # matched_packets, stats = map_packets(server_ts, client_ts)
+    # print(stats)
+    # matched_packets.to_csv(output_csv, index=False)
 
     df = pd.read_csv(output_csv)
     df["sts"] = df.send_ts - df.send_ts[0]
@@ -0,0 +1,74 @@
+import os
+import re
+import glob
+
+import pandas as pd
+
+from cache import cached
+from iperf_log import iperf_throughput
+from traces import ho_events, read_trace
+
+# Artifacts of scripts/run/batch_run_iperf3.sh in scripts/processing/output:
+#   {algo}-{id}-iperf-client.json, {algo}-{id}-ss-server.log, ...
+#   trace-{id}-test.csv, the trace the emulator replayed for run id
+# Trace ids per location, as in batch_run_iperf3.sh
+SCENARIOS = {
+    "downtown": range(1, 7),
+    "parkinglot": [7],
+    "sportpark": [8, 9],
+    "airport": [10, 11],
+    "seaport": [12, 13],
+}
+RUN_LOG = re.compile(r"^(?P<variant>.+)-(?P<run_id>[^-]+)-iperf-client\.json$")
+
+
+def scenario_of(run_id):
+    for name, ids in SCENARIOS.items():
+        if run_id.isdigit() and int(run_id) in ids:
+            return name
+    return "other"
+
+
+def discover_runs(root_dir, variants=None, run_ids=None):
+    """Return (run_id, variant, iperf log, trace) of every complete run."""
+    runs = []
+    for fname in sorted(glob.glob(os.path.join(root_dir, "*-iperf-client.json"))):
+        found = RUN_LOG.match(os.path.basename(fname))
+        if found is None:
+            continue
+        variant, run_id = found["variant"], found["run_id"]
+        if variants and variant not in variants:
+            continue
+        if run_ids and run_id not in run_ids:
+            continue
+        trace = os.path.join(root_dir, f"trace-{run_id}-test.csv")
+        if not os.path.exists(trace):
+            print(f"Warning: no trace for {fname}, skipped")
+            continue
+        runs.append((run_id, variant, fname, trace))
+    return runs
+
+
+def iperf3_frame(file_path):
+    thuput_times, thuputs = iperf_throughput(file_path)
+    return pd.DataFrame({"time": thuput_times, "throughput": thuputs})
+
+
+# Throughput of an iperf3 client log, through the parse cache
+def load_thuput(fname, time_range=None):
+    return cached("iperf", fname, iperf3_frame, time_range=time_range)
+
+
+# HO times (s, shifted by offset) and target links of a trace
+def parse_trace(data, offset=2):
+    try:
+        events, errors = read_trace(data)
+    except OSError as e:
+        print(f"Error processing file {data}: {e}")
+        return [], []
+    for error in errors:
+        print(f"Error processing file {data}: {error}")
+    ho = ho_events(events)
+    ho_time = [t / 1000 - offset for t, _ in ho]
+    target_link = [mark for _, mark in ho]  # 1 sub6, 2 mmw
+    return ho_time, target_link
@@ -0,0 +1,44 @@
+import numpy as np
+
+SEQ_SPACE = 1 << 32
+HALF_SPACE = 1 << 31
+
+
+def unwrap_seq(values, flows=None, ref=None):
+    """Map 32-bit TCP seq/ack numbers into monotonic 64-bit space.
+
+    Records must be in capture order. Consecutive values of a flow are taken to
+    be less than 2**31 apart, so reordering around the wrap point lands on the
+    right side of it. Each flow starts at its raw first value, or at the
+    translate of it by a multiple of 2**32 nearest to ref, which keeps two
+    captures of the same connection in the same space.
+    """
+    values = np.asarray(values).astype(np.int64)
+    out = np.empty_like(values)
+    if values.size == 0:
+        return out
+    if flows is None:
+        order = np.arange(values.size)
+        head = np.zeros(values.size, dtype=bool)
+    else:
+        flows = np.asarray(flows)
+        order = np.argsort(flows, kind="stable")
+        sorted_flows = flows[order]
+        head = np.empty(values.size, dtype=bool)
+        head[1:] = sorted_flows[1:] != sorted_flows[:-1]
+    head[0] = True
+
+    v = values[order]
+    step = np.empty_like(v)
+    step[0] = 0
+    step[1:] = (v[1:] - v[:-1] + HALF_SPACE) % SEQ_SPACE - HALF_SPACE
+    step[head] = 0
+    total = np.cumsum(step)
+    # Restart the running sum at each flow's first record
+    starts = np.flatnonzero(head)
+    lengths = np.diff(np.append(starts, v.size))
+    base = v[starts]
+    if ref is not None:
+        base = base + np.round((ref - base) / SEQ_SPACE).astype(np.int64) * SEQ_SPACE
+    out[order] = total - np.repeat(total[starts] - base, lengths)
+    return out
@@ -0,0 +1,154 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Lines written by scripts/run/monitor.sh:
+#   time:<ns> <second line of `ss -it` for the iperf3 connection>
+# Values are converted the way the old regex parsers did: plain numbers,
+# percentages and Mbps rates become floats, anything else stays a string.
+CHUNK_SIZE = 32 * 1024 * 1024
+
+
+def convert_value(value):
+    try:
+        if value.replace(".", "").isdigit():
+            return float(value)
+        if "%" in value:
+            return float(value.replace("%", ""))
+        if "Mbps" in value:
+            return float(value.replace("Mbps", ""))
+    except ValueError:
+        pass
+    return value
+
+
+def _split_pair(token):
+    # Same split as the old (\w+):([^ ]+) regex for a single token
+    key, sep, value = token.partition(":")
+    if not sep or not value:
+        return None, None
+    start = len(key)
+    while start > 0 and (key[start - 1].isalnum() or key[start - 1] == "_"):
+        start -= 1
+    if start == len(key):
+        return None, None
+    return key[start:], value
+
+
+def parse_bbr_info(bbr_str):
+    """Parse the contents of bbr:(...) into bbr_* fields."""
+    fields = {}
+    for param in bbr_str.split(","):
+        if ":" not in param:
+            continue
+        key, value = param.split(":", 1)
+        key = key.replace("bbr", "").strip()
+        if "Mbps" in value:
+            value = float(value.replace("Mbps", ""))
+        elif value.replace(".", "").isdigit():
+            value = float(value)
+        fields[f"bbr_{key}"] = value
+    return fields
+
+
+def tokenize_ss_line(line):
+    """Yield (key, value) pairs of one monitor.sh line, nothing if it has no time."""
+    tokens = line.split()
+    if not tokens or not tokens[0].startswith("time:"):
+        return
+    timestamp = tokens[0][5:]
+    if not timestamp.isdigit():
+        return
+    yield "timestamp", int(timestamp)
+    for token in tokens:
+        if token.startswith("bbr:("):
+            yield from parse_bbr_info(token[5:].split(")", 1)[0]).items()
+            continue
+        key, value = _split_pair(token)
+        if key is not None:
+            yield key, convert_value(value)
+
+
+def parse_ss_line(line):
+    """Parse one monitor.sh line into a flat dict, None if it has no time."""
+    return dict(tokenize_ss_line(line)) or None
+
+
+class SSColumns:
+    """Column store filled one line at a time; keys may appear mid-file."""
+
+    def __init__(self):
+        self.columns = {}
+        self.rows = 0
+
+    def add_line(self, line):
+        added = False
+        for key, value in tokenize_ss_line(line):
+            column = self.columns.get(key)
+            if column is None:
+                column = self.columns[key] = [None] * self.rows
+            column.append(value)
+            added = True
+        if added:
+            self.rows += 1
+            for column in self.columns.values():
+                if len(column) < self.rows:
+                    column.append(None)
+
+    def to_frame(self):
+        data = {}
+        for key, column in self.columns.items():
+            if key == "timestamp":
+                data[key] = np.array(column, dtype=np.int64)
+            elif all(v is None or isinstance(v, float) for v in column):
+                data[key] = np.array(column, dtype=np.float64)
+            else:
+                data[key] = pd.Series(column, dtype=object)
+        return pd.DataFrame(data)
+
+
+def parse_ss_range(fname, start, end):
+    """Parse the whole lines beginning in the byte range [start, end)."""
+    columns = SSColumns()
+    with open(fname, "rb") as f:
+        if start > 0:
+            # The line straddling start belongs to the previous range
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            columns.add_line(line.decode(errors="replace"))
+    return columns.to_frame()
+
+
+def parse_ss_log(fname, workers=None, chunk_size=CHUNK_SIZE):
+    """Parse a monitor.sh ss log into a DataFrame, chunks across a process pool.
+
+    Columns are timestamp (ns), epoch (s), every key:value field of the ss
+    output and the flattened bbr_* fields.
+    """
+    size = os.path.getsize(fname)
+    bounds = list(range(0, size, chunk_size)) + [size]
+    ranges = list(zip(bounds[:-1], bounds[1:]))
+    if len(ranges) <= 1 or workers == 1:
+        frames = [parse_ss_range(fname, start, end) for start, end in ranges]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            frames = list(
+                pool.map(
+                    parse_ss_range,
+                    [fname] * len(ranges),
+                    [r[0] for r in ranges],
+                    [r[1] for r in ranges],
+                )
+            )
+    frames = [df for df in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame(columns=["timestamp", "epoch"])
+    df = pd.concat(frames, ignore_index=True)
+    df.insert(1, "epoch", df["timestamp"] / 1e9)  # nano to sec
+    return df
@@ -0,0 +1,169 @@
+# Rank receive-window controller settings offline
+# Replays a recorded run (packet.log, optionally the capture for the ACKs)
+# through the worker and controller model of worker_sim.py for every point
+# of a grid over the SOL_INIT_SCHED and SOL_HO fields, across a process
+# pool. Fields not given keep the trace's values; SOL_HO fields add a
+# SOL_HO at every HO if the trace has none.
+#   python sweep-controller.py ../../input/trace-1.csv -p ../../packet.log \
+#       --enable_rw 1 --threshold 70 80 90 95 --pace 1 2 5 10 \
+#       --hist_rw1 1000 2000 4000 --burst_ms 0 100 200 --enable_adapt 1
+# Lower is better for every ranking metric, see worker_sim.simulate.
+import os
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from traces import EVENT_FIELDS, read_trace, validate
+from worker_sim import (
+    METRICS,
+    SOL_HO_PARAMS,
+    VECTOR_PARAMS,
+    add_capture_acks,
+    config_actions,
+    prepare,
+    read_timeline,
+    simulate,
+)
+
+SCHED_PARAMS = tuple(
+    f for f in EVENT_FIELDS["SOL_INIT_SCHED"] if f not in ("queue", "mark1", "mark2")
+)
+
+# Set in each worker process by _init
+_context = {}
+
+
+def _init(timeline, events, ack_delay, wscale):
+    _context.update(
+        timeline=timeline,
+        events=events,
+        ack_delay=ack_delay,
+        wscale=wscale,
+        prepared={},
+    )
+
+
+def _simulate(task):
+    shared, params, rows = task
+    key = tuple(sorted(shared.items()))
+    if key not in _context["prepared"]:
+        actions = config_actions(_context["events"], shared)
+        stream, stats = prepare(_context["timeline"], actions, _context["ack_delay"])
+        _context["prepared"][key] = (actions, stream, stats)
+    actions, stream, stats = _context["prepared"][key]
+    return rows, simulate(actions, stream, params, _context["wscale"]), stats
+
+
+def grid(events, args):
+    """Configurations of the sweep and the names of the swept fields."""
+    init = next(e for e in events if e.kind == "SOL_INIT_SCHED")
+    base = {k: init.params[k] for k in SCHED_PARAMS}
+    sol_ho = next((e for e in events if e.kind == "SOL_HO"), None)
+    if sol_ho is not None:
+        base.update((k, sol_ho.params[k]) for k in SOL_HO_PARAMS)
+    values = {}
+    for name in SCHED_PARAMS + SOL_HO_PARAMS:
+        given = getattr(args, name)
+        if given is not None:
+            values[name] = given
+    # A SOL_HO field without the others leaves them off
+    if any(k in values for k in SOL_HO_PARAMS):
+        for k in SOL_HO_PARAMS:
+            base.setdefault(k, 0)
+    names = list(values)
+    configs = [
+        dict(base, **dict(zip(names, point)))
+        for point in itertools.product(*values.values())
+    ]
+    return configs, names
+
+
+def tasks(configs, chunk):
+    """One task per chunk of configurations sharing a scheduler timeline."""
+    groups = {}
+    for row, config in enumerate(configs):
+        shared = {k: v for k, v in config.items() if k not in VECTOR_PARAMS}
+        groups.setdefault(tuple(sorted(shared.items())), (shared, []))[1].append(row)
+    for shared, rows in groups.values():
+        for start in range(0, len(rows), chunk):
+            part = np.array(rows[start : start + chunk])
+            params = {k: np.array([configs[r][k] for r in part]) for k in VECTOR_PARAMS}
+            yield shared, params, part
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep the rwnd controller offline")
+    parser.add_argument("trace", help="trace of the recorded run")
+    parser.add_argument("-p", "--packet_log", required=True)
+    parser.add_argument("--pcap", help="capture with the server's ACKs")
+    parser.add_argument("--port", type=int, help="sender port, default the busiest")
+    parser.add_argument("--server_port", type=int, default=5257)
+    parser.add_argument("--offset_ms", type=int, help="first record, in trace ms")
+    parser.add_argument("--ack_delay", type=float, default=40, help="ms, no --pcap")
+    parser.add_argument("--wscale", type=int, default=7)
+    for name in SCHED_PARAMS + SOL_HO_PARAMS:
+        parser.add_argument(f"--{name}", nargs="+", type=int)
+    parser.add_argument("--rank", default="score", help="score or a metric")
+    parser.add_argument("--weight", type=float, default=0.1, help="of excess in score")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("-j", "--workers", type=int)
+    parser.add_argument("--chunk", type=int, default=2048, help="configs per task")
+    parser.add_argument("-o", "--output", help="default output/sweep-<trace>.csv")
+    args = parser.parse_args()
+
+    events, errors = read_trace(args.trace)
+    errors += validate(events)
+    if errors:
+        print(f"Error: {args.trace}")
+        for e in errors:
+            print(f">   {e}")
+        exit(1)
+    if not any(e.kind == "SOL_INIT_SCHED" for e in events):
+        print(f"Error: no SOL_INIT_SCHED in {args.trace}")
+        exit(1)
+
+    timeline, t0 = read_timeline(args.packet_log, events, args.port, args.offset_ms)
+    if args.pcap:
+        add_capture_acks(timeline, args.pcap, t0, args.server_port)
+    configs, names = grid(events, args)
+    todo = list(tasks(configs, args.chunk))
+    print(f"{len(configs)} configurations in {len(todo)} tasks")
+
+    begin = time.perf_counter()
+    initargs = (timeline, events, args.ack_delay, args.wscale)
+    if args.workers == 1 or len(todo) <= 1:
+        _init(*initargs)
+        results = [_simulate(task) for task in todo]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=args.workers, initializer=_init, initargs=initargs
+        ) as pool:
+            results = list(pool.map(_simulate, todo))
+    print(f"Simulated in {time.perf_counter() - begin:.1f}s")
+
+    columns = names or list(VECTOR_PARAMS)
+    frames = [
+        pd.DataFrame(metrics, index=rows).assign(**stats)
+        for rows, metrics, stats in results
+    ]
+    df = pd.DataFrame(configs)[columns].join(pd.concat(frames))
+    df["score"] = df["limited"] + args.weight * df["excess"]
+    if args.rank not in df.columns:
+        print(f"Error: no metric {args.rank}")
+        exit(1)
+    df = df.sort_values(args.rank, kind="stable")
+    shown = columns + list(METRICS) + ["score"]
+    print(df[shown].head(args.top).to_string(index=False))
+
+    output = args.output or os.path.join(
+        "output", f"sweep-{os.path.splitext(os.path.basename(args.trace))[0]}.csv"
+    )
+    out_dir = os.path.dirname(output)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    df.to_csv(output, index=False)
+    print(f"Save to {output}")
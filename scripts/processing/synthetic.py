@@ -0,0 +1,285 @@
+import time
+
+import numpy as np
+
+# Synthetic logs in the formats the emulator, iperf3 and monitor.sh write,
+# for benchmarking the parsers at sizes no real run reaches. Writers draw and
+# write one chunk of CHUNK_ROWS at a time from its own seeded generator, so a
+# 100M row log needs no more memory than a 1M one. Every generator is seeded
+# and reproducible.
+CHUNK_ROWS = 1_000_000
+
+MSS = 1448
+PACKET_RATE = 30000  # packets per second, about 350 Mbps at MSS
+START_EPOCH = 1735689600.0  # 2025-01-01, fixed so files are reproducible
+TEST_PORT = 40000
+CONTROL_PORT = 39999
+
+
+def _chunks(rows, chunk_rows=CHUNK_ROWS):
+    for start in range(0, rows, chunk_rows):
+        yield start, min(start + chunk_rows, rows)
+
+
+def _rng(seed, chunk):
+    # One stream per chunk, so a chunk is drawn without the ones before it
+    return np.random.default_rng([seed, chunk])
+
+
+def packet_chunks(rows, seed=0, retrans=0.001, loss=0.001, chunk_rows=CHUNK_ROWS):
+    """Sender and receiver records of one TCP flow of rows packets, per chunk.
+
+    The seq space starts close to 2**32 so it wraps in any run longer than a
+    few thousand packets. A fraction retrans of the sender's packets are sent
+    again later in the same chunk, a fraction loss never reach the receiver.
+    Yields (server, client) dicts of arrays: epoch (s), seq and ack (32-bit
+    values); seq and time carry on from one chunk to the next.
+    """
+    sent = 0  # new packets of the chunks before
+    for k, (start, end) in enumerate(_chunks(rows, chunk_rows)):
+        rng = _rng(seed, k)
+        n = end - start
+        n_new = n - int(n * retrans)
+        index = sent + np.arange(n_new, dtype=np.int64)
+        sent += n_new
+        seq = (2**32 - 1000 * MSS + index * MSS) % 2**32
+        epoch = START_EPOCH + index / PACKET_RATE
+        # Retransmissions go out 3 RTTs after the original, before the next chunk
+        again = np.sort(rng.choice(n_new, n - n_new, replace=False))
+        send_seq = np.concatenate((seq, seq[again]))
+        send_epoch = np.concatenate((epoch, np.minimum(epoch[again] + 0.06, epoch[-1])))
+        order = np.argsort(send_epoch, kind="stable")
+        send_seq, send_epoch = send_seq[order], send_epoch[order]
+        # Round to the ms resolution of packet.log
+        send_epoch = np.floor(send_epoch * 1000) / 1000
+        ack = np.full(n, 1, dtype=np.int64)
+
+        arrived = rng.random(n) >= loss
+        transit = 0.02 + rng.gamma(2.0, 0.002, n)
+        recv_epoch = send_epoch[arrived] + transit[arrived]
+        order = np.argsort(recv_epoch, kind="stable")
+        server = {"epoch": send_epoch, "seq": send_seq, "ack": ack}
+        client = {
+            "epoch": recv_epoch[order],
+            "seq": send_seq[arrived][order],
+            "ack": ack[arrived][order],
+        }
+        yield server, client
+
+
+def packet_arrays(rows, seed=0, retrans=0.001, loss=0.001):
+    """packet_chunks of rows packets as one (server, client) pair."""
+    chunks = list(packet_chunks(rows, seed, retrans, loss))
+    if not chunks:
+        empty = {c: np.zeros(0) for c in ("epoch", "seq", "ack")}
+        return empty, dict(empty)
+    return tuple(
+        {
+            c: np.concatenate([chunk[side][c] for chunk in chunks])
+            for c in chunks[0][side]
+        }
+        for side in range(2)
+    )
+
+
+def _clock(epoch):
+    # HH:MM:SS prefix of log.c, UTC is as good as any zone here
+    return [time.strftime("%H:%M:%S", time.gmtime(t)) for t in epoch]
+
+
+def write_packet_log(fname, rows, seed=0):
+    """packet.log of the emulator (worker.c), test flow after a control flow."""
+    with open(fname, "w") as f:
+        clock = _clock([START_EPOCH])[0]
+        for i in range(3):
+            ts = int(START_EPOCH * 1000) - 10 + i
+            f.write(f"{clock} FATAL worker.c:35: packet,{ts},{CONTROL_PORT},{i},1\n")
+        for server, _ in packet_chunks(rows, seed):
+            ts = np.rint(server["epoch"] * 1000).astype(np.int64)
+            seq = server["seq"]
+            ack = server["ack"]
+            # Seconds change rarely, format the clock once per second
+            secs, first = np.unique(ts // 1000, return_inverse=True)
+            clocks = _clock(secs)
+            f.writelines(
+                f"{clocks[c]} FATAL worker.c:35: packet,{t},{TEST_PORT},{s},{a}\n"
+                for c, t, s, a in zip(
+                    first.tolist(), ts.tolist(), seq.tolist(), ack.tolist()
+                )
+            )
+
+
+_SS_LINE = (
+    "time:{ns} cubic wscale:7,7 rto:{rto} rtt:{rtt:.3f}/{rttvar:.3f} ato:40 "
+    "mss:1448 pmtu:1500 rcvmss:536 advmss:1448 cwnd:{cwnd} ssthresh:{ssthresh} "
+    "bytes_sent:{sent} bytes_acked:{acked} segs_out:{segs} segs_in:{segs_in} "
+    "data_segs_out:{segs} send {send:.1f}Mbps lastsnd:4 lastrcv:{lastrcv} "
+    "lastack:4 pacing_rate {pacing:.1f}Mbps delivery_rate {delivery:.1f}Mbps "
+    "delivered:{segs_in} busy:{busy}ms unacked:{unacked} retrans:0/{retrans} "
+    "rcv_space:14480 rcv_ssthresh:64088 notsent:{notsent} minrtt:20\n"
+)
+
+
+def write_ss_log(fname, rows, seed=0, interval=0.001):
+    """ss log of scripts/run/monitor.sh, one line every interval s."""
+    rng = np.random.default_rng(seed)
+    with open(fname, "w") as f:
+        for start, end in _chunks(rows):
+            n = end - start
+            i = np.arange(start, end)
+            ns = (START_EPOCH * 1e9 + i * interval * 1e9).astype(np.int64)
+            ms = (i * interval * 1000).astype(np.int64)
+            rtt = 20 + rng.gamma(2.0, 2.0, n)
+            cwnd = 10 + (i % 500)
+            send = cwnd * MSS * 8 / rtt / 1e3
+            segs = i * 3
+            f.writelines(
+                _SS_LINE.format(
+                    ns=t,
+                    rto=204 + int(r),
+                    rtt=r,
+                    rttvar=r / 8,
+                    cwnd=c,
+                    ssthresh=max(c // 2, 2),
+                    sent=sg * MSS,
+                    acked=max(sg - c, 0) * MSS,
+                    segs=sg,
+                    segs_in=sg // 2,
+                    send=sd,
+                    lastrcv=m,
+                    pacing=sd * 1.2,
+                    delivery=sd * 0.9,
+                    busy=m,
+                    unacked=c,
+                    retrans=k // 1000,
+                    notsent=c * 100,
+                )
+                for k, t, m, r, c, sd, sg in zip(
+                    i.tolist(),
+                    ns.tolist(),
+                    ms.tolist(),
+                    rtt.tolist(),
+                    cwnd.tolist(),
+                    send.tolist(),
+                    segs.tolist(),
+                )
+            )
+
+
+_IPERF_STREAM = (
+    '{{"socket":5,"start":{start:.6f},"end":{end:.6f},"seconds":{dt:.6f},'
+    '"bytes":{bytes},"bits_per_second":{bps:.6f},"retransmits":{retrans},'
+    '"snd_cwnd":{cwnd},"snd_wnd":3145728,"rtt":{rtt},"rttvar":{rttvar},'
+    '"pmtu":1500,"omitted":false,"sender":true}}'
+)
+_IPERF_SUM = (
+    '{{"start":{start:.6f},"end":{end:.6f},"seconds":{dt:.6f},"bytes":{bytes},'
+    '"bits_per_second":{bps:.6f},"retransmits":{retrans},"omitted":false,'
+    '"sender":true}}'
+)
+
+
+def write_iperf_log(fname, rows, seed=0, interval=0.1):
+    """iperf3 -J client log with rows intervals of interval s, one stream."""
+    rng = np.random.default_rng(seed)
+    with open(fname, "w") as f:
+        f.write(
+            '{"start":{"connected":[{"socket":5,"local_host":"10.0.0.1",'
+            '"local_port":40000,"remote_host":"10.0.0.2","remote_port":5257}],'
+            '"version":"iperf 3.16","timestamp":{"time":"Wed, 01 Jan 2025 '
+            f'00:00:00 GMT","timesecs":{int(START_EPOCH)}}},"connecting_to":'
+            '{"host":"10.0.0.2","port":5257},"test_start":{"protocol":"TCP",'
+            '"num_streams":1,"duration":0}},"intervals":['
+        )
+        for start, end in _chunks(rows):
+            n = end - start
+            i = np.arange(start, end)
+            mbps = np.clip(rng.normal(300, 60, n), 0, None)
+            nbytes = (mbps * 1e6 * interval / 8).astype(np.int64)
+            retrans = rng.poisson(0.2, n)
+            rtt = (20000 + rng.gamma(2.0, 2000.0, n)).astype(np.int64)
+            parts = []
+            for k, nb, rt, us, cw in zip(
+                i.tolist(),
+                nbytes.tolist(),
+                retrans.tolist(),
+                rtt.tolist(),
+                (rtt * mbps / 8).astype(np.int64).tolist(),
+            ):
+                fields = {
+                    "start": k * interval,
+                    "end": (k + 1) * interval,
+                    "dt": interval,
+                    "bytes": nb,
+                    "bps": nb * 8 / interval,
+                    "retrans": rt,
+                    "cwnd": cw,
+                    "rtt": us,
+                    "rttvar": us // 8,
+                }
+                parts.append(
+                    '{"streams":['
+                    + _IPERF_STREAM.format(**fields)
+                    + '],"sum":'
+                    + _IPERF_SUM.format(**fields)
+                    + "}"
+                )
+            if start:
+                f.write(",")
+            f.write(",".join(parts))
+        f.write('],"end":{}}\n')
+
+
+def ho_chunks(rows, seed=0, mean_gap=5.0, chunk_rows=CHUNK_ROWS):
+    """rows HO per chunk: time (ms), target link (1 sub6, 2 mmw), gap (ms), reorder.
+
+    A HO starts no earlier than 1 ms after the gap of the one before ends,
+    as traces.validate wants.
+    """
+    last_ms, last_gap = 10000, 0
+    for k, (start, end) in enumerate(_chunks(rows, chunk_rows)):
+        rng = _rng(seed, k)
+        n = end - start
+        iat = np.maximum(np.rint(rng.exponential(mean_gap * 1000, n)), 1)
+        links = rng.integers(1, 3, n)
+        gap = rng.integers(0, 200, n)
+        reord = rng.integers(0, 5, n)
+        iat = iat.astype(np.int64)
+        iat[0] = max(iat[0], last_gap + 1)
+        iat[1:] = np.maximum(iat[1:], gap[:-1] + 1)
+        ms = last_ms + np.cumsum(iat)
+        last_ms, last_gap = int(ms[-1]), int(gap[-1])
+        yield ms, links, gap, reord
+
+
+def ho_times(rows, seed=0, mean_gap=5.0):
+    """rows handover times (s) and target links (1 sub6, 2 mmw)."""
+    chunks = list(ho_chunks(rows, seed, mean_gap))
+    if not chunks:
+        return np.zeros(0), np.zeros(0, dtype=np.int64)
+    times = np.concatenate([ms for ms, _, _, _ in chunks]) / 1000
+    return times, np.concatenate([links for _, links, _, _ in chunks])
+
+
+def write_trace(fname, rows, seed=0, mean_gap=5.0):
+    """Emulator trace (see input/) with rows HO events."""
+    # INIT comes first and needs the end, so the HO are drawn twice
+    end_ms = 10000
+    for ms, _, gap, _ in ho_chunks(rows, seed, mean_gap):
+        end_ms = int(ms[-1] + gap[-1]) + 10000
+    with open(fname, "w") as f:
+        f.write(f"0,INIT,0,1,{end_ms}\n0,INIT,1,1,{end_ms}\n")
+        for ms, links, gap, reord in ho_chunks(rows, seed, mean_gap):
+            f.writelines(
+                f"{t},HO,0,{link},{g},{r},{r},0\n"
+                for t, link, g, r in zip(
+                    ms.tolist(), links.tolist(), gap.tolist(), reord.tolist()
+                )
+            )
+
+
+def thuput_series(rows, seed=0, interval=0.1):
+    """rows throughput samples (s, Mbps) every interval s, like iperf3 -i 0.1."""
+    rng = np.random.default_rng(seed)
+    times = (np.arange(rows) + 0.5) * interval
+    return times, np.clip(rng.normal(300, 60, rows), 0, None)
@@ -0,0 +1,131 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+
+class TimeSeries:
+    """Samples indexed by time, kept as sorted NumPy arrays.
+
+    Built once per run; every query is a searchsorted over the time index, so
+    a batch of H windows costs O(H log N) instead of one scan per window.
+    """
+
+    def __init__(self, times, values):
+        times = np.asarray(times, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(times, kind="stable")
+        self.times = times[order]
+        self.values = values[order]
+        # Prefix sums for O(1) window means
+        self._csum = np.concatenate(([0.0], np.cumsum(self.values)))
+
+    def __len__(self):
+        return self.times.size
+
+    def bounds(self, start, end):
+        """Index ranges [lo, hi) of samples with start <= t <= end."""
+        lo = np.searchsorted(self.times, start, side="left")
+        hi = np.searchsorted(self.times, end, side="right")
+        return lo, np.maximum(hi, lo)
+
+    def slice(self, start, end):
+        """Return (times, values) with start <= t <= end."""
+        lo, hi = self.bounds(start, end)
+        return self.times[lo:hi], self.values[lo:hi]
+
+    def window_count(self, start, end):
+        lo, hi = self.bounds(start, end)
+        return hi - lo
+
+    def window_mean(self, start, end):
+        """Mean value per window, NaN for empty windows."""
+        lo, hi = self.bounds(start, end)
+        n = hi - lo
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return (self._csum[hi] - self._csum[lo]) / n
+
+    def window_matrix(self, start, end):
+        """Values of each window as rows of a NaN-padded matrix."""
+        lo, hi = self.bounds(np.atleast_1d(start), np.atleast_1d(end))
+        n = hi - lo
+        width = int(n.max()) if n.size else 0
+        col = np.arange(width)
+        idx = lo[:, None] + col
+        mask = col < n[:, None]
+        out = np.full(idx.shape, np.nan)
+        out[mask] = self.values[idx[mask]]
+        return out
+
+    def window_percentile(self, start, end, q):
+        """Percentile q (0-100) per window, NaN for empty windows."""
+        rows = self.window_matrix(start, end)
+        if rows.shape[1] == 0:
+            return np.full(rows.shape[0], np.nan)
+        # All-NaN rows (empty windows) warn and return NaN
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.nanpercentile(rows, q, axis=1)
+
+    def nearest_index(self, query):
+        """Index of the sample closest in time to each query, ties go left."""
+        query = np.asarray(query, dtype=np.float64)
+        if len(self) == 1:
+            return np.zeros(query.shape, dtype=np.intp)
+        right = np.clip(np.searchsorted(self.times, query), 1, len(self) - 1)
+        left = right - 1
+        go_left = np.abs(query - self.times[left]) <= np.abs(self.times[right] - query)
+        return np.where(go_left, left, right)
+
+    def nearest(self, query):
+        """Return (times, values) of the samples closest to each query."""
+        idx = self.nearest_index(query)
+        return self.times[idx], self.values[idx]
+
+
+# Link served before each handover, given the links handed over to
+def previous_links(target_links, initial_link=1):
+    target_links = np.asarray(target_links)
+    prev = np.empty_like(target_links)
+    prev[:1] = initial_link
+    prev[1:] = target_links[:-1]
+    return prev
+
+
+def ho_type_mask(target_links, ho_type, initial_link=1):
+    """Mask of handovers going from ho_type[0] to ho_type[1]; [0, 0] is all."""
+    target_links = np.asarray(target_links)
+    if ho_type[0] == 0 and ho_type[1] == 0:
+        return np.ones(target_links.shape, dtype=bool)
+    prev = previous_links(target_links, initial_link)
+    return (prev == ho_type[0]) & (target_links == ho_type[1])
+
+
+def label_links(times, ho_times, target_links, initial_link=1):
+    """Serving link of every sample, given sorted handover times.
+
+    A sample taken exactly at a handover is counted on the new link.
+    """
+    links = np.concatenate(([initial_link], np.asarray(target_links)))
+    return links[np.searchsorted(np.asarray(ho_times), times, side="right")]
+
+
+def link_stats(series, links, percentiles=(5, 50, 95)):
+    """Per-link statistics of a series labelled with label_links.
+
+    tw_mean weights each sample by the time until the next one, the last
+    sample by the median spacing.
+    """
+    times, values = series.times, series.values
+    weights = np.diff(times, append=np.nan)
+    if times.size > 1:
+        weights[-1] = np.median(weights[:-1])
+    else:
+        weights[:] = 1
+    df = pd.DataFrame({"link": links, "value": values, "weight": weights})
+    df["weighted"] = df.value * df.weight
+    grouped = df.groupby("link")
+    stats = grouped.value.agg(["count", "mean", "max"])
+    for q in percentiles:
+        stats[f"p{q}"] = grouped.value.quantile(q / 100)
+    stats["tw_mean"] = grouped.weighted.sum() / grouped.weight.sum()
+    return stats.reset_index()
@@ -0,0 +1,346 @@
+import struct
+from collections import namedtuple
+
+# Emulator traces (input/trace-*.csv): one event per line,
+#   time_ms,EVENT,param,...
+# parsed strictly, checked as a whole and expanded into the primitive
+# scheduler actions src/event.c would add for them. The actions can be
+# written as a binary trace the emulator maps in one go instead of parsing
+# the CSV at startup. Standard library only, so scripts/run can use it on
+# the emulation host.
+
+# Event -> parameter names, in the order of the parse_* functions in event.c
+EVENT_FIELDS = {
+    "INIT": ("queue", "mark", "end_ms"),
+    "CMD": ("command",),
+    "HO": ("queue", "mark", "gap_ms", "reord_cnt", "reord_offset", "loss"),
+    "SOL_HANDLEDUP": ("queue", "enable"),
+    "SOL_INIT_SCHED": (
+        "queue",
+        "enable_rw",
+        "sample_interval",
+        "threshold",  # percent
+        "pace",  # percent
+        "start_ms",
+        "mark1",
+        "hist_rw1",
+        "rtt1",
+        "mark2",
+        "hist_rw2",
+        "rtt2",
+    ),
+    "SOL_HO": (
+        "queue",
+        "mark",
+        "enable_freeze",
+        "freeze_ms",
+        "enable_dedup",
+        "smooth_ms",
+        "burst_ms",
+        "enable_adapt",
+    ),
+}
+
+# Scheduler actions, the action_* handlers of src/action.h. Values are the
+# trace_action enum of src/event.h.
+ACTIONS = (
+    "command",
+    "init_nfqueue",
+    "teardown_nfqueue",
+    "start_nfqueue",
+    "stop_nfqueue",
+    "set_mark",
+    "set_drop",
+    "set_reorder",
+    "set_dedup",
+    "init_tcp_sched",
+    "sol_update",
+    "set_rwnd",
+    "set_burst",
+    "set_adapt",
+)
+ACTION_IDS = {name: i for i, name in enumerate(ACTIONS)}
+
+# Arguments per action in a record
+ARG_COUNTS = {
+    "command": 2,  # offset and length in the strings
+    "init_nfqueue": 0,
+    "teardown_nfqueue": 0,
+    "start_nfqueue": 0,
+    "stop_nfqueue": 0,
+    "set_mark": 1,
+    "set_drop": 2,
+    "set_reorder": 3,
+    "set_dedup": 1,
+    "init_tcp_sched": 12,
+    "sol_update": 1,
+    "set_rwnd": 1,
+    "set_burst": 1,
+    "set_adapt": 2,
+}
+
+LTE_MARK = 1
+NR_MARK = 2
+# src/scheduler.h and src/action.h
+SCHEDULER_MAX_EVENT = 0xFFFF
+ACTION_MAX_NFQUEUE = 0xFF
+INT_MAX = 2**31 - 1
+
+Event = namedtuple("Event", "line time_ms kind params")
+Action = namedtuple("Action", "time_ms action queue args")
+
+# Binary trace: header, records sorted in scheduler order, then the
+# NUL-terminated command strings. Little-endian, laid out as trace_header
+# and trace_record in src/event.h.
+TRACE_MAGIC = b"M2HOTRC\0"
+TRACE_VERSION = 1
+TRACE_MAX_ARGS = 12
+HEADER = struct.Struct("<8sIIII8x")
+RECORD = struct.Struct(f"<QII{TRACE_MAX_ARGS}i")
+
+
+def parse_line(line, n=0):
+    """Return (Event, None) for a trace line, or (None, problem)."""
+    text = line.rstrip("\r\n")
+    if not text.strip():
+        return None, f"line {n}: empty line"
+    tokens = text.split(",")
+    if len(tokens) < 2:
+        return None, f"line {n}: no event"
+    kind = tokens[1]
+    if kind not in EVENT_FIELDS:
+        return None, f"line {n}: unknown event {kind!r}"
+    names = EVENT_FIELDS[kind]
+    try:
+        time_ms = int(tokens[0], 0)
+    except ValueError:
+        return None, f"line {n}: bad time {tokens[0]!r}"
+    if not 0 <= time_ms <= INT_MAX:
+        return None, f"line {n}: time {time_ms} out of range"
+    if kind == "CMD":
+        # event.c keeps the command up to the next comma only
+        if len(tokens) != 3:
+            return None, f"line {n}: comma in command"
+        if not tokens[2].strip():
+            return None, f"line {n}: empty command"
+        return Event(n, time_ms, kind, {"command": tokens[2]}), None
+    if len(tokens) - 2 != len(names):
+        return (
+            None,
+            f"line {n}: {kind} takes {len(names)} values, got {len(tokens) - 2}",
+        )
+    params = {}
+    for name, token in zip(names, tokens[2:]):
+        try:
+            params[name] = int(token, 0)
+        except ValueError:
+            return None, f"line {n}: {name} is not an integer: {token!r}"
+        if abs(params[name]) > INT_MAX:
+            return None, f"line {n}: {name} out of range"
+    return Event(n, time_ms, kind, params), None
+
+
+def parse_lines(lines):
+    """Return (events, problems) of trace lines; bad lines are left out."""
+    events, errors = [], []
+    for n, line in enumerate(lines, 1):
+        event, error = parse_line(line, n)
+        if error is None:
+            events.append(event)
+        else:
+            errors.append(error)
+    return events, errors
+
+
+def read_trace(fname):
+    """Return (events, problems) of a trace file."""
+    with open(fname, "r") as f:
+        return parse_lines(f.readlines())
+
+
+def validate(events):
+    """Return the problems of a parsed trace as a whole, empty if none."""
+    errors = []
+    inits = {}
+    for e in events:
+        if e.kind != "CMD" and not 0 <= e.params["queue"] < ACTION_MAX_NFQUEUE:
+            errors.append(f"line {e.line}: queue {e.params['queue']} out of range")
+        if e.kind == "INIT":
+            queue = e.params["queue"]
+            if queue in inits:
+                errors.append(f"line {e.line}: queue {queue} initialized twice")
+            inits[queue] = e
+            if e.params["mark"] not in (0, LTE_MARK, NR_MARK):
+                errors.append(f"line {e.line}: unknown mark {e.params['mark']}")
+            if e.params["end_ms"] <= e.time_ms:
+                errors.append(f"line {e.line}: ends before it starts")
+    if not inits:
+        errors.append("no INIT")
+    end_ms = min((e.params["end_ms"] for e in inits.values()), default=None)
+
+    last_ho = {}
+    for e in events:
+        if e.kind in ("INIT", "CMD"):
+            continue
+        p = e.params
+        init = inits.get(p["queue"])
+        if init is None or init.time_ms > e.time_ms:
+            errors.append(f"line {e.line}: queue {p['queue']} used before INIT")
+        if end_ms is not None and e.time_ms >= end_ms:
+            errors.append(f"line {e.line}: after the emulation ends ({end_ms} ms)")
+        if e.kind in ("HO", "SOL_HO") and p["mark"] not in (LTE_MARK, NR_MARK):
+            errors.append(f"line {e.line}: unknown mark {p['mark']}")
+        negative = [k for k, v in p.items() if v < 0]
+        if negative:
+            errors.append(f"line {e.line}: negative {', '.join(negative)}")
+        if e.kind == "HO":
+            if p["reord_cnt"] > 0xFFFF or p["reord_offset"] > 0xFFFF:
+                errors.append(f"line {e.line}: reorder count or offset over 65535")
+            prev = last_ho.get(p["queue"])
+            if prev is not None and e.time_ms < prev.time_ms:
+                errors.append(f"line {e.line}: before the HO of line {prev.line}")
+            elif prev is not None and e.time_ms < prev.time_ms + prev.params["gap_ms"]:
+                errors.append(f"line {e.line}: overlaps the HO of line {prev.line}")
+            last_ho[p["queue"]] = e
+            if end_ms is not None and e.time_ms + p["gap_ms"] >= end_ms:
+                errors.append(f"line {e.line}: gap ends after the emulation")
+        elif e.kind == "SOL_INIT_SCHED":
+            if p["rtt1"] <= 0 or p["rtt2"] <= 0:
+                errors.append(f"line {e.line}: rtt must be positive")
+            if p["sample_interval"] <= 0:
+                errors.append(f"line {e.line}: sample_interval must be positive")
+
+    n_actions = count_events(events)
+    if n_actions > SCHEDULER_MAX_EVENT:
+        errors.append(f"{n_actions} scheduler events, max {SCHEDULER_MAX_EVENT}")
+    return errors
+
+
+def expand_event(e):
+    """Scheduler actions of one event, as the parse_* functions add them."""
+    t, p = e.time_ms, e.params
+    if e.kind == "CMD":
+        return [Action(t, "command", 0, (p["command"],))]
+    q = p["queue"]
+    if e.kind == "INIT":
+        actions = [
+            Action(t, "init_nfqueue", q, ()),
+            Action(p["end_ms"], "teardown_nfqueue", q, ()),
+            Action(t, "start_nfqueue", q, ()),
+        ]
+        if p["mark"] > 0:
+            actions.append(Action(t, "set_mark", q, (p["mark"],)))
+        return actions
+    if e.kind == "HO":
+        actions = [
+            Action(t, "stop_nfqueue", q, ()),
+            Action(t + p["gap_ms"], "start_nfqueue", q, ()),
+            Action(t, "set_mark", q, (p["mark"],)),
+        ]
+        drop = p["loss"]
+        # event.c drops reord_cnt + 10 packets whenever it reorders
+        if p["reord_cnt"] > 0:
+            drop = p["reord_cnt"] + 10
+        if drop > 0:
+            actions.append(Action(t, "set_drop", q, (1, drop)))
+        if p["reord_cnt"] > 0:
+            actions.append(
+                Action(t, "set_reorder", q, (1, p["reord_cnt"], p["reord_offset"]))
+            )
+        return actions
+    if e.kind == "SOL_HANDLEDUP":
+        return [Action(t, "set_dedup", q, (p["enable"],))]
+    if e.kind == "SOL_INIT_SCHED":
+        args = (
+            p["enable_rw"],
+            p["sample_interval"],
+            p["threshold"],
+            p["pace"],
+            p["start_ms"],
+            LTE_MARK,  # the scheduler starts on LTE
+            p["mark1"],
+            p["hist_rw1"],
+            p["rtt1"],
+            p["mark2"],
+            p["hist_rw2"],
+            p["rtt2"],
+        )
+        return [Action(t, "init_tcp_sched", q, args)]
+    # SOL_HO
+    actions = [Action(t, "sol_update", q, (p["mark"],))]
+    if p["enable_freeze"] > 0:
+        actions.append(Action(t, "set_rwnd", q, (p["mark"],)))
+    t += p["freeze_ms"]
+    if p["enable_dedup"] > 0:
+        actions.append(Action(t, "set_dedup", q, (1,)))
+        actions.append(Action(t + p["smooth_ms"], "set_dedup", q, (0,)))
+    if p["burst_ms"] > 0:
+        actions.append(Action(t, "set_burst", q, (1,)))
+        actions.append(Action(t + p["burst_ms"], "set_burst", q, (0,)))
+    t += p["burst_ms"]
+    if p["enable_adapt"] > 0:
+        actions.append(Action(t, "set_adapt", q, (t, p["enable_adapt"])))
+    return actions
+
+
+def expand(events):
+    """All scheduler actions of a trace in the order the scheduler runs them.
+
+    Ties on time keep the order the actions were added, like the stable
+    qsort in scheduler_run.
+    """
+    actions = [a for e in events for a in expand_event(e)]
+    return sorted(actions, key=lambda a: a.time_ms)
+
+
+def count_events(events):
+    return sum(len(expand_event(e)) for e in events)
+
+
+def pack_actions(actions):
+    """Return (records, strings) bytes of actions in the binary layout."""
+    records, strings = bytearray(), bytearray()
+    for a in actions:
+        args = a.args
+        if a.action == "command":
+            command = a.args[0].encode()
+            args = (len(strings), len(command))
+            strings += command + b"\0"
+        args = tuple(args) + (0,) * (TRACE_MAX_ARGS - len(args))
+        records += RECORD.pack(a.time_ms, ACTION_IDS[a.action], a.queue, *args)
+    return bytes(records), bytes(strings)
+
+
+def write_binary(actions, fname):
+    records, strings = pack_actions(actions)
+    header = HEADER.pack(
+        TRACE_MAGIC, TRACE_VERSION, RECORD.size, len(actions), len(strings)
+    )
+    with open(fname, "wb") as f:
+        f.write(header + records + strings)
+
+
+def read_binary(fname):
+    """Return the actions of a binary trace, the inverse of write_binary."""
+    with open(fname, "rb") as f:
+        data = f.read()
+    magic, version, record_size, count, strings_size = HEADER.unpack_from(data)
+    if magic != TRACE_MAGIC or version != TRACE_VERSION:
+        raise ValueError(f"{fname} is not a version {TRACE_VERSION} binary trace")
+    if record_size != RECORD.size:
+        raise ValueError(f"{fname}: record size {record_size}")
+    end = HEADER.size + count * RECORD.size
+    strings = data[end : end + strings_size]
+    actions = []
+    for time_ms, action, queue, *args in RECORD.iter_unpack(data[HEADER.size : end]):
+        name = ACTIONS[action]
+        args = tuple(args[: ARG_COUNTS[name]])
+        if name == "command":
+            args = (strings[args[0] : args[0] + args[1]].decode(),)
+        actions.append(Action(time_ms, name, queue, args))
+    return actions
+
+
+def ho_events(events):
+    """(time_ms, mark) of the HO events, in file order."""
+    return [(e.time_ms, e.params["mark"]) for e in events if e.kind == "HO"]
@@ -1,8 +1,7 @@
-import io
 import numpy as np
 import pandas as pd
-import json
-import re
+
+from iperf_log import read_iperf_log
 
 # mpl params reference
 # import matplotlib.pyplot as plt
@@ -36,84 +35,75 @@ def set_df_range(df, time_range, reset_ts=False):
     return d
 
 
-# Assuming single stream
+# Interval data of an iperf3 log, see iperf_log.py
+# Throughput is the sum over -P streams; TCP sender logs add the total
+# snd_cwnd, the mean rtt and the retransmits of all streams.
 def read_iperf(fname, sender=False):
-    with open(fname, "r") as f:
-        # sender/recv
-        # if sender == True:
-        #     text = "".join(f.readlines()[:-11])
-        #     data = json.loads(text)
-        # else:
-        #     data = json.load(f)
-        data = json.load(f)
-        jitter = []
-        seconds = []
-        thput = []
-        start_time = data["start"]["timestamp"]["timesecs"]
-        # UDP
-        if data["start"]["test_start"]["protocol"] == "UDP":
-            loss = []
-            for interval in data["intervals"]:
-                seconds.append(round(interval["sum"]["start"], 1))
-                jitter.append(round(interval["sum"]["jitter_ms"], 1))
-                thput.append(round(interval["sum"]["bits_per_second"]))
-                loss.append(interval["sum"]["lost_percent"])
-            df = pd.DataFrame(
-                {
-                    "seconds": seconds,
-                    "throughput": thput,
-                    "jitter": jitter,
-                    "loss_rate": loss,
-                }
-            )
-        # TCP
-        elif data["start"]["test_start"]["protocol"] == "TCP":
-            # TCP sender
-            if sender == True:
-                snd_cwnd, rtt = [], []
-                for interval in data["intervals"]:
-                    sample = interval["streams"][0]
-                    seconds.append(round(sample["start"], 1))
-                    thput.append(round(sample["bits_per_second"]))
-                    snd_cwnd.append(sample["snd_cwnd"])
-                    rtt.append(sample["rtt"])
-                df = pd.DataFrame(
-                    {
-                        "seconds": seconds,
-                        "throughput": thput,
-                        "snd_cwnd": snd_cwnd,
-                        "rtt": rtt,
-                    }
-                )
-            # TCP receiver
-            else:
-                for interval in data["intervals"]:
-                    seconds.append(round(interval["sum"]["start"], 1))
-                    thput.append(round(interval["sum"]["bits_per_second"]))
-                df = pd.DataFrame({"seconds": seconds, "throughput": thput})
-        return df, start_time
+    log = read_iperf_log(fname)
+    if log["truncated"]:
+        print(f"Warning: {fname} is truncated, using the complete intervals")
+    start_time = log["start"]["timestamp"]["timesecs"]
+    total, streams = log["sum"], log["streams"]
+    seconds = np.round(total["start"], 1)
+    thput = np.round(total["bits_per_second"]).astype(np.int64)
+    # UDP
+    if log["start"]["test_start"]["protocol"] == "UDP":
+        df = pd.DataFrame(
+            {
+                "seconds": seconds,
+                "throughput": thput,
+                "jitter": np.round(total["jitter_ms"], 1),
+                "loss_rate": total["lost_percent"],
+            }
+        )
+    # TCP sender
+    elif sender == True:
+        df = pd.DataFrame(
+            {
+                "seconds": seconds,
+                "throughput": thput,
+                "snd_cwnd": streams["snd_cwnd"].sum(axis=1),
+                "rtt": streams["rtt"].mean(axis=1),
+                "retransmits": total["retransmits"],
+            }
+        )
+    # TCP receiver
+    else:
+        df = pd.DataFrame({"seconds": seconds, "throughput": thput})
+    return df, start_time
 
 
 # XCAL NSA status log
+XCAL_COLUMNS = ["Time", "Chipset Time", "UE-NET", "Channel", "Tech", "Message", "Info"]
+XCAL_TZ = "America/Los_Angeles"
+
+
+def _infer_column(col):
+    # Numbers where every value is one, like read_csv
+    values = pd.to_numeric(col, errors="coerce")
+    if values.notna().sum() == col.notna().sum():
+        return values
+    return col
+
+
+# Lines are split on the first six commas; Info keeps the rest.
+# UE-NET, Tech and Message are categorical, seconds is epoch time.
 def read_handover(fname, m, d, y=2023):
-    for_pd = io.StringIO()
     with open(fname) as f:
-        for line in f:
-            new_line = re.sub(r",", "|", line.rstrip(), count=6)
-            print(new_line, file=for_pd)
-    for_pd.seek(0)
-    df = pd.read_csv(
-        for_pd,
-        sep="|",
-        names=["Time", "Chipset Time", "UE-NET", "Channel", "Tech", "Message", "Info"],
-    )
-    df["seconds"] = pd.to_datetime(df["Time"], format="%H:%M:%S.%f")
-    df["seconds"] = df["seconds"].map(
-        lambda x: x.replace(month=m, day=d, year=y)
-        .tz_localize("America/Los_Angeles")
-        .to_pydatetime()
-        .timestamp()
-    )
+        lines = pd.Series(f.read().splitlines(), dtype=object)
+    lines = lines[lines.str.strip() != ""]
+    df = lines.str.split(",", n=6, expand=True).reindex(columns=range(7))
+    df.columns = XCAL_COLUMNS
+    df = df.replace("", np.nan).reset_index(drop=True)
+    for col in ["Chipset Time", "Channel"]:
+        df[col] = _infer_column(df[col])
+    for col in ["UE-NET", "Tech", "Message"]:
+        df[col] = df[col].astype("category")
+    # Time of day on the given date, localized once
+    tod = pd.to_datetime(df["Time"], format="%H:%M:%S.%f")
+    local = pd.Timestamp(year=y, month=m, day=d) + (tod - tod.dt.normalize())
+    utc = local.dt.tz_localize(XCAL_TZ).dt.tz_convert("UTC").dt.tz_localize(None)
+    df["seconds"] = (utc - pd.Timestamp(0)) / pd.Timedelta(seconds=1)
     return df
 
 
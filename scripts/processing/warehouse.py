@@ -0,0 +1,223 @@
+import os
+import json
+import sqlite3
+import subprocess
+from datetime import datetime
+
+import pandas as pd
+
+from cache import file_digest
+
+# Results of every run in one SQLite file, filled by ingest-results.py and
+# read by query-results.py. A run is keyed by its trace (id and content
+# hash), algorithm, variant and emulator build; its KPIs are the rows of
+# kpis.run_metrics and its series are binned throughput, cwnd, rtt and the
+# HO of the trace. The same logs are stored once: runs whose logs and
+# parameters are unchanged are skipped, whatever their build label.
+DB_FILE = os.path.join("output", "results.db")
+# Bump when what ingest-results.py stores changes, every run is re-ingested
+STORE_VERSION = 1
+
+# Prefix of the modified stack on the log names, m_cubic-1-iperf-client.json
+VARIANTS = {"m_": "m2ho"}
+BASE_VARIANT = "base"
+
+KEY = ("trace", "trace_sha", "algo", "variant", "build")
+
+# {algo}-{id}-build.txt, the emulator build written by batch_run_iperf3.sh
+BUILD_LOG = "build.txt"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    trace TEXT NOT NULL,
+    trace_sha TEXT NOT NULL,
+    algo TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    build TEXT NOT NULL,
+    run_id TEXT NOT NULL,
+    scenario TEXT NOT NULL,
+    name TEXT NOT NULL,
+    source_sha TEXT NOT NULL,
+    params TEXT NOT NULL,
+    ingested TEXT NOT NULL,
+    UNIQUE (trace, trace_sha, algo, variant, build)
+);
+CREATE INDEX IF NOT EXISTS runs_source ON runs (source_sha);
+CREATE TABLE IF NOT EXISTS kpis (
+    run INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    grp TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS kpis_metric ON kpis (metric, grp, run);
+CREATE INDEX IF NOT EXISTS kpis_run ON kpis (run);
+CREATE TABLE IF NOT EXISTS series (
+    run INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    time REAL NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS series_run ON series (run, name, time);
+CREATE VIEW IF NOT EXISTS kpi_view AS
+    SELECT r.id AS run, r.scenario, r.run_id, r.trace, r.algo, r.variant,
+           r.build, k.grp, k.metric, k.value
+    FROM kpis k JOIN runs r ON r.id = k.run;
+"""
+
+# Columns of runs a query can group or filter on
+RUN_COLUMNS = ("scenario", "run_id", "trace", "algo", "variant", "build", "grp")
+
+
+def split_variant(name):
+    """(algo, variant) of a log name prefix, m_cubic -> (cubic, m2ho)."""
+    for prefix, variant in VARIANTS.items():
+        if name.startswith(prefix):
+            return name[len(prefix) :], variant
+    return name, BASE_VARIANT
+
+
+def read_build(fname):
+    """Build label recorded next to the logs of a run, None if there is none."""
+    try:
+        with open(fname, "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def emulator_build(emulator):
+    """Build label of the emulator: hash of the binary, else the git commit of src/."""
+    if emulator and os.path.exists(emulator):
+        return f"bin-{file_digest(emulator)[:12]}"
+    try:
+        commit = subprocess.run(
+            ["git", "log", "-1", "--format=%h", "--", ":/src"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return f"git-{commit}" if commit else "unknown"
+
+
+def connect(db_file=DB_FILE):
+    db_dir = os.path.dirname(db_file)
+    if db_dir:
+        os.makedirs(db_dir, exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def params_key(params):
+    return json.dumps([STORE_VERSION, params], sort_keys=True, default=str)
+
+
+def ingested(conn):
+    """source_sha -> params of every run in the store."""
+    return dict(conn.execute("SELECT source_sha, params FROM runs"))
+
+
+def store_run(conn, run, kpis, series):
+    """Store run (dict), its kpis and series frames.
+
+    Replaces the run with the same key and any run of the same logs.
+    """
+    key = tuple(run[k] for k in KEY)
+    with conn:
+        conn.execute(
+            f"DELETE FROM runs WHERE ({' AND '.join(f'{k} = ?' for k in KEY)}) "
+            "OR source_sha = ?",
+            key + (run["source_sha"],),
+        )
+        columns = list(run) + ["ingested"]
+        values = list(run.values()) + [datetime.now().isoformat(timespec="seconds")]
+        cur = conn.execute(
+            f"INSERT INTO runs ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})",
+            values,
+        )
+        run_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO kpis VALUES (?, ?, ?, ?)",
+            zip([run_id] * len(kpis), kpis["group"], kpis["metric"], kpis["value"]),
+        )
+        conn.executemany(
+            "INSERT INTO series VALUES (?, ?, ?, ?)",
+            zip(
+                [run_id] * len(series),
+                series["name"],
+                series["time"].astype(float),
+                series["value"].astype(float),
+            ),
+        )
+    return run_id
+
+
+def query(conn, sql, params=()):
+    return pd.read_sql_query(sql, conn, params=params)
+
+
+def metric_groups(conn, metric):
+    """Groups a KPI is stored under, e.g. all-all for ho_*, all for link_*."""
+    rows = conn.execute(
+        "SELECT DISTINCT grp FROM kpis WHERE metric = ? ORDER BY grp", (metric,)
+    )
+    return [row[0] for row in rows]
+
+
+def _where(filters):
+    clauses, values = [], []
+    for column, allowed in filters.items():
+        if column not in RUN_COLUMNS:
+            raise ValueError(f"no column {column}")
+        clauses.append(f"{column} IN ({', '.join('?' * len(allowed))})")
+        values.extend(allowed)
+    return clauses, values
+
+
+def aggregate(conn, metric, by, filters=None):
+    """Mean, std, min, max and count of a KPI over runs, grouped by columns."""
+    for column in by:
+        if column not in RUN_COLUMNS:
+            raise ValueError(f"no column {column}")
+    clauses, values = _where(filters or {})
+    group = ", ".join(by)
+    sql = (
+        f"SELECT {group + ', ' if by else ''}"
+        "AVG(value) AS mean, AVG(value * value) AS mean_sq, "
+        "MIN(value) AS min, MAX(value) AS max, COUNT(value) AS runs "
+        "FROM kpi_view WHERE metric = ?"
+        + "".join(f" AND {c}" for c in clauses)
+        + (f" GROUP BY {group} ORDER BY {group}" if by else "")
+    )
+    df = query(conn, sql, [metric] + values)
+    # SQLite may be built without SQRT
+    std = (df.pop("mean_sq") - df["mean"] ** 2).clip(lower=0) ** 0.5
+    df.insert(df.columns.get_loc("mean") + 1, "std", std)
+    return df
+
+
+def series_mean(conn, name, by, step, filters=None):
+    """Mean of a series per time bin of step s, across runs grouped by columns."""
+    filters = filters or {}
+    for column in list(by) + list(filters):
+        if column not in RUN_COLUMNS or column == "grp":
+            raise ValueError(f"no column {column}")
+    clauses, values = _where(filters)
+    group = ", ".join(f"r.{c}" for c in by)
+    sql = (
+        f"SELECT {group + ', ' if by else ''}"
+        "CAST(s.time / ? AS INTEGER) * ? AS time, AVG(s.value) AS mean, "
+        "COUNT(DISTINCT s.run) AS runs "
+        "FROM series s JOIN runs r ON r.id = s.run WHERE s.name = ?"
+        + "".join(f" AND r.{c}" for c in clauses)
+        + f" GROUP BY {group + ', ' if by else ''}CAST(s.time / ? AS INTEGER)"
+        + f" ORDER BY {group + ', ' if by else ''}time"
+    )
+    return query(conn, sql, [step, step, name] + values + [step])
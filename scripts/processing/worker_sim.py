@@ -0,0 +1,556 @@
+import numpy as np
+
+from capture import read_capture
+from packet_log import read_packet_log
+from seqnum import unwrap_seq
+from traces import EVENT_FIELDS, Event, expand
+
+# Offline model of the emulator's packet path (worker_callback in
+# src/worker.c) and of the receive-window controller (tcp_schedule and the
+# action_* handlers in src/action.c, driven by scheduler_run).
+#
+# A recorded timeline of the packets entering the queues is replayed
+# through the trace's scheduler actions: queue stops hold packets until the
+# queue restarts, then the drop, reorder, dedup and rwnd stages run in the
+# worker's order. The replay is open loop: the recorded sender does not
+# react to the simulated window, so the controller metrics rank
+# configurations against the recorded delivery, they do not predict
+# throughput.
+#
+# The controller runs one configuration per array element. Configurations
+# sharing the scheduler timeline (VECTOR_PARAMS differ) advance together;
+# they only part when their links diverge and the sampling interval with
+# them. Integer widths follow the C code, including the 16 bit tune_rwnd
+# that wraps when the window grows past 65535.
+
+# src/action.c, src/worker.h, src/nfqueue.h
+RWSCALE = 10
+WORKER_MAX_REORDER_COUNT = 1000
+NFQ_QUEUE_SIZE = 4096
+MSS = 1448
+SEQ_SPACE = 1 << 32
+
+# What happened to a packet in the worker
+PASS, DROPPED, OVERFLOW, REORDERED, OFFSET, LOST, DEDUP = range(7)
+FATES = ("pass", "dropped", "overflow", "reordered", "offset", "lost", "dedup")
+
+# Controller parameters that may differ between configurations run together
+VECTOR_PARAMS = ("threshold", "pace", "hist_rw1", "hist_rw2")
+# SOL_HO fields a sweep can set, added at every HO when the trace has none
+SOL_HO_PARAMS = EVENT_FIELDS["SOL_HO"][2:]
+METRICS = ("limited", "excess", "zero", "mean_rwnd", "overflows")
+
+
+def read_timeline(packet_log, events, port=None, offset_ms=None):
+    """Data packets of packet.log on the emulation clock.
+
+    The emulation starts offset_ms before the first record, by default the
+    time of the trace's iperf3 CMD. Returns (timeline, t0) with t0 the
+    emulation start in epoch ms; the timeline holds data_ms and the
+    unwrapped data_seq of the test connection (the busiest port by default).
+    """
+    records = read_packet_log(packet_log)
+    if records.size == 0:
+        raise ValueError(f"no packet records in {packet_log}")
+    if offset_ms is None:
+        cmds = [
+            e for e in events if e.kind == "CMD" and "iperf3" in e.params["command"]
+        ]
+        offset_ms = cmds[0].time_ms if cmds else 0
+    t0 = int(records["ts"][0]) - offset_ms
+    if port is None:
+        ports, counts = np.unique(records["port"], return_counts=True)
+        port = ports[np.argmax(counts)]
+    data = records[records["port"] == port]
+    timeline = {
+        "data_ms": data["ts"].astype(np.float64) - t0,
+        "data_seq": unwrap_seq(data["seq"]),
+    }
+    return timeline, t0
+
+
+def add_capture_acks(timeline, pcap, t0, server_port=5257):
+    """ACKs from the iperf3 server in a capture, on the emulation clock."""
+    pkts = read_capture(pcap)
+    pkts = pkts[pkts["src_port"] == server_port]
+    timeline["ack_ms"] = pkts["epoch"] * 1000 - t0
+    timeline["ack"] = unwrap_seq(pkts["ack"], ref=timeline["data_seq"][0])
+    timeline["ack_len"] = pkts["len"].astype(np.int64)
+    timeline["window"] = pkts["window"].astype(np.int64)
+    return timeline
+
+
+def apply_config(events, config):
+    """Events with the SOL_INIT_SCHED and SOL_HO fields of config set.
+
+    SOL_HO fields in config are written into the trace's SOL_HO events, or
+    into a SOL_HO on the controller's queue at every HO if it has none.
+    """
+    init = [e for e in events if e.kind == "SOL_INIT_SCHED"]
+    if not init:
+        raise ValueError("no SOL_INIT_SCHED in the trace")
+    sol_queue = init[0].params["queue"]
+    sol_ho = {k: config[k] for k in SOL_HO_PARAMS if k in config}
+    has_sol_ho = any(e.kind == "SOL_HO" for e in events)
+    out = []
+    for e in events:
+        if e.kind == "SOL_INIT_SCHED":
+            params = dict(e.params)
+            params.update((k, v) for k, v in config.items() if k in params)
+            e = e._replace(params=params)
+        elif e.kind == "SOL_HO" and sol_ho:
+            e = e._replace(params=dict(e.params, **sol_ho))
+        out.append(e)
+        if e.kind == "HO" and sol_ho and not has_sol_ho:
+            params = {k: 0 for k in SOL_HO_PARAMS}
+            params.update(sol_ho, queue=sol_queue, mark=e.params["mark"])
+            out.append(Event(e.line, e.time_ms, "SOL_HO", params))
+    return out
+
+
+def _state_at(times, act_times, values, initial):
+    # Value set by the last action at or before each time; an action at t
+    # applies to the packets at t, the scheduler runs before the worker
+    at = np.searchsorted(act_times, times, side="right") - 1
+    values = np.append(values, initial)
+    return values[at]  # at == -1 picks initial
+
+
+def hold(times, actions):
+    """Time each packet reaches the worker and the ones the kernel drops.
+
+    Packets arriving while the queue is stopped wait until it restarts, up
+    to NFQ_QUEUE_SIZE of them.
+    """
+    acts = [a for a in actions if a.action in ("stop_nfqueue", "start_nfqueue")]
+    ptime = times.copy()
+    fate = np.zeros(times.size, dtype=np.int8)
+    if not acts:
+        return ptime, fate
+    # Actions are in scheduler order, stable on time
+    act_times = np.array([a.time_ms for a in acts], dtype=np.float64)
+    stopped = np.array([a.action == "stop_nfqueue" for a in acts])
+    # Time of the next start after each action
+    next_start = np.full(len(acts), np.inf)
+    upcoming = np.inf
+    for k in range(len(acts) - 1, -1, -1):
+        next_start[k] = upcoming
+        if not stopped[k]:
+            upcoming = act_times[k]
+    last = np.searchsorted(act_times, times, side="right") - 1
+    held = (last >= 0) & stopped[np.maximum(last, 0)]
+    ptime[held] = next_start[last[held]]
+    # Backlog of one stop beyond the queue length never reaches the worker
+    held_at = np.flatnonzero(held)
+    if held_at.size:
+        group = last[held_at]
+        first = np.r_[0, np.flatnonzero(np.diff(group)) + 1]
+        rank = np.arange(held_at.size) - np.repeat(
+            first, np.diff(np.r_[first, held_at.size])
+        )
+        fate[held_at[rank >= NFQ_QUEUE_SIZE]] = OVERFLOW
+    return ptime, fate
+
+
+def drop_reorder(ptime, fate, actions):
+    """worker_handle_drop and worker_handle_reorder over the packets.
+
+    Only the packets right after a set_drop or set_reorder are walked one by
+    one. Returns (fate, vtime, key): the verdict time of each packet and a
+    key that orders packets sharing a verdict time as the worker emits them.
+    """
+    acts = [a for a in actions if a.action in ("set_drop", "set_reorder")]
+    vtime = ptime.copy()
+    key = np.arange(ptime.size, dtype=np.float64)
+    live = np.flatnonzero(fate == PASS)
+    n = live.size
+    live_time = ptime[live]
+    k = i = 0
+    drop_on = reorder_on = False
+    drop_left = count = offset = 0
+    queued = []
+    while True:
+        t = live_time[i] if i < n else np.inf
+        while k < len(acts) and acts[k].time_ms <= t:
+            a = acts[k]
+            if a.action == "set_drop":
+                drop_on, drop_left = bool(a.args[0]), a.args[1]
+            else:
+                reorder_on = bool(a.args[0])
+                count = min(a.args[1], WORKER_MAX_REORDER_COUNT)
+                offset = a.args[2]
+                queued = []
+            k += 1
+        if i >= n:
+            break
+        if not drop_on and not reorder_on:
+            if k == len(acts):
+                break
+            # Nothing active, skip to the packets of the next action
+            i = np.searchsorted(live_time, acts[k].time_ms, side="left")
+            continue
+        p = live[i]
+        i += 1
+        if drop_on:
+            drop_left -= 1
+            dropped = drop_left + 1 > 0
+            if drop_left <= 0:
+                drop_on = False
+            if dropped:
+                fate[p] = DROPPED
+                continue
+        if reorder_on:
+            count -= 1
+            if count + 1 > 0:
+                queued.append(p)
+                fate[p] = REORDERED
+            else:
+                offset -= 1
+                # No verdict at all once both are used up
+                fate[p] = OFFSET if offset + 1 > 0 else LOST
+            if offset <= 0:
+                for j, q in enumerate(reversed(queued)):
+                    vtime[q] = ptime[p]
+                    key[q] = p + (j + 1) / (len(queued) + 1)
+                reorder_on = False
+                queued = []
+    # Still held when the trace ends
+    for q in queued:
+        fate[q] = LOST
+    return fate, vtime, key
+
+
+def run_queue(times, actions, queue):
+    """Worker of one queue up to the dedup stage, see drop_reorder."""
+    actions = [a for a in actions if a.queue == queue and a.action != "command"]
+    ptime, fate = hold(times, actions)
+    fate, vtime, key = drop_reorder(ptime, fate, actions)
+    return ptime, fate, vtime, key
+
+
+def synthetic_acks(vtime, key, fate, seq, delay):
+    """One ACK per delivered data packet, delay ms after its verdict."""
+    delivered = np.isin(fate, (PASS, REORDERED, OFFSET))
+    order = np.lexsort((key[delivered], vtime[delivered]))
+    ack_ms = vtime[delivered][order] + delay
+    ack = np.maximum.accumulate(seq[delivered][order] + MSS)
+    # The stream is in arrival order for the ingress queue
+    order = np.argsort(ack_ms, kind="stable")
+    return {
+        "ack_ms": ack_ms[order],
+        "ack": ack[order],
+        "ack_len": np.zeros(ack.size, dtype=np.int64),
+        "window": np.full(ack.size, 0xFFFF, dtype=np.int64),
+    }
+
+
+class Stream:
+    """ACKs that reach the rwnd stage of the controller's worker.
+
+    cum[k] is data_rcvd accumulated over the first k of them, with the
+    32-bit wrap of worker_handle_rwnd; infl is the data in flight when each
+    arrives and window its original window field.
+    """
+
+    def __init__(self, time, ack, window, infl):
+        self.time = time
+        self.window = window
+        self.infl = infl
+        raw = ack % SEQ_SPACE
+        recv = np.zeros(raw.size, dtype=np.int64)
+        recv[1:] = (raw[1:] - raw[:-1]) % SEQ_SPACE
+        self.cum = np.r_[0, np.cumsum(recv)]
+
+    def index(self, t):
+        return int(np.searchsorted(self.time, t, side="left"))
+
+
+def prepare(timeline, actions, ack_delay=40):
+    """Run the worker over a timeline, return (Stream, packet stats).
+
+    ACKs come from the timeline if it has them, or are made from the data
+    delivered by the egress queue.
+    """
+    init = [a for a in actions if a.action == "init_tcp_sched"]
+    if not init:
+        raise ValueError("no SOL_INIT_SCHED in the trace")
+    queue = init[0].queue
+    rwnd_from = init[0].time_ms if init[0].args[0] else np.inf
+    egress = [a.queue for a in actions if a.action == "stop_nfqueue"]
+    egress = egress[0] if egress else 0
+
+    data_ms, data_seq = timeline["data_ms"], timeline["data_seq"]
+    _, d_fate, d_vtime, d_key = run_queue(data_ms, actions, egress)
+    if "ack_ms" in timeline:
+        acks = timeline
+    else:
+        acks = synthetic_acks(d_vtime, d_key, d_fate, data_seq, ack_delay)
+    ptime, fate, _, _ = run_queue(acks["ack_ms"], actions, queue)
+
+    # Dedup and rwnd stages, packets in the order the worker sees them
+    reach = np.flatnonzero((fate == PASS) & (ptime >= rwnd_from))
+    order = np.argsort(ptime[reach], kind="stable")
+    reach = reach[order]
+    dedup = [a for a in actions if a.action == "set_dedup" and a.queue == queue]
+    dedup_on = _state_at(
+        ptime[reach],
+        np.array([a.time_ms for a in dedup], dtype=np.float64),
+        np.array([a.args[0] for a in dedup], dtype=np.int64),
+        0,
+    )
+    ack = acks["ack"][reach]
+    # last_ack is the previous ACK through the rwnd stage, which a dropped
+    # duplicate equals anyway; it is unset before the first
+    dup = np.zeros(reach.size, dtype=bool)
+    dup[1:] = ack[1:] == ack[:-1]
+    dup &= (dedup_on > 0) & (acks["ack_len"][reach] == 0)
+    fate[reach[dup]] = DEDUP
+    keep = reach[~dup]
+
+    # Data in flight when each ACK arrives, from the sender's highest seq
+    sent = np.maximum.accumulate(data_seq + MSS)
+    last = np.searchsorted(data_ms, ptime[keep], side="right") - 1
+    infl = np.where(last >= 0, sent[np.maximum(last, 0)] - acks["ack"][keep], 0)
+    stream = Stream(
+        ptime[keep], acks["ack"][keep], acks["window"][keep], np.maximum(infl, 0)
+    )
+    stats = {
+        "data": int(data_ms.size),
+        "acks": int(ptime.size),
+        "rwnd_acks": int(keep.size),
+    }
+    for name, fates in (("data", d_fate), ("ack", fate)):
+        for code in (DROPPED, OVERFLOW, REORDERED, LOST, DEDUP):
+            stats[f"{name}_{FATES[code]}"] = int(np.sum(fates == code))
+    return stream, stats
+
+
+def _u16(values):
+    # Conversion to the uint16_t tune_rwnd: truncate to int, keep 16 bits
+    return np.trunc(values).astype(np.int64) & 0xFFFF
+
+
+def _c_int(values):
+    # (int) of a double on x86: out of range gives INT_MIN
+    fits = np.abs(values) < 2**31
+    return np.where(fits, np.trunc(np.where(fits, values, 0)), -(2**31)).astype(
+        np.int64
+    )
+
+
+class _Run:
+    """Controller state of configurations sharing one scheduler timeline."""
+
+    PER_CONFIG = (
+        "idx",
+        "threshold",
+        "pace",
+        "init_rw",
+        "hist",
+        "tmark",
+        "tune",
+        "overflows",
+    )
+
+    def __init__(self, idx, params):
+        n = idx.size
+        self.idx = idx
+        # tcp_ctx, scalar while shared
+        self.fire = 0xFFFFFFFF
+        self.si = 0
+        self.burst_si = 0
+        self.rtt = np.zeros(3, dtype=np.int64)
+        self.threshold = np.asarray(params["threshold"], dtype=np.float32) / np.float32(
+            100
+        )
+        self.pace = np.asarray(params["pace"], dtype=np.float32) / np.float32(100)
+        self.init_rw = np.column_stack(
+            (np.zeros(n), params["hist_rw1"], params["hist_rw2"])
+        ).astype(np.int64)
+        self.hist = np.zeros((n, 3), dtype=np.int64)
+        self.tmark = np.ones(n, dtype=np.int64)
+        self.queue = None
+        # worker_ctx
+        self.tune = np.zeros(n, dtype=np.int64)
+        self.do_rwnd = False
+        self.burst = False
+        self.adapt = False
+        self.reset = 0
+        # Scheduler position and accumulated metrics
+        self.i = 0
+        self.t = 0.0
+        self.active = 0.0  # ms rewriting with ACKs to rewrite
+        self.span = 0.0  # ms rewriting
+        self.acc = {m: np.zeros(n) for m in ("limited", "excess", "zero", "rwnd")}
+        self.overflows = np.zeros(n, dtype=np.int64)
+
+    def split(self, mask):
+        part = _Run.__new__(_Run)
+        part.__dict__.update(self.__dict__)
+        for name in _Run.PER_CONFIG:
+            setattr(part, name, getattr(self, name)[mask])
+        part.acc = {k: v[mask] for k, v in self.acc.items()}
+        return part
+
+    def metrics(self):
+        active, span = max(self.active, 1e-9), max(self.span, 1e-9)
+        return {
+            "limited": self.acc["limited"] / active,
+            "excess": self.acc["excess"] / active,
+            "zero": self.acc["zero"] / span,
+            "mean_rwnd": self.acc["rwnd"] / span,
+            "overflows": self.overflows,
+        }
+
+
+def _account(run, t, stream, wscale):
+    # Window in force over [run.t, t) against the data in flight
+    dt = t - run.t
+    if dt <= 0:
+        return
+    if run.do_rwnd:
+        a, b = stream.index(run.t), stream.index(t)
+        run.span += dt
+        run.acc["zero"] += dt * (run.tune == 0)
+        run.acc["rwnd"] += dt * run.tune
+        if b > a:
+            # The worker only lowers the field, never raises it
+            field = np.minimum(run.tune, stream.window[a:b].max())
+            window = field.astype(np.float64) * (1 << wscale)
+            infl = max(float(stream.infl[a:b].max()), 1.0)
+            run.active += dt
+            run.acc["limited"] += dt * (window < infl)
+            run.acc["excess"] += dt * np.log2(np.maximum(window / infl, 1))
+    run.t = t
+
+
+def _data_rcvd(run, t, stream):
+    if not run.do_rwnd:
+        return 0
+    return int(stream.cum[stream.index(t)] - stream.cum[run.reset])
+
+
+def _tcp_schedule(run, t, stream):
+    data = _data_rcvd(run, t, stream)
+    if run.burst:
+        rate = run.rtt[run.tmark] / run.si
+        est = _c_int(data * rate).astype(np.uint64) >> np.uint64(RWSCALE)
+        grow = est > run.tune.astype(np.uint64)
+        run.tune = np.where(grow, (est & np.uint64(0xFFFF)).astype(np.int64), run.tune)
+    elif run.adapt:
+        cw = data >> RWSCALE
+        positive = run.tune > 0
+        rate = cw / np.where(positive, run.tune, 1).astype(np.float64)
+        grow = positive & (rate > run.threshold.astype(np.float64))
+        shrink = positive & ~grow & (rate < 0.7)
+        tune = run.tune.astype(np.float32)
+        up = tune * (np.float32(1) + run.pace)
+        down = tune * (np.float32(1) - run.pace / np.float32(4))
+        run.overflows += grow & (up >= 65536)
+        run.tune = np.where(grow, _u16(up), np.where(shrink, _u16(down), run.tune))
+    run.reset = stream.index(t)
+
+
+def _apply(run, a, stream):
+    """Apply one scheduler action; returns masks to split on instead if the
+    configurations would part here."""
+    rows = np.arange(run.idx.size)
+    if a.action == "init_tcp_sched":
+        enable, sample_interval, _, _, start_ms, mark = a.args[:6]
+        run.queue = a.queue
+        run.fire = start_ms
+        run.burst_si = sample_interval
+        run.rtt = np.array([0, a.args[8], a.args[11]], dtype=np.int64)
+        run.tmark[:] = mark
+        run.si = int(run.rtt[mark])
+        if run.si <= 0:
+            raise ValueError("the link rtt must be positive")
+        run.hist = run.init_rw.copy()
+        run.do_rwnd = bool(enable)
+        run.adapt = True
+        run.reset = stream.index(a.time_ms)
+        run.tune = _u16(run.hist[rows, run.tmark])
+        return None
+    if run.queue is None or a.queue != run.queue:
+        return None
+    if a.action == "sol_update":
+        mark = a.args[0]
+        positive = run.tune > 0
+        run.hist[rows[positive], run.tmark[positive]] = run.tune[positive]
+        run.tmark = np.where(positive, mark, run.tmark)
+        run.burst = run.adapt = False
+        run.tune = _u16(run.hist[:, mark])
+    elif a.action == "set_rwnd":
+        run.tune[:] = max(a.args[0], 10)
+    elif a.action == "set_burst":
+        current = run.hist[rows, run.tmark]
+        run.burst = a.args[0] > 0
+        if a.args[0] > 0:
+            run.adapt = False
+            run.reset = stream.index(a.time_ms)
+            run.tune = _u16(current)
+            run.si = run.burst_si
+        else:
+            higher = run.tune > current
+            run.hist[rows[higher], run.tmark[higher]] = run.tune[higher]
+    elif a.action == "set_adapt":
+        enable = a.args[1]
+        if enable > 0:
+            si = run.rtt[run.tmark]
+            if np.any(si != si[0]):
+                return [si == v for v in np.unique(si)]
+            run.si = int(si[0])
+        run.adapt = enable > 0
+        if enable > 0:
+            run.burst = False
+            run.reset = stream.index(a.time_ms)
+            run.tune = _u16(run.hist[rows, run.tmark])
+    return None
+
+
+def _advance(run, actions, stream, wscale):
+    # scheduler_run: the next action unless the sampler fires first
+    while run.i < len(actions):
+        a = actions[run.i]
+        fire = run.fire + run.si
+        if a.time_ms < fire:
+            _account(run, a.time_ms, stream, wscale)
+            masks = _apply(run, a, stream)
+            if masks is not None:
+                return [run.split(m) for m in masks]
+            run.i += 1
+        else:
+            run.fire = fire
+            _account(run, fire, stream, wscale)
+            # A sampler behind the clock (its interval just shrank) fires
+            # at once, over what arrived since the last reset
+            _tcp_schedule(run, max(fire, run.t), stream)
+    return None
+
+
+def simulate(actions, stream, params, wscale=7):
+    """Controller METRICS of each configuration in params.
+
+    params maps VECTOR_PARAMS to equal-length arrays; the other parameters
+    are in the actions. Metrics over the time the window is rewritten:
+    limited is the share of it the window is below the data in flight,
+    excess the mean log2 of the window over the data in flight when above,
+    zero the share with a zero window, mean_rwnd the mean tune_rwnd and
+    overflows how often the window wrapped past 65535.
+    """
+    n = len(params["threshold"])
+    out = {m: np.zeros(n) for m in METRICS}
+    runs = [_Run(np.arange(n), params)]
+    while runs:
+        run = runs.pop()
+        parts = _advance(run, actions, stream, wscale)
+        if parts is not None:
+            runs.extend(parts)
+            continue
+        for m, values in run.metrics().items():
+            out[m][run.idx] = values
+    return out
+
+
+def config_actions(events, config):
+    return expand(apply_config(events, config))
@@ -32,9 +32,11 @@ for loc_idx in "${!locations[@]}"; do
     for id in "${traces[@]}"; do
         original_trace="$INPUTDIR/trace-$id.csv"
         emulator_input="$OUTPUTDIR/trace-$id-test.csv"
+        emulator_trace="$OUTPUTDIR/trace-$id-test.bin"
         sv_iperf_log="$OUTPUTDIR/$algo-$id-iperf-server.json"
         sv_ss_log="$OUTPUTDIR/$algo-$id-ss-server.log"
         cl_iperf_log="$OUTPUTDIR/$algo-$id-iperf-client.json"
+        build_log="$OUTPUTDIR/$algo-$id-build.txt"
 
         echo "Iperf3 server log: $sv_iperf_log"
         echo "Iperf3 client log: $cl_iperf_log"
@@ -46,6 +48,8 @@ for loc_idx in "${!locations[@]}"; do
             if [ "$ans" = "y" ]; then
                 # Generate test
                 python3 $ROOTDIR/scripts/run/generate_input.py $original_trace $emulator_input $sv_iperf_log $sv_ss_log
+                # Check the trace before the run, the emulator maps the binary
+                python3 $ROOTDIR/scripts/processing/build-trace.py $emulator_input -o $emulator_trace
                 if pgrep -x "iperf3" >/dev/null; then
                     echo "Error: there are unfinished iperf3 process"
                     echo "----------------"
@@ -61,7 +65,9 @@ for loc_idx in "${!locations[@]}"; do
                     if [ -f $sv_ss_log ]; then
                         rm -f $sv_ss_log
                     fi
-                    sudo ip netns exec test_a $emulator $algo $emulator_input
+                    # Emulator build of the run, as ingest-results.py labels it
+                    echo "bin-$(sha1sum $emulator | cut -c1-12)" > $build_log
+                    sudo ip netns exec test_a $emulator $algo $emulator_trace
                     sleep 5
                     echo -e "\a"
 
@@ -55,14 +55,23 @@ int main(int argc, char **argv) {
 
   // read input
   printf("Reading input\n");
-  FILE *stream = fopen(argv[2], "r");
-  if (stream == NULL) {
-    printf("Error reading file %s\n", argv[2]);
-    return -1;
-  }
-  char line[CSV_MAX_LINESZ];
-  while (fgets(line, CSV_MAX_LINESZ, stream) != NULL) {
-    parse_event(&scheduler, &action, line);
+  if (trace_is_binary(argv[2])) {
+    // compiled by build-trace.py, already validated
+    if (load_binary_trace(&scheduler, &action, argv[2]) < 0) {
+      printf("Error reading trace %s\n", argv[2]);
+      return -1;
+    }
+  } else {
+    FILE *stream = fopen(argv[2], "r");
+    if (stream == NULL) {
+      printf("Error reading file %s\n", argv[2]);
+      return -1;
+    }
+    char line[CSV_MAX_LINESZ];
+    while (fgets(line, CSV_MAX_LINESZ, stream) != NULL) {
+      parse_event(&scheduler, &action, line);
+    }
+    fclose(stream);
   }
 
   // Debugging
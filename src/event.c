@@ -1,6 +1,10 @@
+#include <fcntl.h>
 #include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
 #include "event.h"
 #include "log.h"
@@ -343,3 +347,217 @@ int parse_event(scheduler_ctx *scheduler, action_ctx *action, char *text) {
   free(tmp_str);
   return 0;
 }
+
+int trace_is_binary(const char *path) {
+  char magic[sizeof(TRACE_MAGIC)];
+  FILE *f = fopen(path, "rb");
+  if (f == NULL)
+    return 0;
+  size_t n = fread(magic, 1, sizeof(magic), f);
+  fclose(f);
+  return n == sizeof(magic) && memcmp(magic, TRACE_MAGIC, sizeof(magic)) == 0;
+}
+
+// add_trace_record results other than 0
+#define TRACE_RECORD_BAD -1
+#define TRACE_RECORD_FULL -2
+
+// add the event of a record, or free its args when the scheduler is full
+static int add_record_event(scheduler_ctx *scheduler, uint64_t time_ms,
+                            scheduler_handler h, void *args) {
+  if (scheduler_add_event(scheduler, time_ms, h, args) < 0) {
+    free(args);
+    return TRACE_RECORD_FULL;
+  }
+  return 0;
+}
+
+// one record, the same args as the parse_* functions above would allocate
+static int add_trace_record(scheduler_ctx *scheduler, action_ctx *action,
+                            const trace_record *rec, const char *strings,
+                            uint32_t strings_size) {
+  const int32_t *a = rec->args;
+  uint16_t queue_num = rec->queue_num;
+  switch (rec->action) {
+  case TRACE_COMMAND: {
+    if (a[0] < 0 || a[1] < 0 || (uint64_t)a[0] + a[1] >= strings_size)
+      return TRACE_RECORD_BAD;
+    action_command_args *args = malloc(sizeof(action_command_args));
+    args->command = strndup(strings + a[0], a[1]);
+    log_info("Run cmd %s", args->command);
+    const char *command = args->command;
+    int ret = add_record_event(scheduler, rec->time_ms, action_command, args);
+    if (ret < 0)
+      free((void *)command);
+    return ret;
+  }
+  case TRACE_INIT_NFQUEUE: {
+    action_init_nfqueue_args *args = malloc(sizeof(action_init_nfqueue_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    return add_record_event(scheduler, rec->time_ms, action_init_nfqueue, args);
+  }
+  case TRACE_TEARDOWN_NFQUEUE: {
+    action_teardown_nfqueue_args *args =
+        malloc(sizeof(action_teardown_nfqueue_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    return add_record_event(scheduler, rec->time_ms,
+                            action_teardown_nfqueue, args);
+  }
+  case TRACE_START_NFQUEUE: {
+    action_start_nfqueue_args *args = malloc(sizeof(action_start_nfqueue_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    return add_record_event(scheduler, rec->time_ms, action_start_nfqueue,
+                            args);
+  }
+  case TRACE_STOP_NFQUEUE: {
+    action_stop_nfqueue_args *args = malloc(sizeof(action_stop_nfqueue_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    return add_record_event(scheduler, rec->time_ms, action_stop_nfqueue, args);
+  }
+  case TRACE_SET_MARK: {
+    action_set_mark_args *args = malloc(sizeof(action_set_mark_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->mark = a[0];
+    return add_record_event(scheduler, rec->time_ms, action_set_mark, args);
+  }
+  case TRACE_SET_DROP: {
+    action_set_drop_args *args = malloc(sizeof(action_set_drop_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->enable = a[0];
+    args->drop_count = a[1];
+    return add_record_event(scheduler, rec->time_ms, action_set_drop, args);
+  }
+  case TRACE_SET_REORDER: {
+    action_set_reorder_args *args = malloc(sizeof(action_set_reorder_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->enable = a[0];
+    args->count = a[1];
+    args->offset = a[2];
+    return add_record_event(scheduler, rec->time_ms, action_set_reorder, args);
+  }
+  case TRACE_SET_DEDUP: {
+    action_set_dedup_args *args = malloc(sizeof(action_set_dedup_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->enable = a[0];
+    return add_record_event(scheduler, rec->time_ms, action_set_dedup, args);
+  }
+  case TRACE_INIT_TCP_SCHED: {
+    action_init_tcp_sched_args *args =
+        malloc(sizeof(action_init_tcp_sched_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->enable = a[0];
+    args->sample_interval = a[1];
+    args->threshold = a[2] / 100.0;
+    args->pace = a[3] / 100.0;
+    args->fire = a[4];
+    args->mark = a[5];
+    for (int i = 1; i < 3; i++) {
+      args->init_param[i].mark = a[3 + 3 * i];
+      args->init_param[i].hist_rw = a[4 + 3 * i];
+      args->init_param[i].rtt = a[5 + 3 * i];
+    }
+    return add_record_event(scheduler, rec->time_ms, action_init_tcp_sched,
+                            args);
+  }
+  case TRACE_SOL_UPDATE: {
+    action_sol_update_args *args = malloc(sizeof(action_sol_update_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->mark = a[0];
+    return add_record_event(scheduler, rec->time_ms, action_sol_update, args);
+  }
+  case TRACE_SET_RWND: {
+    action_set_rwnd_args *args = malloc(sizeof(action_set_rwnd_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->force_wnd = 0;
+    args->rwnd = a[0];
+    return add_record_event(scheduler, rec->time_ms, action_set_rwnd, args);
+  }
+  case TRACE_SET_BURST: {
+    action_set_burst_args *args = malloc(sizeof(action_set_burst_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->enable = a[0];
+    return add_record_event(scheduler, rec->time_ms, action_set_burst, args);
+  }
+  case TRACE_SET_ADAPT: {
+    action_set_adapt_args *args = malloc(sizeof(action_set_adapt_args));
+    args->ctx = action;
+    args->queue_num = queue_num;
+    args->start_time = a[0];
+    args->enable = a[1];
+    return add_record_event(scheduler, rec->time_ms, action_set_adapt, args);
+  }
+  default:
+    return TRACE_RECORD_BAD;
+  }
+}
+
+int load_binary_trace(scheduler_ctx *scheduler, action_ctx *action,
+                      const char *path) {
+  int fd = open(path, O_RDONLY);
+  if (fd < 0) {
+    log_error("failed to open trace %s", path);
+    return -1;
+  }
+  struct stat st;
+  if (fstat(fd, &st) < 0 || (size_t)st.st_size < sizeof(trace_header)) {
+    log_error("trace %s is too short", path);
+    close(fd);
+    return -1;
+  }
+  size_t size = st.st_size;
+  const char *data = mmap(NULL, size, PROT_READ, MAP_PRIVATE, fd, 0);
+  close(fd);
+  if (data == MAP_FAILED) {
+    log_error("failed to map trace %s", path);
+    return -1;
+  }
+
+  int ret = -1;
+  const trace_header *header = (const trace_header *)data;
+  if (memcmp(header->magic, TRACE_MAGIC, sizeof(TRACE_MAGIC)) != 0 ||
+      header->version != TRACE_VERSION ||
+      header->record_size != sizeof(trace_record)) {
+    log_error("trace %s is not a version %d binary trace", path,
+              TRACE_VERSION);
+    goto done;
+  }
+  uint64_t records_end =
+      sizeof(trace_header) + (uint64_t)header->count * sizeof(trace_record);
+  if (records_end + header->strings_size > size) {
+    log_error("trace %s is truncated", path);
+    goto done;
+  }
+  const trace_record *records =
+      (const trace_record *)(data + sizeof(trace_header));
+  const char *strings = data + records_end;
+  for (uint32_t i = 0; i < header->count; i++) {
+    int err = add_trace_record(scheduler, action, &records[i], strings,
+                               header->strings_size);
+    if (err == TRACE_RECORD_FULL) {
+      // As for a csv trace, the events past the limit are dropped
+      log_error("trace %s: too many events, records %u to %u dropped", path, i,
+                header->count - 1);
+      break;
+    }
+    if (err < 0) {
+      log_error("trace %s: bad record %u", path, i);
+      goto done;
+    }
+  }
+  ret = 0;
+done:
+  munmap((void *)data, size);
+  return ret;
+}
@@ -50,4 +50,63 @@ int parse_init_sched(scheduler_ctx *scheduler, action_ctx *action, int time_ms,
 
 int parse_event(scheduler_ctx *scheduler, action_ctx *action, char *text);
 
+// Binary trace, written by scripts/processing/build-trace.py: a header, the
+// scheduler actions already expanded from the events and sorted by time,
+// then the NUL-terminated command strings. Loaded with a single mmap.
+#define TRACE_MAGIC "M2HOTRC"
+#define TRACE_VERSION 1
+#define TRACE_MAX_ARGS 12
+
+// Same order as ACTIONS in scripts/processing/traces.py
+typedef enum {
+  TRACE_COMMAND,
+  TRACE_INIT_NFQUEUE,
+  TRACE_TEARDOWN_NFQUEUE,
+  TRACE_START_NFQUEUE,
+  TRACE_STOP_NFQUEUE,
+  TRACE_SET_MARK,
+  TRACE_SET_DROP,
+  TRACE_SET_REORDER,
+  TRACE_SET_DEDUP,
+  TRACE_INIT_TCP_SCHED,
+  TRACE_SOL_UPDATE,
+  TRACE_SET_RWND,
+  TRACE_SET_BURST,
+  TRACE_SET_ADAPT,
+  TRACE_ACTION_COUNT
+} trace_action;
+
+typedef struct {
+  char magic[8];
+  uint32_t version;
+  uint32_t record_size;
+  uint32_t count;
+  uint32_t strings_size;
+  uint32_t reserved[2];
+} trace_header;
+
+// args per action:
+//   command: string offset, length
+//   set_mark, sol_update: mark
+//   set_drop: enable, drop_count
+//   set_reorder: enable, count, offset
+//   set_dedup, set_burst: enable
+//   set_rwnd: rwnd
+//   set_adapt: start_time, enable
+//   init_tcp_sched: enable, sample_interval, threshold(%), pace(%), fire,
+//                   mark, then mark, hist_rw, rtt of link 1 and link 2
+typedef struct {
+  uint64_t time_ms;
+  uint32_t action;
+  uint32_t queue_num;
+  int32_t args[TRACE_MAX_ARGS];
+} trace_record;
+
+/* trace_is_binary tells a binary trace from a csv one by its magic */
+int trace_is_binary(const char *path);
+
+/* load_binary_trace adds every action of a binary trace to the scheduler */
+int load_binary_trace(scheduler_ctx *scheduler, action_ctx *action,
+                      const char *path);
+
 #endif // HANDOFF_EVENT_H